@@ -2,11 +2,16 @@ from bpy.types import ( TOPBAR_MT_file_export,
                         TOPBAR_MT_file_import,
                         OUTLINER_MT_collection_new, 
                         OUTLINER_MT_collection , 
+                        VIEW3D_MT_object,
                         Menu)
                         
 
                         
 from bpy.utils import register_class, unregister_class
+from bpy.app.handlers import (  load_post, 
+                                undo_post, 
+                                redo_post, 
+                                depsgraph_update_post )
 from .modules.SceneBackground import (  register_background_properties, 
                                         unregister_background_properties)
                                         
@@ -23,7 +28,15 @@ from .modules.NewManifest import NewManifest
 from .modules.NewCamera import NewCamera
 from .modules.LoadLocalModel import LoadLocalModel
 from .modules.LoadNetworkModel import LoadNetworkModel
+from .modules.LoadProxyModels import LoadProxyModels
 from .modules.Configure3DViewport import Configure3DViewport
+from .modules.preferences import IIIFAddonPreferences
+from .modules.editing import reset_id_allocator
+from .modules.editing.collections import invalidate_resource_graph
+from .modules.editing.json_cache import clear_parsed_json_cache, compress_json_properties
+from .modules.editing.models import migrate_initial_transforms
+from .modules.editing.annotation_cache import ( discard_updated_annotations,
+                                                clear_fragment_cache )
 
 from .modules.custom_props import (
     AddIIIF3DObjProperties,
@@ -76,6 +89,7 @@ classes = (
     ImportNetworkModel,
     LoadLocalModel,
     LoadNetworkModel,
+    LoadProxyModels,
     IIIFManifestPanel,
     AddIIIF3DObjProperties,
     AddIIIF3DCollProperties,
@@ -84,7 +98,26 @@ classes = (
     NewManifest,
     NewCamera,
     OUTLINER_MT_edit_manifest_anno_page,
-    Configure3DViewport
+    Configure3DViewport,
+    IIIFAddonPreferences
+)
+
+# (handler list, function) pairs appended to bpy.app.handlers in register
+app_handlers = (
+    (load_post,             reset_id_allocator),
+    (load_post,             invalidate_resource_graph),
+    (undo_post,             invalidate_resource_graph),
+    (redo_post,             invalidate_resource_graph),
+    (depsgraph_update_post, invalidate_resource_graph),
+    (load_post,             clear_fragment_cache),
+    (undo_post,             clear_fragment_cache),
+    (redo_post,             clear_fragment_cache),
+    (depsgraph_update_post, discard_updated_annotations),
+    (load_post,             clear_parsed_json_cache),
+    (undo_post,             clear_parsed_json_cache),
+    (redo_post,             clear_parsed_json_cache),
+    (load_post,             migrate_initial_transforms),
+    (load_post,             compress_json_properties),
 )
 
 def menu_func_import(self, context):
@@ -98,6 +131,11 @@ def menu_func_export(self, context):
     )
     
     
+def menu_func_load_proxy_models(self, context):
+    self.layout.operator(
+        LoadProxyModels.bl_idname, text="Load IIIF Models"
+    )
+    
 def menu_func_new_manifest(self, context):
     self.layout.operator(
         NewManifest.bl_idname, text="New IIIF Manifest"
@@ -114,14 +152,21 @@ def register():
     TOPBAR_MT_file_export.append(menu_func_export)    
     OUTLINER_MT_collection_new.append(menu_func_new_manifest)    
     OUTLINER_MT_collection.append(menu_func_manifest_submenu)
+    VIEW3D_MT_object.append(menu_func_load_proxy_models)
     
-    
+    for handler_list, func in app_handlers:
+        handler_list.append(func)
 
 def unregister():
     TOPBAR_MT_file_import.remove(menu_func_import)
     TOPBAR_MT_file_export.remove(menu_func_export)
     
     OUTLINER_MT_collection_new.remove(menu_func_new_manifest)
+    VIEW3D_MT_object.remove(menu_func_load_proxy_models)
+    
+    for handler_list, func in app_handlers:
+        if func in handler_list:
+            handler_list.remove(func)
     
     OUTLINER_MT_collection.append(menu_func_manifest_submenu)
 
@@ -1,14 +1,25 @@
+import gzip
+import itertools
 import json
-from typing import Set, List
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Set, List, Tuple
 
 import bpy
-from bpy.props import StringProperty
+from bpy.props import BoolProperty, EnumProperty, IntProperty, StringProperty
 from bpy.types import Context, Operator, Object
 from bpy_extras.io_utils import ExportHelper
 from mathutils import Vector, Quaternion
-from .editing import generate_id
+from .editing import generate_id, is_generated_id
 
 from .utils.color import rgba_to_hex
+from .utils.json_writer import JSONStreamWriter, StreamedArray
+from .utils.json_patch import make_json_patch, make_merge_patch
+from .metadata import IIIFMetadata
+from .utils.timing import span, finish_trace
+from .preferences import configure_timing
 
 from .editing.collections import (getScenes, 
                     getTargetScene, 
@@ -17,12 +28,16 @@ from .editing.collections import (getScenes,
                     getBodyObject,
                     getManifests)
                     
+from .editing.json_cache import get_json_property, thaw, FrozenDict
+from .editing.annotation_cache import get_fragment_cache
 from .editing.transforms import (   Transform, 
                                     Placement, 
                                     Rotation,
                                     Translation, 
                                     get_object_placement, 
-                                    simplifyTransforms )
+                                    get_object_placements,
+                                    simplifyTransforms,
+                                    quantizeTransforms )
      
 #   INITIAL_TRANSFORM is string-valued constant
 #   shared with the models module, it is used as the
@@ -35,6 +50,129 @@ import math
 import logging
 logger = logging.getLogger("iiif.export")
 
+class ManifestExportResult(NamedTuple):
+    name : str
+    filepath : str
+    size : int
+    snapshot_seconds : float
+    write_seconds : float
+
+def write_manifest_file(    manifest_data : dict, 
+                            filepath : str, 
+                            format_options : dict,
+                            streaming : bool = False,
+                            write_gzip : bool = False,
+                            name : str = "",
+                            snapshot_seconds : float = 0.0,
+                            export_format : str = "MANIFEST",
+                            original : Optional[dict] = None) -> ManifestExportResult:
+    """
+    encodes and writes manifest_data, or for the patch export formats the 
+    patch from original to manifest_data; unless streaming is True (so that
+    manifest_data holds generators that read Blender data) this function
+    does not access Blender data and may be run on a worker thread
+    """
+    start = time.perf_counter()
+    if export_format != "MANIFEST":
+        with span("make_patch", file=filepath):
+            document = manifest_patch(export_format, original, manifest_data)
+    else:
+        document = manifest_data
+    with span("write_manifest", file=filepath):
+        with open(filepath, "w", encoding="utf-8") as f:
+            if streaming:
+                JSONStreamWriter(f, **format_options).write(document)
+            else:
+                json.dump(document, f, **format_options)
+    if write_gzip:
+        with span("write_gzip", file=filepath):
+            write_gzip_copy(filepath)
+    return ManifestExportResult(name, filepath, os.path.getsize(filepath), 
+                                snapshot_seconds, time.perf_counter() - start)
+
+def manifest_patch(export_format : str, original : Optional[dict], manifest_data : dict) -> Any:
+    """
+    the JSON_PATCH or MERGE_PATCH patch transforming the original, as imported,
+    manifest into manifest_data. If there is no original, the patch replaces
+    the whole document.
+    """
+    if original is None:
+        logger.warning("no original manifest stored for %s (import with Keep Original Manifest), "
+                       "the patch replaces the manifest" % manifest_data.get("id"))
+        if export_format == "JSON_PATCH":
+            return [{"op" : "replace", "path" : "", "value" : manifest_data}]
+        return manifest_data
+        
+    current = reconcile_generated_ids(original, manifest_data)
+    if export_format == "JSON_PATCH":
+        return make_json_patch(original, current)
+    if export_format == "MERGE_PATCH":
+        return make_merge_patch(original, current)
+    raise ValueError("unsupported export format %s" % export_format)
+
+def reconcile_generated_ids(original : Any, current : Any) -> Any:
+    """
+    The export generates new ids for resources not represented by a Blender
+    object or collection, such as the SpecificResource of a body and its
+    Transforms. In the patch these would all appear as changes; so where a resource
+    of current with a generated id is at the same position as a resource of 
+    the same type in the original, the original id is used.
+    
+    returns current if no id is replaced, else a copy of the changed parts,
+    current is not modified
+    """
+    if isinstance(current, dict) and isinstance(original, dict):
+        result : Optional[dict] = None
+        current_id = current.get("id", None)
+        if  isinstance(current_id, str) and is_generated_id(current_id) and \
+            "id" in original and original.get("type") == current.get("type"):
+            result = dict(current)
+            result["id"] = original["id"]
+        for key, value in current.items():
+            if key != "id" and key in original:
+                new_value = reconcile_generated_ids(original[key], value)
+                if new_value is not value:
+                    if result is None:
+                        result = dict(current)
+                    result[key] = new_value
+        return current if result is None else result
+    if isinstance(current, list) and isinstance(original, list):
+        new_list : Optional[list] = None
+        for index, (original_item, item) in enumerate(zip(original, current)):
+            new_item = reconcile_generated_ids(original_item, item)
+            if new_item is not item:
+                if new_list is None:
+                    new_list = list(current)
+                new_list[index] = new_item
+        return current if new_list is None else new_list
+    return current
+
+def write_gzip_copy(filepath : str) -> str:
+    """
+    writes filepath + ".gz" ; the gzip header timestamp is set to 0
+    so that an unchanged manifest gives an identical file
+    """
+    gzip_filepath = filepath + ".gz"
+    with open(filepath, "rb") as src:
+        with gzip.GzipFile(gzip_filepath, "wb", compresslevel=9, mtime=0) as dst:
+            shutil.copyfileobj(src, dst)
+    logger.info("wrote %s" % gzip_filepath)
+    return gzip_filepath
+
+def unique_filepath(directory : str, basename : str, used_filepaths : Set[str]) -> str:
+    """
+    directory/basename.json, with a numeric suffix added to basename if
+    needed so that the path is not already in used_filepaths
+    """
+    filepath = os.path.join(directory, basename + ".json")
+    suffix = 1
+    while filepath in used_filepaths:
+        suffix += 1
+        filepath = os.path.join(directory, "%s_%i.json" % (basename, suffix))
+    used_filepaths.add(filepath)
+    return filepath
+
+
 class ExportManifest(Operator, ExportHelper):
     """Export IIIF 3D Manifest"""
 
@@ -52,7 +190,99 @@ class ExportManifest(Operator, ExportHelper):
         maxlen=1024,
         subtype='FILE_PATH',
     )
+    
+    use_streaming: BoolProperty( # type: ignore
+        name="Streaming Export",
+        description="Write the manifest to the file one annotation at a time, "
+                    "rather than building the complete manifest in memory first. "
+                    "The file written is the same",
+        default=False
+    )
+    
+    use_compact: BoolProperty( # type: ignore
+        name="Compact",
+        description="Write the manifest without indentation or spaces, with "
+                    "the transform and field of view values rounded to Float Precision "
+                    "and omitting transforms that are then the identity",
+        default=False
+    )
+    
+    float_precision: IntProperty( # type: ignore
+        name="Float Precision",
+        description="Number of decimal digits kept in transform and field of view "
+                    "values of a compact export",
+        default=6,
+        min=0,
+        max=15
+    )
+    
+    write_gzip: BoolProperty( # type: ignore
+        name="Write .gz File",
+        description="Also write a gzip-compressed copy of the manifest, with "
+                    "the extension .json.gz, for serving with Content-Encoding: gzip",
+        default=False
+    )
+
+    use_fragment_cache: BoolProperty( # type: ignore
+        name="Reuse Unchanged Annotations",
+        description="Reuse the exported data of annotations which have not changed "
+                    "since the previous export; not used by a Streaming Export",
+        default=True
+    )
 
+    export_all: BoolProperty( # type: ignore
+        name="Export All Manifests",
+        description="Write each manifest in the file, or each of those listed in Manifests, "
+                    "to the directory of the chosen file; the file names are the "
+                    "manifest collection names",
+        default=False
+    )
+    
+    manifest_names: StringProperty( # type: ignore
+        name="Manifests",
+        description="Comma-separated collection names or ids of the manifests to export "
+                    "with Export All Manifests; all manifests if empty",
+        default=""
+    )
+    
+    export_workers: IntProperty( # type: ignore
+        name="Export Threads",
+        description="Number of threads encoding and writing manifests with Export All Manifests",
+        default=4,
+        min=1,
+        max=32
+    )
+
+    export_format: EnumProperty( # type: ignore
+        name="Format",
+        description="Write the manifest, or the changes since it was imported",
+        items=[
+            ("MANIFEST", "Manifest", "The complete manifest"),
+            ("JSON_PATCH", "JSON Patch", 
+                "RFC 6902 JSON Patch from the manifest as imported to the current manifest"),
+            ("MERGE_PATCH", "JSON Merge Patch",
+                "RFC 7386 JSON Merge Patch from the manifest as imported to the current manifest"),
+        ],
+        default="MANIFEST"
+    )
+
+    # object_placements : key is the as_pointer() of a Model or camera object
+    # value is its placement, read in bulk at the start of execute
+    object_placements : Dict[int, Placement]
+
+    @property
+    def is_streaming(self) -> bool:
+        # Developer Note: a batch export, or the export of a patch, builds 
+        # the complete manifest data before writing
+        return self.use_streaming and not self.export_all and self.export_format == "MANIFEST"
+
+    @property
+    def float_places(self) -> Optional[int]:
+        """
+        the number of decimal places for rounding computed values, None 
+        for no rounding
+        """
+        return self.float_precision if self.use_compact else None
 
     def get_base_data(self, iiif_object) -> dict:
         """
@@ -68,22 +298,34 @@ class ExportManifest(Operator, ExportHelper):
         label properties, metadata, and other none - 3d properties
         will be in stored restored in the this base_data dict. 
         """
-        base_json = iiif_object.get("iiif_json",None)
-        if base_json:
-            base_data = json.loads( base_json )
-        else:
-            base_data = dict()
+        # the values nested in base_data are shared with the parsed json cache,
+        # only the top level dict is a modifiable copy
+        base_data = thaw( get_json_property(iiif_object, default=FrozenDict()) )
             
         base_data["id"] = iiif_object.get("iiif_id")
         base_data["type"] = iiif_object.get("iiif_type")
         return base_data
 
+    def items_value(self, data : dict, new_items : Iterable[Any]) -> Any:
+        """
+        the value for the "items" property of data; the new_items follow any
+        items already in data.
+        
+        When the operator is streaming the new_items are not evaluated here, 
+        the returned StreamedArray yields them as the JSONStreamWriter reaches them
+        """
+        existing_items = data.get("items", None) or []
+        if self.is_streaming:
+            return StreamedArray( itertools.chain(existing_items, new_items) )
+        return existing_items + list(new_items)
+
     def get_manifest_data(self, manifest_collection: bpy.types.Collection) -> dict:
         manifest_data = self.get_base_data(manifest_collection)
         
-        manifest_data["items"] = manifest_data.get("items", None) or []
-        for scene_collection in getScenes(manifest_collection):
-            manifest_data["items"].append(self.get_scene_data(scene_collection))
+        manifest_data["items"] = self.items_value( manifest_data, 
+            ( self.get_scene_data(scene_collection) 
+                for scene_collection in getScenes(manifest_collection) )
+        )
         return manifest_data
         
     def get_scene_data(self, scene_collection: bpy.types.Collection) -> dict:
@@ -97,23 +339,45 @@ class ExportManifest(Operator, ExportHelper):
             logger.info("setting scene backgroundColor to %s" % color_hex)
             scene_data["backgroundColor"] = color_hex
         
-        scene_data["items"] = scene_data.get("items", None) or []
-        for page_collection in getAnnotationPages(scene_collection):
-            scene_data["items"].append(self.get_annotation_page_data(page_collection))
+        scene_data["items"] = self.items_value( scene_data, 
+            ( self.get_annotation_page_data(page_collection) 
+                for page_collection in getAnnotationPages(scene_collection) )
+        )
         return scene_data
 
 
     def get_annotation_page_data(self, page_collection: bpy.types.Collection) -> dict:
         page_data = self.get_base_data(page_collection)
         
-        page_data["items"] = page_data.get("items", None) or []
-        for anno_collection in getAnnotations(page_collection):
-            page_data["items"].append(self.get_annotation_data(anno_collection))
-
-        
+        page_data["items"] = self.items_value( page_data, 
+            ( self.get_annotation_data(anno_collection) 
+                for anno_collection in getAnnotations(page_collection) )
+        )
         return page_data
 
     def get_annotation_data(self, anno_collection ):
+        # Developer Note: the lookup of a clean annotation reads nothing
+        # else from Blender, see annotation_cache
+        use_cache = self.use_fragment_cache and not self.is_streaming
+        if use_cache:
+            options = (self.float_places,)
+            anno_data = get_fragment_cache().lookup(anno_collection, options)
+            if anno_data is not None:
+                return anno_data
+                
+        with span("export_annotation", id=anno_collection.get("iiif_id")):
+            anno_data = self._get_annotation_data(anno_collection)
+            if use_cache:
+                # the datablocks the data is computed from, an update of
+                # any of them discards the entry
+                sources = [ getTargetScene(anno_collection) ]
+                body_obj = getBodyObject(anno_collection)
+                if body_obj is not None:
+                    sources += [ body_obj, body_obj.data ]
+                anno_data = get_fragment_cache().store(anno_collection, options, anno_data, sources)
+            return anno_data
+            
+    def _get_annotation_data(self, anno_collection ):
         anno_data = self.get_base_data(anno_collection)
         anno_data["motivation"] = ["painting"]
 #        Developer Note:
@@ -130,6 +394,8 @@ class ExportManifest(Operator, ExportHelper):
             transforms    = simplifyTransforms(
                                 self.applied_transforms_for_object( bodyObj )
                             )
+            if self.float_places is not None:
+                transforms = quantizeTransforms(transforms, self.float_places)
             anno_data["target"] = self.target_data_for_object(  resource_data, 
                                                                 transforms, 
                                                                 anno_collection)
@@ -158,7 +424,7 @@ class ExportManifest(Operator, ExportHelper):
                 "type" : "SpecificResource",
                 "id"   : generate_id("SpecificResource"),
                 "transform" : [
-                    t.to_iiif_dict() for t in transforms
+                    t.to_iiif_dict(self.float_places) for t in transforms
                 ],
                 "source" : resource_data
             }
@@ -178,7 +444,7 @@ class ExportManifest(Operator, ExportHelper):
         
         if len(transforms) > 0 and isinstance( transforms[-1], Translation):
             def build_selector(tt:Translation) -> dict:
-                tmp = tt.to_iiif_dict()
+                tmp = tt.to_iiif_dict(self.float_places)
                 tmp["type"]="PointSelector"
                 tmp["id"]  = generate_id("PointSelector")
                 return tmp
@@ -219,6 +485,8 @@ class ExportManifest(Operator, ExportHelper):
 
         foValue : float = float(blender_obj.data.angle_y) # pyright: ignore[reportAttributeAccessIssue, reportOptionalMemberAccess]
         resource_data["fieldOfView"] =  math.degrees(foValue) 
+        if self.float_places is not None:
+            resource_data["fieldOfView"] = round(resource_data["fieldOfView"], self.float_places)
         return resource_data
         
     def resource_data_for_model(self, blender_obj:bpy.types.Object) -> dict:
@@ -236,6 +504,16 @@ class ExportManifest(Operator, ExportHelper):
             raise
             
      
+    def current_placement(self, blender_obj:Object) -> Placement:
+        """
+        the placement read by get_object_placements at the start of the
+        export, for an object not then read, its placement read now
+        """
+        placement = self.object_placements.get( blender_obj.as_pointer(), None)
+        if placement is None:
+            placement = get_object_placement( blender_obj )
+        return placement
+     
     def applied_transforms_for_model(self, model:Object) -> List[Transform] :
         """
         The applied transforms list is a list of geometric transforms that will be applied
@@ -249,7 +527,7 @@ class ExportManifest(Operator, ExportHelper):
         If the orientation, scale, location of the imported model have not been modified
         by the user then this set of transforms should reduce to the identity.
         """
-        current_placement : Placement = get_object_placement( model )
+        current_placement : Placement = self.current_placement( model )
         
         exported_transform_list: List[Transform] = []
         try:
@@ -281,7 +559,7 @@ class ExportManifest(Operator, ExportHelper):
     def applied_transforms_for_camera(self, camera:Object) -> List[Transform] :
         """
         """
-        current_placement : Placement = get_object_placement( camera )
+        current_placement : Placement = self.current_placement( camera )
         initial_rotation = Rotation( Quaternion( Vector((1.0,0.0,0.0)), math.pi/2))
         exported_transform_list: List[Transform] = []
         exported_transform_list.extend(
@@ -334,21 +612,104 @@ class ExportManifest(Operator, ExportHelper):
         
 
 
+    def format_options(self) -> dict:
+        if self.use_compact:
+            return {"indent" : None, "separators" : (",",":")}
+        return {"indent" : 2}
 
-    def execute(self, context: Context) -> Set[str]:
-        """Export Blender scene as IIIF manifest"""
-        manifests = getManifests()
+    def original_manifest(self, manifest_collection : bpy.types.Collection) -> Optional[dict]:
+        """
+        the manifest as imported, needed only for the patch formats
+        """
+        if self.export_format == "MANIFEST":
+            return None
+        return IIIFMetadata(manifest_collection).get_manifest()
+
+    def selected_manifests(self, manifests : List[bpy.types.Collection]) -> List[bpy.types.Collection]:
+        """
+        the manifests named, by collection name or iiif_id, in the comma-separated
+        manifest_names property; all manifests if manifest_names is empty
+        """
+        names = [name.strip() for name in self.manifest_names.split(",") if name.strip()]
+        if not names:
+            return manifests
+        selected = [m for m in manifests if m.name in names or m.get("iiif_id") in names]
+        found = {m.name for m in selected} | {m.get("iiif_id") for m in selected}
+        for name in names:
+            if name not in found:
+                logger.warning("no manifest named %s" % name)
+        return selected
+
+    def export_manifests(self, manifests : List[bpy.types.Collection]) -> List[ManifestExportResult]:
+        """
+        batch export: the data of each manifest is built on the main thread, as
+        it reads Blender data, then the manifests are encoded and written on a 
+        pool of worker threads, into the directory of filepath
+        """
+        directory = os.path.dirname(self.filepath)
+        format_options = self.format_options()
         
-        if manifests:   # that is, not an empty list
-            if len(manifests) > 1:
-                logger.warning("Multiple manifests not supported")
-            manifest_collection=manifests[0]
-            manifest_data = self.get_manifest_data(manifest_collection)
+        used_filepaths : Set[str] = set()
+        snapshots : List[Tuple[str, str, dict, Optional[dict], float]] = []
+        for manifest_collection in manifests:
+            filepath = unique_filepath(directory, bpy.path.clean_name(manifest_collection.name), used_filepaths)
+            start = time.perf_counter()
+            with span("snapshot_manifest", id=manifest_collection.name):
+                manifest_data = self.get_manifest_data(manifest_collection)
+                original = self.original_manifest(manifest_collection)
+            snapshots.append( (manifest_collection.name, filepath, manifest_data, original,
+                                time.perf_counter() - start) )
         
-            # Write manifest
-            with open(self.filepath, "w", encoding="utf-8") as f:
-                json.dump(manifest_data, f, indent=2)
-        else:
-            logger.warning("No manifest collections identified")
+        with ThreadPoolExecutor(max_workers=self.export_workers) as executor:
+            futures = [
+                executor.submit(write_manifest_file,  manifest_data, filepath, format_options, 
+                                                    False, self.write_gzip, name, snapshot_seconds,
+                                                    self.export_format, original)
+                for name, filepath, manifest_data, original, snapshot_seconds in snapshots
+            ]
+            return [future.result() for future in futures]
+
+    def execute(self, context: Context) -> Set[str]:
+        """Export Blender scene as IIIF manifest"""
+        configure_timing()
+        get_fragment_cache().reset_stats()
+        with span("export_manifest", file=self.filepath):
+            with span("read_placements"):
+                self.object_placements = get_object_placements(
+                    obj for obj in bpy.data.objects 
+                        if obj.get("iiif_type", "") in ("Model", "PerspectiveCamera", "OrthographicCamera")
+                )
+            manifests = getManifests()
+            
+            if not manifests:   # that is, an empty list
+                logger.warning("No manifest collections identified")
+            elif self.export_all:
+                results = self.export_manifests( self.selected_manifests(manifests) )
+                for result in results:
+                    logger.info("%s : %s, %i bytes, snapshot %.3f s, write %.3f s" %
+                                (result.name, result.filepath, result.size, 
+                                 result.snapshot_seconds, result.write_seconds))
+                self.report({"INFO"}, "Exported %i manifests to %s" % 
+                                (len(results), os.path.dirname(self.filepath)))
+            else:
+                if len(manifests) > 1:
+                    logger.warning("Multiple manifests not supported, exporting %s; "
+                                   "use Export All Manifests to export each" % manifests[0].name)
+                manifest_collection=manifests[0]
+                manifest_data = self.get_manifest_data(manifest_collection)
+            
+                # Write manifest
+                # Developer Note: when streaming, the scenes, pages, and
+                # annotations are evaluated while the file is written
+                write_manifest_file(manifest_data, self.filepath, self.format_options(),
+                                    self.is_streaming, self.write_gzip, manifest_collection.name,
+                                    export_format = self.export_format,
+                                    original = self.original_manifest(manifest_collection))
+        if self.use_fragment_cache and not self.is_streaming:
+            cache = get_fragment_cache()
+            logger.info("annotations reused: %i, exported: %i" % (cache.hits, cache.misses))
+        self.object_placements = {}
+        finish_trace("export to %s" % self.filepath)
 
         return {"FINISHED"}
+
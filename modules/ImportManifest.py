@@ -1,12 +1,15 @@
 
 import json
+import tempfile
+import time
 
-from typing import Set, Callable, Iterable
+from typing import Set, Callable, Dict, Iterable, List, Optional, Tuple
 
 import bpy
-from bpy.props import StringProperty
+from bpy.props import BoolProperty, EnumProperty, IntProperty, StringProperty
 from bpy.types import Collection, Context, Object, Operator
 from bpy_extras.io_utils import ImportHelper
+from mathutils import Quaternion, Vector
 
 from .editing.collections import (  new_manifest,
                                     new_scene,
@@ -14,13 +17,30 @@ from .editing.collections import (  new_manifest,
                                     new_annotation,
                                     move_collection_into_parent,
                                     move_object_into_collection,
+                                    set_collection_excluded,
+                                    set_active_collection,
                                     ANNOTATION_TYPE,
                                     ANNOTATIONPAGE_TYPE,
+                                    MANIFEST_TYPE,
                                     SCENE_TYPE)
                                     
-from .editing.transforms import Transform, Placement, transformsToPlacements
+from .editing.transforms import (   Transform, 
+                                    Placement, 
+                                    Scaling,
+                                    Rotation,
+                                    Translation,
+                                    transformsToPlacements )
 from .editing.models import walk_object_tree
+from .editing import generate_name_from_data, reserve_id
 from .editing.fileops import uri_scheme, uri_to_path
+from .network.prefetch import ModelPrefetcher, collect_model_urls, collect_page_model_urls
+from .network.fetch import read_model_bounds, url_basename, RETRIEVAL_ERRORS
+from .network.pool import get_connection_pool
+from .network.retry import get_failure_registry
+from .network.mirror import get_url_mapper
+from .LoadNetworkModel import choose_mimetype
+from .LoadLocalModel import import_local_model
+from .preferences import get_download_cache, configure_timing, configure_network
 
 from .utils.color import hex_to_rgba
 from .utils.json_patterns import (
@@ -28,6 +48,16 @@ from .utils.json_patterns import (
     force_as_singleton
 )
 from .utils.blender_setup import setup_camera
+from .utils.json_stream import JSONStreamReader
+from .utils.timing import span, finish_trace
+try:
+    from .utils.batch_transforms import placements_from_iiif
+except ImportError:
+    # numpy is bundled with Blender, without it every annotation
+    # is placed by get_object_placement
+    placements_from_iiif = None
+from .metadata import IIIFMetadata
+from .editing.json_cache import set_json_property, get_json_property, thaw, FrozenDict
 
 
 import logging
@@ -40,12 +70,118 @@ logger = logging.getLogger("Import")
 
 class ImportManifestError(Exception):
     pass
+
+# pages with fewer annotations than this are placed by the scalar
+# get_object_placement, for which the cost of packing arrays is not repaid
+BATCH_PLACEMENT_MIN = 16
+
+def annotation_transforms( body_data : dict, target_data : dict ) -> Iterable[dict]:
+    """
+    generator yielding the IIIF transforms of the body and the PointSelector
+    of the target, in the order they are applied
+    """
+    if  body_data.get("type","") == "SpecificResource":
+        for iiif_transform in body_data.get("transform",""):
+            yield iiif_transform
+
+    if  target_data.get("type","") == "SpecificResource":
+        selector = force_as_singleton( target_data["selector"] )
+        if selector and selector.get("type","") == "PointSelector":
+            yield selector
+    
+def with_default_type( data : dict, default_type : str ) -> dict:
+    """
+    data, or a copy of it with "type" set to default_type if it has none
+    """
+    if "type" in data:
+        return data
+    return dict(data, type=default_type)
+    
+def is_retrievable( model_url : str ) -> bool:
+    """
+    whether model_url can be read now: a file url, or a url which the url
+    rewrite rules map to a local file, is read without network access
+    """
+    source_url = get_url_mapper().resolve(model_url, count=False)
+    return uri_scheme(source_url) == "file" or bpy.app.online_access
+    
+def load_model_resource( model_url : str, mimetype : str ) -> Object:
+    """
+    imports the model at the http(s) or file model_url, returns the new
+    Blender object, which has not yet been configured with configure_model
+    """
+    scheme = uri_scheme(model_url)
+    if scheme in {"http" , "https"}:
+        _op_network : Callable[..., Set[str]] = bpy.ops.iiif.load_network_model # pyright:ignore[reportAttributeAccessIssue]
+        import_result = _op_network(model_url=model_url, mimetype = mimetype ) 
+        logger.debug("bpy.ops.iiif.load_network_model result: %r" % import_result)
+        if "FINISHED" not in import_result:
+            raise ImportManifestError("import Operation failed with %r" % import_result)
+
+    elif scheme in {"file"}:
+        if import_local_model(bpy.context, uri_to_path(model_url), mimetype) is None:
+            raise ImportManifestError("import of %s failed" % model_url)
+    
+    else:
+        raise ImportManifestError("unsupported scheme %s for model url %s" % (scheme, model_url))
+                    
+    new_model = bpy.context.active_object
+    if new_model is None:
+        raise ImportManifestError("bpy.context.active_object not set")
+    return new_model
+    
+def load_proxy_model( proxy : Object, loaded : Dict[Tuple[str,str], Object] ) -> Object:
+    """
+    replaces the placeholder proxy by the model it stands for, and returns
+    the model. The model takes the placement of the proxy and its place in
+    the annotation collection; the proxy is deleted.
+    
+    loaded holds the models already loaded, keyed by (url, format); a model
+    in it is placed as a linked duplicate. raises ImportManifestError if the
+    model cannot be loaded, the proxy is then left in place
+    """
+    from .editing.models import configure_model, duplicate_linked_model
+    from .editing.transforms import get_object_placement
+    
+    # configure_model modifies resource_data, so a modifiable copy
+    resource_data : dict = thaw( get_json_property(proxy, default=FrozenDict()) )
+    model_url : str = resource_data.get("id") or proxy.get("iiif_id", "")
+    mimetype : str = resource_data.get("format", "")
+    
+    # a proxy has no INITIAL_TRANSFORM, so its current placement is the
+    # placement that configure_model applies to the loaded model
+    placement = get_object_placement(proxy)
+    
+    key = (model_url, mimetype)
+    if key in loaded:
+        new_model = duplicate_linked_model( loaded[key] )
+    else:
+        new_model = load_model_resource( model_url, mimetype )
+        loaded[key] = new_model
+        
+    configure_model( new_model, resource_data, placement )
+    
+    if proxy.users_collection:
+        target_collection = proxy.users_collection[0]
+        for _depth, _obj in walk_object_tree(new_model):
+            move_object_into_collection(_obj, target_collection)
+            
+    mesh = proxy.data
+    bpy.data.objects.remove(proxy)
+    if mesh is not None and mesh.users == 0:
+        bpy.data.meshes.remove(mesh)    # type: ignore
+    return new_model
     
 class ImportManifest(Operator, ImportHelper):
     """Import IIIF 3D Manifest"""
 
     bl_idname = "import_scene.iiif_manifest"
     bl_label = "Import IIIF 3D Manifest"
+    
+    # Developer Note: with the UNDO option the whole import is recorded as one
+    # undo step; Blender does not push undo steps for the operators (glTF import,
+    # camera_add, ...) executed from within the execute method of this operator
+    bl_options = {'REGISTER', 'UNDO'}
 
     filename_ext = ".json"
     filter_glob: StringProperty(  # type: ignore
@@ -57,25 +193,280 @@ class ImportManifest(Operator, ImportHelper):
         maxlen=1024,
         subtype="FILE_PATH",
     )
+    
+    prefetch_workers: IntProperty(  # type: ignore
+        name="Parallel Downloads",
+        description="Number of network models downloaded concurrently before "
+                    "the scene is built; 0 downloads each model as it is imported",
+        default=8,
+        min=0,
+        max=32,
+    )
+    
+    instance_repeated_models: BoolProperty(  # type: ignore
+        name="Instance Repeated Models",
+        description="Import a model referenced by several annotations once, "
+                    "and place linked duplicates for the later annotations",
+        default=True,
+    )
+    
+    use_streaming: BoolProperty(  # type: ignore
+        name="Streaming Parser",
+        description="Read the manifest incrementally, one annotation page at a time. "
+                    "Reduces memory use for very large manifests; network models "
+                    "are then prefetched one page at a time",
+        default=False,
+    )
+
+    bulk_mode: BoolProperty(  # type: ignore
+        name="Bulk Import",
+        description="Build the manifest collections excluded from the view layer, "
+                    "so that the scene is updated once at the end of the import "
+                    "rather than after every model, and import a model referenced "
+                    "by several annotations once, copying it for the later ones. "
+                    "Recommended for manifests with many annotations",
+        default=False,
+    )
+    
+    keep_original: BoolProperty(  # type: ignore
+        name="Keep Original Manifest",
+        description="Store the imported manifest with the manifest collection, "
+                    "so that an export can be written as a patch against it. "
+                    "Adds a compressed copy of the manifest to the blend file",
+        default=False,
+    )
+    
+    import_mode: EnumProperty(  # type: ignore
+        name="Models",
+        description="How the models of the manifest are imported",
+        items=[
+            ("FULL", "Full Models", "Download and import the geometry of every model"),
+            ("PROXY", "Bounding Box Proxies",
+                "Create a box placeholder for each model, sized from the bounds in the glTF json. "
+                "The geometry can be loaded later for selected objects"),
+        ],
+        default="FULL",
+    )
+    
+    on_failure: EnumProperty(  # type: ignore
+        name="Failed Models",
+        description="What is done when a model cannot be downloaded or imported "
+                    "after the retries, or for Bounding Box Proxies when its bounds "
+                    "cannot be retrieved",
+        items=[
+            ("ABORT", "Abort", "Stop the import with an error"),
+            ("SKIP", "Placeholder",
+                "Create a box placeholder for the model and continue; the model "
+                "can be loaded later with Load IIIF Models"),
+            ("DEFER", "Retry at End",
+                "Create a box placeholder and continue, then try the failed models "
+                "once more after the rest of the manifest is imported"),
+        ],
+        default="ABORT",
+    )
 
     manifest_data: dict
+    prefetcher: Optional[ModelPrefetcher]
+    
+    # model_registry : key is the (id, format) of a model resource
+    # value is the Blender object first imported for it during this
+    # execution of the operator
+    model_registry: Dict[Tuple[str,str], Object]
+    
+    # placeholders created for the models that failed, with on_failure SKIP or DEFER;
+    # in PROXY import_mode the unit cube proxies of the models whose bounds failed
+    failed_models: List[Object]
 
     def execute(self, context: Context) -> Set[str]:
         self.context : Context = context
+        self.prefetcher = None
+        self.model_registry = {}
+        self.failed_models = []
+        self.excluded_collection : Optional[Collection] = None
+        self.staging_collection : Optional[Collection] = None
+        self.previous_active_collection : Optional[Collection] = None
+        start_time = time.perf_counter()
+        configure_timing()
+        configure_network()
+        get_connection_pool().reset_stats()
+        get_failure_registry().reset()
+        get_url_mapper().reset_stats()
         try:
-            with open(self.filepath, "r", encoding="utf-8") as f:
-                self.manifest_data = json.load(f)
-
-            self.process_manifest(self.manifest_data)
+            with span("import_manifest", file=self.filepath):
+                self.import_file()
             return {"FINISHED"}
         except Exception as e:
             raise
             self.report({"ERROR"}, f"Error reading manifest: {str(e)}")
             return {"CANCELLED"}
+        finally:
+            with span("end_bulk_mode"):
+                self.end_bulk_mode()
+            logger.info("import of %s took %.3f s (bulk mode %s)" % 
+                        (self.filepath, time.perf_counter() - start_time, self.bulk_mode))
+            for line in get_connection_pool().stats_lines():
+                logger.info("connections %s" % line)
+            for line in get_url_mapper().stats_lines():
+                logger.info("url rewrite %s" % line)
+            for line in get_failure_registry().summary_lines():
+                logger.warning("download %s" % line)
+            finish_trace("import of %s" % self.filepath)
+            
+    def import_file(self) -> None:
+        # Developer Note: the prefetcher context is exited before the
+        # TemporaryDirectory context, so that no download is still writing
+        # into the directory when it is deleted
+        with tempfile.TemporaryDirectory(dir=bpy.app.tempdir) as tempdirname:
+            if self.import_mode == "PROXY":
+                prefetcher = ModelPrefetcher(   tempdirname, 
+                                                self.prefetch_workers,
+                                                fetch = lambda url, _path: read_model_bounds(url))
+            else:
+                prefetcher = ModelPrefetcher(   tempdirname, 
+                                                self.prefetch_workers, 
+                                                get_download_cache())
+            with prefetcher:
+                self.prefetcher = prefetcher
+                if self.use_streaming:
+                    with open(self.filepath, "r", encoding="utf-8") as f:
+                        self.stream_manifest( JSONStreamReader(f) )
+                else:
+                    with span("parse_manifest"):
+                        with open(self.filepath, "r", encoding="utf-8") as f:
+                            self.manifest_data = json.load(f)
+                    prefetcher.submit_all( filter(is_retrievable, collect_model_urls(self.manifest_data)) )
+                    self.process_manifest(self.manifest_data)
+            self.prefetcher = None
+        
+        if self.failed_models and self.on_failure == "DEFER":
+            with span("deferred_models"):
+                self.load_failed_models()
+        if self.failed_models and self.import_mode == "PROXY":
+            self.report({"WARNING"}, "bounds of %i models could not be retrieved, their proxies are unit cubes"
+                                        % len(self.failed_models))
+        elif self.failed_models:
+            self.report({"WARNING"}, "%i models could not be loaded and were imported as placeholders"
+                                        % len(self.failed_models))
+            
+    def load_failed_models(self) -> None:
+        """
+        tries once more to load the models of the placeholders in failed_models,
+        the placeholders of models which fail again are kept
+        """
+        registry = get_failure_registry()
+        for proxy in self.failed_models:
+            registry.forget( proxy.get("iiif_id", "") )
+            
+        if self.import_mode == "PROXY":
+            self.load_failed_bounds()
+            return
+            
+        loaded : Dict[ Tuple[str,str], Object] = {}
+        remaining : List[Object] = []
+        for proxy in self.failed_models:
+            model_url = proxy.get("iiif_id", "")
+            if registry.has_failed(model_url):
+                remaining.append(proxy)
+                continue
+            try:
+                load_proxy_model(proxy, loaded)
+            except ImportManifestError as exc:
+                logger.warning("deferred load of %s failed: %s" % (model_url, exc))
+                remaining.append(proxy)
+        logger.info("%i of %i deferred models loaded" % 
+                        (len(self.failed_models) - len(remaining), len(self.failed_models)))
+        self.failed_models = remaining
+        
+    def load_failed_bounds(self) -> None:
+        """
+        in PROXY import_mode, retrieves once more the bounds of the unit cube
+        proxies in failed_models and resizes them; the linked duplicates of a
+        proxy share its mesh and are resized with it
+        """
+        from .editing.models import set_proxy_bounds
+        
+        remaining : List[Object] = []
+        for proxy in self.failed_models:
+            model_url = proxy.get("iiif_id", "")
+            try:
+                bounds = read_model_bounds(model_url)
+            except RETRIEVAL_ERRORS as exc:
+                logger.warning("deferred bounds of %s failed: %r" % (model_url, exc))
+                remaining.append(proxy)
+                continue
+            set_proxy_bounds(proxy, bounds)
+        logger.info("%i of %i deferred proxy bounds retrieved" % 
+                        (len(self.failed_models) - len(remaining), len(self.failed_models)))
+        self.failed_models = remaining
+            
+    def begin_bulk_mode(self, main_collection : Collection) -> None:
+        """
+        exclude the main_collection, and so all the collections that will be 
+        created under it, from the view layer. Objects linked into excluded
+        collections are not evaluated by the depsgraph after each operation.
+        
+        The nested import operators link the objects they create into the
+        active collection; it is set to an empty staging collection, from which
+        each model is moved into the excluded collections once imported
+        """
+        # Developer Note: the active collection cannot be the excluded
+        # main_collection: Blender only activates a layer collection in the
+        # view layer, and the glTF importer selects and activates the objects
+        # it creates, which fails for an object outside the view layer. So the
+        # staging collection holds at most the model being imported
+        view_layer = self.context.view_layer
+        scene = self.context.scene
+        if view_layer is None or scene is None:
+            return
+        if set_collection_excluded(view_layer, main_collection, True):
+            self.excluded_collection = main_collection
+            
+        self.previous_active_collection = view_layer.active_layer_collection.collection
+        staging_collection = bpy.data.collections.new("IIIF bulk import")
+        scene.collection.children.link(staging_collection)
+        self.staging_collection = staging_collection
+        if not set_active_collection(view_layer, staging_collection):
+            logger.warning("bulk import staging collection not activated")
+        
+    def end_bulk_mode(self) -> None:
+        view_layer = self.context.view_layer
+        scene = self.context.scene
+        if self.staging_collection is not None:
+            if view_layer is not None and self.previous_active_collection is not None:
+                set_active_collection(view_layer, self.previous_active_collection)
+            # objects of a nested import that failed are kept in the scene
+            if scene is not None:
+                for blender_object in list(self.staging_collection.objects):
+                    scene.collection.objects.link(blender_object)
+            bpy.data.collections.remove(self.staging_collection)
+        self.staging_collection = None
+        self.previous_active_collection = None
+        
+        if self.excluded_collection is not None and view_layer is not None:
+            set_collection_excluded(view_layer, self.excluded_collection, False)
+            view_layer.update()
+        self.excluded_collection = None
 
     def process_manifest(self, manifest_data: dict) -> None:
         """Process the manifest data and import the model"""
+        main_collection = self.begin_manifest(manifest_data)
+        if self.keep_original:
+            # stored before the items are removed from manifest_data
+            with span("store_original"):
+                IIIFMetadata(main_collection).store_manifest(manifest_data)
+
+        if "items" in manifest_data:
+            # Developer Note: the items not imported as Scenes are kept 
+            # in the manifest iiif_json; a filtered list is built rather than 
+            # removing items from a copy, which is O(n^2) for large lists
+            manifest_data["items"] = [
+                item for item in manifest_data["items"] 
+                if not self.process_manifest_item(item, main_collection)
+            ]
 
+        set_json_property(main_collection, manifest_data)            
+        
+    def begin_manifest(self, manifest_data: dict) -> Collection:
         logger.debug("call Configure3DViewport")
         res = bpy.ops.iiif.configure_viewport() # pyright: ignore[reportAttributeAccessIssue]
         logger.debug("result Configure3DViewport: %s" % res)
@@ -84,20 +475,36 @@ class ImportManifest(Operator, ImportHelper):
         main_collection = new_manifest( manifest_data )
         if self.context.scene is not None:
             move_collection_into_parent( main_collection, self.context.scene.collection)
-
-        if "items" in manifest_data:
-            for item in manifest_data["items"][:]: # iterate over a copy
-                if item.get("type",None) == SCENE_TYPE:
-                    self.process_scene(item, main_collection)
-                    manifest_data["items"].remove(item)
-
-        main_collection["iiif_json"] = json.dumps(manifest_data)            
+            if self.bulk_mode:
+                self.begin_bulk_mode(main_collection)
+        return main_collection
+        
+    def process_manifest_item(self, item: dict, main_collection: Collection) -> bool:
+        """
+        returns True if the item was imported into Blender
+        """
+        if item.get("type",None) == SCENE_TYPE:
+            self.process_scene(item, main_collection)
+            return True
+        return False
 
     def process_scene(self, scene_data: dict, manifest_collection : Collection) -> None:
         """Process annotation pages in a scene"""
+        scene_collection = self.begin_scene( scene_data, manifest_collection)
+        
+        if "items" in scene_data:
+            scene_data["items"] = [
+                item for item in scene_data["items"]
+                if not self.process_scene_item(item, scene_collection)
+            ]
+        self.end_scene(scene_data, scene_collection)
+        
+    def begin_scene(self, scene_data: dict, manifest_collection : Collection) -> Collection:
         scene_collection = new_scene( scene_data)
         move_collection_into_parent(scene_collection, manifest_collection)
+        return scene_collection
         
+    def end_scene(self, scene_data: dict, scene_collection : Collection) -> None:
         bgColorHex = scene_data.get("backgroundColor", None)
         if bgColorHex:            
             bgColor=hex_to_rgba(bgColorHex)
@@ -106,35 +513,180 @@ class ImportManifest(Operator, ImportHelper):
             scene_collection.background.export = True   # type: ignore
         
             del scene_data["backgroundColor"]
+        set_json_property(scene_collection, scene_data)
         
-        
-        if "items" in scene_data:
-            for item in scene_data.get("items", [])[:]:
-                if item.get("type") == ANNOTATIONPAGE_TYPE:
-                    self.process_annotation_page(item, scene_collection)
-                    scene_data["items"].remove(item)
-        scene_collection["iiif_json"] = json.dumps( scene_data )
+    def process_scene_item(self, item: dict, scene_collection: Collection) -> bool:
+        """
+        returns True if the item was imported into Blender
+        """
+        if item.get("type") == ANNOTATIONPAGE_TYPE:
+            self.process_annotation_page(item, scene_collection)
+            return True
+        return False
         
     def process_annotation_page(
         self, annotation_page_data: dict, scene_collection: Collection
     ) -> None:
         page_collection = new_annotation_page( annotation_page_data )
         move_collection_into_parent(page_collection, scene_collection )
-        # note in following loop the loop is over a copy
-        # of the items list, generated by the [:] indexing
-        for item in annotation_page_data.get("items", [])[:]:
+        remaining_items : list = []
+        items = annotation_page_data.get("items", [])
+        with span("page_placements", count=len(items)):
+            placements = self.page_placements(items)
+        for item, placement in zip(items, placements):
             item_type = item.get("type","")
             if  item_type== ANNOTATION_TYPE:
-                self.process_annotation(item, page_collection)
-                annotation_page_data["items"].remove(item)
+                with span("process_annotation", id=item.get("id","")):
+                    self.process_annotation(item, page_collection, placement)
             else:
                 message= f"unknown resource type {item_type} in AnnotationPage"
                 logger.warn(message)
-        page_collection["iiif_json"] = json.dumps(annotation_page_data)
+                remaining_items.append(item)
+        if "items" in annotation_page_data:
+            annotation_page_data["items"] = remaining_items
+        set_json_property(page_collection, annotation_page_data)
+        
+    # Developer Note: The stream_ methods are the counterpart of the process_
+    # methods for use with a JSONStreamReader. The Manifest and Scene levels are
+    # walked key by key; each AnnotationPage is decoded whole and passed to
+    # process_annotation_page, so at most one page is held in memory.
+    # Where the "type" of a Scene follows its "items" the items have to be
+    # decoded whole before it is known they are AnnotationPages.
+        
+    def stream_manifest(self, reader: JSONStreamReader) -> None:
+        manifest_data : dict = {}
+        main_collection : Optional[Collection] = None
+        for key in reader.iter_object():
+            if key == "items" and reader.peek_type() == "array":
+                if main_collection is None:
+                    # the "type" and "id" may follow the items; the collection is
+                    # created from the keys read so far and refreshed at the end
+                    main_collection = self.begin_manifest( with_default_type(manifest_data, MANIFEST_TYPE) )
+                remaining_items : list = []
+                for _ in reader.iter_array():
+                    item = self.stream_manifest_item(reader, main_collection)
+                    if item is not None:
+                        remaining_items.append(item)
+                manifest_data["items"] = remaining_items
+            else:
+                manifest_data[key] = reader.read_value()
+                
+        if main_collection is None:
+            main_collection = self.begin_manifest( with_default_type(manifest_data, MANIFEST_TYPE) )
+        self.refresh_identity(main_collection, manifest_data)
+        set_json_property(main_collection, manifest_data)
+        if self.keep_original:
+            # Developer Note: the complete manifest is never decoded when streaming,
+            # the original is stored as the text of the file, compressed as it is
+            # read in chunks so that the text is not held in memory
+            with span("store_original"):
+                with open(self.filepath, "r", encoding="utf-8") as f:
+                    IIIFMetadata(main_collection).store_manifest_file( 
+                        f, main_collection.get("iiif_id", "not_supplied"))
+        
+    def stream_manifest_item(   self, reader: JSONStreamReader, 
+                                main_collection: Collection) -> Optional[dict]:
+        """
+        returns the item data if it was not imported as a Scene
+        """
+        if reader.peek_type() != "object":
+            return reader.read_value()
+            
+        scene_data : dict = {}
+        scene_collection : Optional[Collection] = None
+        for key in reader.iter_object():
+            if  key == "items" and scene_data.get("type") == SCENE_TYPE and \
+                reader.peek_type() == "array":
+                if scene_collection is None:
+                    scene_collection = self.begin_scene(scene_data, main_collection)
+                remaining_items : list = []
+                for _ in reader.iter_array():
+                    item = reader.read_value()
+                    if isinstance(item, dict) and item.get("type") == ANNOTATIONPAGE_TYPE:
+                        if self.prefetcher is not None:
+                            self.prefetcher.submit_all( filter(is_retrievable, collect_page_model_urls(item)) )
+                        self.process_annotation_page(item, scene_collection)
+                    else:
+                        remaining_items.append(item)
+                scene_data["items"] = remaining_items
+            else:
+                scene_data[key] = reader.read_value()
+                
+        if scene_data.get("type") != SCENE_TYPE:
+            return scene_data
+        if scene_collection is None:
+            self.process_scene(scene_data, main_collection)
+        else:
+            self.refresh_identity(scene_collection, scene_data)
+            self.end_scene(scene_data, scene_collection)
+        return None
+        
+    def refresh_identity(self, collection: Collection, data: dict) -> None:
+        """
+        A streamed resource whose "items" precede its other keys was created
+        from the keys read before the items; the id, type, and name of the
+        collection are derived again from the complete data. Where the data
+        has no id the generated id of the collection is kept
+        """
+        if "id" not in data:
+            data["id"] = collection.get("iiif_id")
+        elif collection.get("iiif_id") != data["id"]:
+            collection["iiif_id"] = data["id"]
+            reserve_id(data["id"])
+        if "type" in data:
+            collection["iiif_type"] = data["type"]
+        name = generate_name_from_data(data) or str(collection.get("iiif_type", "")).lower()
+        if name and collection.name != name:
+            collection.name = name
+
+    def page_placements(self, items : list) -> List[Optional[Placement]]:
+        """
+        the placements of the annotations in items computed together by
+        utils.batch_transforms; an entry is None where the annotation is to be
+        placed by get_object_placement: an item which is not an Annotation, an
+        annotation whose transforms do not combine into one placement, and
+        every item of a small page or of a page with an unsupported transform
+        """
+        if placements_from_iiif is None or len(items) < BATCH_PLACEMENT_MIN:
+            return [None] * len(items)
+            
+        def first_object( value ) -> dict:
+            if isinstance(value, list):
+                value = value[0] if value else None
+            return value if isinstance(value, dict) else {}
+            
+        try:
+            records = [ 
+                list( annotation_transforms( first_object(item.get("body", None)), 
+                                             first_object(item.get("target", None)) ) )
+                if item.get("type","") == ANNOTATION_TYPE else []
+                for item in items
+            ]
+            batch = placements_from_iiif(records)
+        except (KeyError, TypeError, ValueError) as exc:
+            logger.debug("batch placement of annotation page not used: %r" % exc)
+            return [None] * len(items)
+            
+        retVal : List[Optional[Placement]] = []
+        for row, item in enumerate(items):
+            if batch.split[row] or item.get("type","") != ANNOTATION_TYPE:
+                retVal.append(None)
+            else:
+                retVal.append( Placement(
+                    scaling = Scaling( Vector(batch.scaling[row].tolist()) ),
+                    rotation = Rotation( Quaternion(batch.rotation[row].tolist()) ),
+                    translation = Translation( Vector(batch.translation[row].tolist()) )
+                ))
+        return retVal
 
     def process_annotation(
-        self, annotation_data: dict, parent_collection: Collection
+        self, annotation_data: dict, parent_collection: Collection,
+        placement : Optional[Placement] = None
     ) -> None:
+        """
+        placement, if not None, is the placement of the body computed by
+        page_placements
+        """
         
         target_data =  force_as_object(
             force_as_singleton(annotation_data.get("target", None)), default_type="Scene"
@@ -162,10 +714,10 @@ class ImportManifest(Operator, ImportHelper):
         
         
         
-        anno_collection["iiif_json"] = json.dumps(annotation_data)
+        set_json_property(anno_collection, annotation_data)
         
         
-        new_object: Object = self.body_to_object(body_data, target_data )
+        new_object: Object = self.body_to_object(body_data, target_data, placement)
         
         LOOP_GUARD_MAX=8
         for depth, _obj in walk_object_tree(new_object):
@@ -175,7 +727,8 @@ class ImportManifest(Operator, ImportHelper):
             
         return
                     
-    def body_to_object(self, body_data : dict, target_data: dict) -> Object:
+    def body_to_object(self, body_data : dict, target_data: dict, 
+                             placement : Optional[Placement] = None) -> Object:
         """
         body is the  python dictionry obtained by unpacking hte json value of the body property.
         type of the outer layer of th dictionary may be SpecificResource, or may
@@ -190,7 +743,9 @@ class ImportManifest(Operator, ImportHelper):
         """     
         # placement_data is a dictionary whose entries will be filled with 
         # values from target and body, if either or both are SpecificResources   
-        placement:Placement = self.get_object_placement(body_data, target_data)
+        if placement is None:
+            with span("placement_from_annotation"):
+                placement = self.get_object_placement(body_data, target_data)
         
         
         if body_data["type"] == "SpecificResource":
@@ -211,7 +766,7 @@ class ImportManifest(Operator, ImportHelper):
         """
         download, create, and configure model object
         """
-        from .editing.models import configure_model
+        from .editing.models import configure_model, duplicate_linked_model, duplicate_model, new_proxy_model
         
         try:
             model_url = resource_data["id"]
@@ -219,44 +774,116 @@ class ImportManifest(Operator, ImportHelper):
             raise ImportManifestError("no url for model provided")
         mimetype = resource_data.get("format","")
         
-        scheme = uri_scheme(model_url)
-        if scheme in {"http" , "https"}:
-            _op_network : Callable[..., Set[str]] = bpy.ops.iiif.load_network_model # pyright:ignore[reportAttributeAccessIssue]
-            import_result = _op_network(model_url=model_url, mimetype = mimetype ) 
-            logger.debug("bpy.ops.iiif.load_network_model result: %r" % import_result)
-            if "FINISHED" not in import_result:
-                raise ImportManifestError("import Operation failed with %r" % import_result)
-
-        elif scheme in {"file"}:
-            _op_local : Callable[..., Set[str]] = bpy.ops.iiif.load_local_model # pyright:ignore[reportAttributeAccessIssue]
-            model_filepath = uri_to_path(model_url)
-            import_result = _op_local(filepath=model_filepath, mimetype = mimetype ) 
-            logger.debug("bpy.ops.iiif.load_network_model result: %r" % import_result)
-            if "FINISHED" not in import_result:
-                raise ImportManifestError("import Operation failed with %r" % import_result)
+        registry_key = (model_url, mimetype)
+        if self.instance_repeated_models and registry_key in self.model_registry:
+            new_model = duplicate_linked_model( self.model_registry[registry_key] )
+            logger.debug("linked duplicate of %s" % model_url)
+            configure_model(new_model, resource_data,  placement)
+            return new_model
+        if self.bulk_mode and registry_key in self.model_registry:
+            # in bulk mode a model is imported once with the import operator;
+            # a repeat is a copy with its own mesh, made with the data API
+            new_model = duplicate_model( self.model_registry[registry_key] )
+            logger.debug("duplicate of %s" % model_url)
+            configure_model(new_model, resource_data,  placement)
+            return new_model
         
+        if self.import_mode == "PROXY":
+            new_model = self.resource_data_to_proxy(model_url)
         else:
-            raise ImportManifestError("unsupported scheme %s for model url %s" % (scheme, model_url))
-                        
-        new_model = bpy.context.active_object
-        if new_model is None:
-            raise ImportManifestError("bpy.context.active_object not set")
+            try:
+                new_model = self.load_model(model_url, mimetype)
+            except ImportManifestError as exc:
+                if self.on_failure == "ABORT":
+                    raise
+                logger.warning("%s not loaded, placeholder created : %s" % (model_url, exc))
+                new_model = new_proxy_model( url_basename(model_url), None )
+                configure_model(new_model, resource_data,  placement)
+                self.failed_models.append(new_model)
+                return new_model
         
+        self.model_registry[registry_key] = new_model
         configure_model(new_model, resource_data,  placement)
         return new_model
          
+    def load_model(self, model_url : str, mimetype : str) -> Object:
+        """
+        imports the model, from the prefetched file if there is one;
+        raises ImportManifestError if it cannot be loaded
+        """
+        with span("prefetch_wait", id=model_url):
+            prefetched = self.prefetcher.result(model_url) if self.prefetcher else None
+        if prefetched is not None:
+            # the importer is called directly, not through the iiif.load_local_model
+            # operator, saving an operator call for each model
+            with span("load_local_model", id=model_url):
+                new_model = import_local_model( self.context,
+                                                prefetched.filepath, 
+                                                choose_mimetype( prefetched.content_type,
+                                                                 mimetype,
+                                                                 prefetched.filepath))
+            if new_model is None:
+                raise ImportManifestError("import of prefetched %s failed" % model_url)
+            return new_model
+            
+        # a url whose download failed after the retries, in the prefetcher
+        # or for an earlier annotation, is not requested again
+        if get_failure_registry().has_failed(model_url):
+            raise ImportManifestError("download of %s failed earlier in this import" % model_url)
+        with span("load_model_resource", id=model_url):
+            return load_model_resource(model_url, mimetype)
+         
+    def resource_data_to_proxy(self, model_url : str) -> Object:
+        """
+        create a box-shaped placeholder object sized from the bounds in the
+        glTF json; the geometry is loaded later with the iiif.load_proxy_models
+        operator
+        """
+        from .editing.models import new_proxy_model
+        
+        # in PROXY import_mode the prefetcher retrieves bounds, not files. A url
+        # submitted to it is not fetched again when its result is None, the
+        # bounds were not determinable or the retrieval failed; a failed
+        # retrieval is recorded in the failure registry, as for a download
+        registry = get_failure_registry()
+        bounds = None
+        if self.prefetcher is not None and self.prefetcher.was_submitted(model_url):
+            bounds = self.prefetcher.result(model_url)
+        elif registry.has_failed(model_url):
+            pass
+        elif is_retrievable(model_url):
+            try:
+                bounds = read_model_bounds(model_url)
+            except RETRIEVAL_ERRORS:
+                pass
+                
+        if registry.has_failed(model_url):
+            if self.on_failure == "ABORT":
+                raise ImportManifestError("bounds of %s could not be retrieved" % model_url)
+            logger.warning("bounds of %s not retrieved, unit cube proxy created" % model_url)
+            proxy = new_proxy_model( url_basename(model_url), None )
+            self.failed_models.append(proxy)
+            return proxy
+        return new_proxy_model( url_basename(model_url), bounds )
+        
     def resource_data_to_camera(self, resource_data, placement) -> Object:
         """
         create, and configure camera object
         """
-        from .editing.cameras import configure_camera
-        try:
-            retCode = bpy.ops.object.camera_add()
-            logger.info("obj.camera_add %r" % (retCode,))
-        except Exception as exc:
-            logger.error("add camera error", exc)
-
-        new_camera = bpy.context.active_object
+        from .editing.cameras import configure_camera, new_camera_object
+        if self.bulk_mode:
+            # in bulk mode the object is created with the data API, avoiding
+            # the operator call and the view layer update it triggers; the 
+            # object is linked into its annotation collection by the caller
+            new_camera : Optional[Object] = new_camera_object()
+        else:
+            try:
+                retCode = bpy.ops.object.camera_add()
+                logger.info("obj.camera_add %r" % (retCode,))
+            except Exception as exc:
+                logger.error("add camera error", exc)
+            new_camera = bpy.context.active_object
+            
         if new_camera is  None:
              raise  ImportManifestError("failed to add camera")
         # reminder 10/27/2025: The setup camera condigures the
@@ -290,22 +917,9 @@ class ImportManifest(Operator, ImportHelper):
         to combine the geometric effects of all placements on a resource.
         """
         
-        def iiif_transforms() -> Iterable[dict]:
-            """
-            generator yielding editing.Transform nodes
-            """
-            if  body_data.get("type","") == "SpecificResource":
-                for iiif_transform in body_data.get("transform",""):
-                    yield iiif_transform
-
-            if  target_data.get("type","") == "SpecificResource":
-                selector = force_as_singleton( target_data["selector"] )
-                if selector and selector.get("type","") == "PointSelector":
-                    yield selector
-                    
         placements = list(
             transformsToPlacements(                               
-                    map(Transform.from_iiif_dict, iiif_transforms())
+                    map(Transform.from_iiif_dict, annotation_transforms(body_data, target_data))
             )
         )
         
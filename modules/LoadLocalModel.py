@@ -1,4 +1,4 @@
-from typing import Set, Callable, Tuple
+from typing import Set, Callable, List, Optional, Tuple
 
 
 from .editing.models import  (  IIIF_TEMP_FORMAT, 
@@ -6,10 +6,11 @@ from .editing.models import  (  IIIF_TEMP_FORMAT,
                                 encode_blender_placement,
                                 walk_object_tree  )
 from .editing.transforms import  get_object_placement
+from .utils.timing import span
 
 import bpy
 from bpy.props import StringProperty
-from bpy.types import Context, Operator
+from bpy.types import Context, Object, Operator
 
 import logging
 logger = logging.getLogger("iiif.import_local_model")
@@ -75,66 +76,72 @@ class LoadLocalModel(Operator):
     )
         
     def execute(self, context: Context) -> Set[str]:
-        # the key string is a mimetype
-        # the value is callable object compatible with
-        # the Operator.execute method; it will accept a filepath argument
-        # and return set of result values
-        
-        # Developer note: this dictionary is constructed at run time
-        # so that an existing importer Operator can be wrapped at run-time
-        # with a wrapper function that supplied other import arguments
-
         logger.info(f"LoadLocalModel.execute self.mimetype: {self.mimetype}")
-        try:
-            handler, handler_name = handler_for_mimetype(self.mimetype)
-        except KeyError:
-            message = "unsupported mimetype : %s" % self.mimetype
-            logger.warn(message)
-            return {'CANCELLED'}
-           
-        try:
-            retCode = handler(filepath=self.filepath)
-            if "FINISHED" not in retCode:
-                logger.warn("import handler returned %r"  % (retCode,))
-                return retCode
-            if len(retCode) > 1:
-                logger.info( "import handler returned %r"  % (retCode,) )
-        except Exception as exc:
-            logger.error("glTF import error", exc)
-            return {"CANCELLED"}
-        
-        new_model = context.active_object
-        if new_model is None:
-            logger.warn("context.active_object is None")
+        if import_local_model(context, self.filepath, self.mimetype) is None:
             return {"CANCELLED"}
+        return {"FINISHED"}
 
-        # reminder: The IIIF_TEMP_FORMAT value is defined in editing.models
-        # this custom property is defined here and removed by the configure_model
-        # function; it is essentially a way of passing data from this Operator instance
-        # to client code that executes it. 
-        new_model[IIIF_TEMP_FORMAT] = self.mimetype
-        
-        
-        blender_transform_encoding : str  = encode_blender_placement(
-                                                get_object_placement(new_model)
-                                            )
-        logger.debug(f"initial transform: {blender_transform_encoding}")
-        new_model[INITIAL_TRANSFORM] = blender_transform_encoding
 
-        LOOP_GUARD_MAX=8
-        for depth, _obj in walk_object_tree(new_model):
-            if depth > LOOP_GUARD_MAX:
-                raise Exception("infinite (or too deep) object parent-child tree")
-            if depth > 0:
-                _obj.rotation_mode="ZYX"
-                _obj.lock_rotation = (True,True,True)
-                _obj.lock_scale = (True,True,True)
-                _obj.lock_location = (True,True,True)
-            
-            
-        
-        # properties 
-        return {"FINISHED"}
+def import_local_model( context : Context, filepath : str, mimetype : str ) -> Optional[Object]:
+    """
+    the work of the LoadLocalModel operator, for clients that import many
+    models and avoid the overhead of an operator call around the importer:
+    imports filepath with the importer for mimetype and returns the new
+    model, which is also the active object; or None, logged, if the
+    import failed
+    """
+    # the handler is a callable object compatible with the Operator.execute
+    # method; it will accept a filepath argument and return set of result values
+    
+    # Developer note: the handler dictionary is constructed at run time
+    # so that an existing importer Operator can be wrapped at run-time
+    # with a wrapper function that supplied other import arguments
+    try:
+        handler, handler_name = handler_for_mimetype(mimetype)
+    except KeyError:
+        logger.warning("unsupported mimetype : %s" % mimetype)
+        return None
+       
+    try:
+        with span("gltf_import", file=filepath):
+            retCode = handler(filepath=filepath)
+        if "FINISHED" not in retCode:
+            logger.warning("import handler returned %r"  % (retCode,))
+            return None
+        if len(retCode) > 1:
+            logger.info( "import handler returned %r"  % (retCode,) )
+    except Exception as exc:
+        logger.error("glTF import error %r" % exc)
+        return None
+    
+    new_model = context.active_object
+    if new_model is None:
+        logger.warning("context.active_object is None")
+        return None
+
+    # reminder: The IIIF_TEMP_FORMAT value is defined in editing.models
+    # this custom property is defined here and removed by the configure_model
+    # function; it is essentially a way of passing data from this Operator instance
+    # to client code that executes it. 
+    new_model[IIIF_TEMP_FORMAT] = mimetype
+    
+    
+    blender_transform_encoding : List[float]  = encode_blender_placement(
+                                            get_object_placement(new_model)
+                                        )
+    logger.debug(f"initial transform: {blender_transform_encoding}")
+    new_model[INITIAL_TRANSFORM] = blender_transform_encoding
+
+    LOOP_GUARD_MAX=8
+    for depth, _obj in walk_object_tree(new_model):
+        if depth > LOOP_GUARD_MAX:
+            raise Exception("infinite (or too deep) object parent-child tree")
+        if depth > 0:
+            _obj.rotation_mode="ZYX"
+            _obj.lock_rotation = (True,True,True)
+            _obj.lock_scale = (True,True,True)
+            _obj.lock_location = (True,True,True)
+    return new_model
 
 
 def wrapped_gltf(*args, **keyw) -> Set[str]:
@@ -1,21 +1,70 @@
 import os  
 import tempfile 
-import urllib.parse
-import urllib.request
-import shutil
 
-from typing import Set, Callable
+from typing import Set, Callable, Optional
 import bpy
 from bpy.props import StringProperty
 from bpy.types import Context, Operator
 
 from .LoadLocalModel import handler_for_mimetype
 from .editing.models import  mimetype_from_extension
+from .editing.fileops import uri_scheme, uri_to_path
+from .network.fetch import download_to_file, url_basename, ProgressCallback, RETRIEVAL_ERRORS
+from .network.mirror import get_url_mapper
+from .network.retry import get_failure_registry
+from .preferences import get_download_cache, configure_network
+from .utils.timing import span
 
 import logging
 logger = logging.getLogger("iiif.import_network_model")
 
 
+def choose_mimetype( http_mimetype : str, format_mimetype : str, model_basename : str) -> str:
+    """
+    logic for figuring out a mimetype to decode the resource as a 3D asset
+    
+    http_mimetype : the Content-Type of the HTTP response, or ""
+    format_mimetype : the format property of the IIIF resource, or ""
+    model_basename  : filename used to guess from the extension
+    """
+    for mime_choice in (http_mimetype, format_mimetype):
+        try:
+            handler_for_mimetype( mime_choice)
+        except KeyError:
+            continue
+        return mime_choice
+    
+    # if neither http_mimetype, format_mimetype are supported,
+    # try to get something from the extension on the model_basename
+    from_extension = mimetype_from_extension( model_basename )
+    if from_extension:
+        return from_extension
+        
+    # if all else fails, return mimetype for glb as the default:
+    return "model/gltf-binary"
+
+def window_manager_progress( window_manager ) -> ProgressCallback:
+    """
+    returns a download progress callback showing the fraction of the
+    download in the Blender progress indicator; the indicator is started
+    by the first call with a known total. The caller ends it with
+    window_manager.progress_end(). To be called on the main thread only.
+    """
+    last_percent : Optional[int] = None
+    
+    def progress( received : int, total : Optional[int] ) -> None:
+        nonlocal last_percent
+        if not total:
+            return
+        if last_percent is None:
+            window_manager.progress_begin(0, 100)
+        percent = min(100, received * 100 // total)
+        if percent != last_percent:
+            window_manager.progress_update(percent)
+            last_percent = percent
+            
+    return progress
+    
 
 class LoadNetworkModel(Operator):
     """ 
@@ -58,55 +107,44 @@ class LoadNetworkModel(Operator):
 
     def execute(self, context: Context) -> Set[str]:
         
+        configure_network()
+        # the url rewrite rules may map the url to a local file or mirror server,
+        # the model is still identified by model_url
+        source_url = get_url_mapper().resolve(self.model_url)
+        if uri_scheme(source_url) == "file":
+            return self.load_local_file( uri_to_path(source_url) )
+        
         if not bpy.app.online_access:
             self.report({"ERROR"}, "Network access disabled in Blender settings")
             logger.error("LoadNetworkModel.execute cancelled for bpy.app.online_access not true")
             return {"CANCELLED"}
             
         with tempfile.TemporaryDirectory(dir=bpy.app.tempdir) as tempdirname:
-            model_basename = os.path.basename( self.model_url)
+            model_basename = url_basename( self.model_url)
             local_filepath = os.path.join(tempdirname,model_basename)
            
-            with urllib.request.urlopen( self.model_url ) as http_open_context:
-                if http_open_context.status not in {200}:
-                    message = "HTTP status returned as %s : retrieval cancelled" \
-                                 % http_open_context.status
-                    logger.warn(message)
-                    return {"CANCELLED"}
-                 
-                try:
-                    http_mimetype = http_open_context.headers["Content-Type"]
-                    logger.debug(f"http header shows Content-Type {http_mimetype}")
-                except KeyError:
-                    http_mimetype = ""
-                    
-                    
-                with open(local_filepath, 'wb') as out_file:
-                    shutil.copyfileobj(http_open_context, out_file)
-                # closing out of urlopen Context Manager, with 
-                # URL data downloaded to local_filepath and 
-                # http_mimetype set to the Content-Type (or to "")
+            window_manager = context.window_manager
+            progress = window_manager_progress(window_manager)
+            try:
+                with span("download", id=self.model_url):
+                    cache = get_download_cache()
+                    if cache is not None:
+                        local_filepath, http_mimetype = cache.fetch(source_url, progress=progress)
+                    else:
+                        http_mimetype = download_to_file(source_url, local_filepath, progress=progress)
+            except RETRIEVAL_ERRORS as exc:
+                # the transient errors have been retried by download_with_retry
+                get_failure_registry().record_failure(self.model_url, exc)
+                logger.warning("%s : retrieval cancelled" % exc)
+                return {"CANCELLED"}
+            finally:
+                window_manager.progress_end()
+            get_failure_registry().record_success(self.model_url)
+            # URL data downloaded to local_filepath (possibly a file in the 
+            # persistent download cache) and http_mimetype set to the
+            # Content-Type (or to "")
     
-            # logic for figuring out a mimetype to decode the resource as a 3D asset
-            def choose_mimetype():
-                for mime_choice in (http_mimetype, self.mimetype):
-                    try:
-                        handler_for_mimetype( mime_choice)
-                    except KeyError:
-                        continue
-                    return mime_choice
-                
-                # if neither http_mimetype, self.mimetype are supported,
-                # try to get somethinf from the extension on the model_basename
-                try:
-                    return mimetype_from_extension( model_basename )
-                except Exception:
-                    pass
-                    
-                # if all else fails, return mimetype for glb as the default:
-                return "model/gltf-binary"
-                         
-            mimetype = choose_mimetype()
+            mimetype = choose_mimetype(http_mimetype, self.mimetype, model_basename)
             
             # call the ImportLocalModel Operator to import the contents
             # of the local_filepath file into Blender as a Blender Object
@@ -115,7 +153,7 @@ class LoadNetworkModel(Operator):
             res = _op(filepath=local_filepath, mimetype=mimetype)
             
             # Closing out of the TemporaryDirectory context manager. The directory
-            # and the local_filepath will be deleted.
+            # and the local_filepath, unless it is in the cache, will be deleted.
             # the res value is FINISHED or CANCELLED from the import of the local_filepath
             # and active_object should be set to the new Blender object. As well, the
             # IIIF_TEMP_FORMAT custom property will identify the mime-type that guided the
@@ -127,5 +165,18 @@ class LoadNetworkModel(Operator):
         # including this just as a sanity-check
         if context.active_object is None:
             message = "context.active object is None after iiif.import_local_model"
-            logger.warn(message)
+            logger.warning(message)
+        return {"FINISHED"}
+        
+    def load_local_file(self, filepath : str) -> Set[str]:
+        """
+        imports filepath, the local mirror of the model_url resource
+        """
+        logger.debug("%s read from mirror file %s" % (self.model_url, filepath))
+        mimetype = choose_mimetype("", self.mimetype, filepath)
+        _op : Callable[...,Set[str]] = \
+        bpy.ops.iiif.load_local_model # pyright:ignore[reportAttributeAccessIssue]
+        res = _op(filepath=filepath, mimetype=mimetype)
+        if "CANCELLED" in res:
+            return res
         return {"FINISHED"}
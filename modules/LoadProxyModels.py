@@ -0,0 +1,52 @@
+from typing import Dict, List, Set, Tuple
+
+from bpy.types import Context, Object, Operator
+
+from .editing.models import is_proxy_model
+from .ImportManifest import ImportManifestError, load_proxy_model
+
+import logging
+logger = logging.getLogger("iiif.load_proxy_models")
+
+
+class LoadProxyModels(Operator):
+    """
+    Replaces the selected model placeholders, created by importing a
+    manifest with Bounding Box Proxies, by the model geometry.
+    
+    The loaded model takes the placement of the placeholder and its place in
+    the annotation collection; the placeholder is deleted. A model referenced
+    by several selected placeholders is loaded once, the others become linked
+    duplicates.
+    """
+    
+    bl_idname = "iiif.load_proxy_models"
+    bl_label = "Load IIIF Models"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        return any( is_proxy_model(obj) for obj in cls.target_objects(context) )
+        
+    @staticmethod
+    def target_objects(context : Context) -> List[Object]:
+        objects = list(context.selected_objects or [])
+        if not objects and context.active_object is not None:
+            objects = [context.active_object]
+        return objects
+        
+    def execute(self, context: Context) -> Set[str]:
+        proxies = [ obj for obj in self.target_objects(context) if is_proxy_model(obj) ]
+        
+        loaded : Dict[ Tuple[str,str], Object] = {}
+        failures = 0
+        for proxy in proxies:
+            try:
+                load_proxy_model(proxy, loaded)
+            except ImportManifestError as exc:
+                logger.warning("loading %s failed: %s" % (proxy.get("iiif_id", ""), exc))
+                failures += 1
+                
+        if failures:
+            self.report({"WARNING"}, "%i of %i models could not be loaded" % (failures, len(proxies)))
+        return {"FINISHED"}
@@ -1,10 +1,9 @@
-import json
-
 import bpy
 from bpy.types import Operator
 
 
 from .editing.collections import new_manifest,new_scene,new_annotation_page
+from .editing.json_cache import get_json_property, set_json_property, thaw
 
 
 import logging
@@ -22,10 +21,11 @@ class NewManifest(Operator):
         manifest=new_manifest()
         # for new manifests add a default label, some viewers
         # require one
-        manifest_data : dict = json.loads( manifest["iiif_json"])
-        label : dict = manifest_data["label"]
+        manifest_data : dict = thaw( get_json_property(manifest) )
+        label : dict = thaw( manifest_data["label"] )
         label["en"] = ["Blender generated IIIF manifest"]
-        manifest["iiif_json"] = json.dumps( manifest_data )
+        manifest_data["label"] = label
+        set_json_property(manifest, manifest_data)
         
         logger.info("call Configure3DViewport")
         res = bpy.ops.iiif.configure_viewport() # pyright: ignore[reportAttributeAccessIssue]
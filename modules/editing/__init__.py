@@ -1,28 +1,100 @@
-from typing import Optional
+from typing import Dict, Optional
 import bpy
+from bpy.app.handlers import persistent
+import re
 import uuid
+
+from ..utils.timing import timed
     
 # module level constant
 RANDOM_TEXT  = str(uuid.uuid4())[:8]
 
-def generate_id(resource_type="Manifest") -> str:
-    """
-    
+# generated ids have the form https://<RANDOM_TEXT>/<resource type>/<integer>
+_GENERATED_ID_PATTERN = re.compile( r"https://%s/([^/]+)/([0-9]+)\s*$" % re.escape(RANDOM_TEXT) )
+
+class _IdAllocator:
     """
-    import re
+    keeps, for each resource type, the largest integer suffix of the 
+    generated ids in use, so that a new id is allocated without 
+    searching the Blender data.
     
+    The index is built with a single pass over bpy.data.objects and
+    bpy.data.collections on first use after the add-on is loaded or a
+    .blend file is opened. Ids assigned to Blender objects or collections
+    by other means are recorded through reserve_id.
     
-    prefix = "https://%s/%s/" % ( RANDOM_TEXT, resource_type.lower())
-    re_pattern= re.compile( prefix+r"([0-9]+)\s*$" )
-    imax=0
-    for obj_or_col in ( list(bpy.data.objects) + list(bpy.data.collections) ):
-        match = re_pattern.match( obj_or_col.get("iiif_id", ""))
+    Developer Note: the counters only increase; an id that was allocated
+    and then discarded (for example by undo) is not reused, which
+    is harmless as the ids only need to be unique.
+    """
+    def __init__(self):
+        self._counters : Optional[Dict[str,int]] = None
+        
+    def invalidate(self) -> None:
+        self._counters = None
+        
+    def _index(self) -> Dict[str,int]:
+        if self._counters is None:
+            counters : Dict[str,int] = {}
+            for collection in (bpy.data.objects, bpy.data.collections):
+                for obj_or_col in collection:
+                    self._record( counters, obj_or_col.get("iiif_id", None))
+            self._counters = counters
+        return self._counters
+        
+    @staticmethod
+    def _record( counters : Dict[str,int], iiif_id ) -> None:
+        if not isinstance(iiif_id, str):
+            return
+        match = _GENERATED_ID_PATTERN.match( iiif_id )
         if match:
-            val = int( match.group(1) )
+            key = match.group(1)
+            counters[key] = max( counters.get(key, 0), int(match.group(2)))
             
-            imax = max(imax,val)
-    retVal = prefix + str(imax+1)
-    return retVal
+    def next_id(self, resource_type : str) -> str:
+        counters = self._index()
+        key = resource_type.lower()
+        value = counters.get(key, 0) + 1
+        counters[key] = value
+        return "https://%s/%s/%i" % (RANDOM_TEXT, key, value)
+        
+    def reserve(self, iiif_id) -> None:
+        # if the index has not been built yet the id will be found
+        # when it is built
+        if self._counters is not None:
+            self._record(self._counters, iiif_id)
+
+_allocator = _IdAllocator()
+
+@timed("generate_id")
+def generate_id(resource_type="Manifest") -> str:
+    """
+    returns a new id for a resource of type resource_type, distinct from
+    the iiif_id of every Blender object and collection and from every id
+    previously returned in this session
+    """
+    return _allocator.next_id(resource_type)
+    
+def is_generated_id( iiif_id : str ) -> bool:
+    """
+    True if iiif_id was returned by generate_id in this session
+    """
+    return _GENERATED_ID_PATTERN.match(iiif_id) is not None
+    
+def reserve_id( iiif_id : str ) -> None:
+    """
+    to be called when an id is assigned to the iiif_id property
+    of a Blender object or collection
+    """
+    _allocator.reserve(iiif_id)
+
+@persistent
+def reset_id_allocator(*args) -> None:
+    """
+    bpy.app.handlers.load_post handler, the index of generated ids
+    is rebuilt from the newly loaded file when next needed
+    """
+    _allocator.invalidate()
 
 def generate_name_from_data( data : dict ) -> Optional[str] : 
     """
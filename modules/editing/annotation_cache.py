@@ -0,0 +1,123 @@
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Collection
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from .json_cache import freeze
+
+import logging
+logger = logging.getLogger("iiif.annotation_cache")
+
+# Developer Note:
+# The export of an Annotation requires json decoding of the iiif_json of the
+# annotation and of its body, the composition and simplification of the
+# transforms, and new ids for the SpecificResource, PointSelector and Transform
+# resources. The AnnotationFragmentCache keeps the exported data of each
+# annotation, so that a repeated export only recomputes the annotations that
+# have been changed since.
+#
+# An entry records the datablocks its data was computed from: the annotation
+# collection, the body object and its data, and the target scene collection.
+# The depsgraph_update_post handler discards the entries of each updated
+# datablock, and of the collections containing an updated object; an entry
+# still in the cache is clean, and is reused without reading anything from
+# Blender but the session_uid of the annotation collection.
+#
+# set_json_property and set_json_text tag the datablock for a depsgraph update.
+# A custom property set directly from a python script does not go through the
+# depsgraph; such a script calls update_tag() on the datablock, or
+# clear_fragment_cache().
+#
+# Entries are keyed by the session_uid of the annotation collection, which
+# unlike as_pointer() is never reused for another datablock in the session.
+# The whole cache is cleared on file load, undo, and redo. The data stored are
+# frozen (see json_cache), the dicts handed out are shared and read-only.
+#
+# The cache holds the data of every annotation exported, so a streaming export,
+# which is meant to not hold the manifest in memory, does not use it.
+
+
+class AnnotationFragmentCache:
+
+    def __init__(self):
+        # _entries: key is the session_uid of the annotation collection,
+        # value is (export options, frozen annotation data)
+        self._entries : Dict[int, Tuple[Hashable, dict]] = {}
+        # _dependents: key is the session_uid of a datablock, value the keys
+        # of the entries computed from it
+        self._dependents : Dict[int, Set[int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, anno_collection : Collection, options : Hashable) -> Optional[dict]:
+        """
+        returns the cached data for the annotation, or None. The returned
+        dict is frozen, and shared with the cache
+        """
+        entry = self._entries.get( anno_collection.session_uid, None)
+        if entry is not None and entry[0] == options:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def store(self, anno_collection : Collection, options : Hashable, fragment : dict,
+                    sources : Iterable[Optional[bpy.types.ID]] = ()) -> dict:
+        """
+        stores a frozen copy of fragment, the data exported for the annotation 
+        computed from the sources datablocks, and returns it
+        """
+        key = anno_collection.session_uid
+        frozen = freeze(fragment)
+        self._entries[key] = (options, frozen)
+        self._dependents.setdefault(key, set()).add(key)
+        for source in sources:
+            if source is not None:
+                self._dependents.setdefault(source.session_uid, set()).add(key)
+        return frozen
+
+    def discard(self, uid : int) -> None:
+        """
+        discards the entries computed from the datablock with session_uid uid
+        """
+        for key in self._dependents.pop(uid, ()):
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._dependents.clear()
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+_fragment_cache = AnnotationFragmentCache()
+
+def get_fragment_cache() -> AnnotationFragmentCache:
+    return _fragment_cache
+
+@persistent
+def discard_updated_annotations(scene, depsgraph = None) -> None:
+    """
+    bpy.app.handlers.depsgraph_update_post handler, discards the entries
+    computed from the datablocks updated and for the collections containing
+    updated objects
+    """
+    if depsgraph is None or len(_fragment_cache) == 0:
+        return
+    for update in depsgraph.updates:
+        id_data = update.id.original
+        _fragment_cache.discard( id_data.session_uid )
+        if isinstance(id_data, bpy.types.Object):
+            for collection in id_data.users_collection:
+                _fragment_cache.discard( collection.session_uid )
+
+@persistent
+def clear_fragment_cache(*args) -> None:
+    """
+    bpy.app.handlers load_post, undo_post, and redo_post handler
+    """
+    _fragment_cache.clear()
@@ -1,18 +1,21 @@
-import json
 import math
+import bpy
 from bpy.types import Object
 from mathutils import Quaternion
 
 from typing import List
 
-from . import generate_id
+from . import generate_id, reserve_id
 from ..utils.json_patterns import force_as_singleton
+from ..utils.timing import timed
+from .json_cache import set_json_property
 from ..editing.transforms import Transform, Rotation, Placement, transformsToPlacements
 
 import logging
 logger = logging.getLogger("iiif.cameras")
 logger.setLevel(logging.DEBUG)
 
+@timed("configure_camera")
 def configure_camera(   new_camera : Object,                                                 
                         resource_data : dict,
                         placement : Placement ) -> None:
@@ -31,7 +34,8 @@ def configure_camera(   new_camera : Object,
     
     new_camera["iiif_type"] = resource_data["type"]
     new_camera["iiif_id"]   = resource_data["id"]
-    new_camera["iiif_json"] = json.dumps(resource_data)
+    reserve_id(resource_data["id"])
+    set_json_property(new_camera, resource_data)
     
     new_camera.location = placement.translation.data
      
@@ -46,6 +50,17 @@ def configure_camera(   new_camera : Object,
     return
 
 
+def new_camera_object( name : str = "Camera" ) -> Object:
+    """
+    returns a new camera object created with the bpy.data API; 
+    not linked into any collection
+    
+    Unlike the bpy.ops.object.camera_add operator this does not change the
+    active object or trigger an update of the view layer
+    """
+    camera_data = bpy.data.cameras.new(name)
+    return bpy.data.objects.new(name, camera_data)
+
 def _initial_data() -> dict :
     retVal = {
         "id" : generate_id("PerspectiveCamera"),
@@ -1,10 +1,13 @@
 import bpy
 import json
+from bpy.app.handlers import persistent
 from bpy.types import Collection, Object
-from  typing import Optional
+from  typing import Dict, List, Optional
 
-from . import generate_id, generate_name_from_data
+from . import generate_id, generate_name_from_data, reserve_id
 from ..utils.blender_setup import get_scene_background_color
+from ..utils.timing import timed
+from .json_cache import set_json_property
 import logging
 logger = logging.getLogger("iiif.collections")
 logger.setLevel(logging.INFO)
@@ -24,6 +27,7 @@ SCENE_TYPE=   "Scene"
 ANNOTATIONPAGE_TYPE= "AnnotationPage"
 ANNOTATION_TYPE = "Annotation"
 
+@timed("new_collection")
 def _new_collection( data:dict) -> Collection:
     """
     returns a Blender collection for which:
@@ -43,9 +47,11 @@ def _new_collection( data:dict) -> Collection:
     blender_name : str = generate_name_from_data( data ) or collection_type.lower()
     
     retVal  = bpy.data.collections.new(blender_name)
+    invalidate_resource_graph()
     retVal["iiif_id"] =    data["id"]
+    reserve_id(data["id"])
     retVal["iiif_type"] =  data["type"]
-    retVal["iiif_json"] = json.dumps(data)
+    set_json_property(retVal, data)
     
     # developer note: the iiif_json property will be set after the
     # child resources from the "items" list have been removed (and used
@@ -80,9 +86,12 @@ def new_annotation( data:Optional[dict] = None ) -> Collection:
     return _new_collection(valid_data)
 
 
+@timed("move_collection_into_parent")
 def move_collection_into_parent(child: Collection, parent:Collection ) -> None:
     parent.children.link(child)
+    invalidate_resource_graph()
     
+@timed("move_object_into_collection")
 def move_object_into_collection(blender_object : Object, parent: Collection ) -> None:
     """
     In Blender an Object can be in multiple collections
@@ -93,8 +102,41 @@ def move_object_into_collection(blender_object : Object, parent: Collection ) ->
     for coll in blender_object.users_collection:
         coll.objects.unlink(blender_object)
     parent.objects.link(blender_object)
+    invalidate_resource_graph()
 
+
+def set_collection_excluded(view_layer, collection : Collection, excluded : bool) -> bool:
+    """
+    sets the exclude property of the layer collection of collection in
+    view_layer; returns False if the collection is not in the view layer
+    """
+    layer_collection = _find_layer_collection(view_layer.layer_collection, collection)
+    if layer_collection is None:
+        return False
+    layer_collection.exclude = excluded
+    return True
+    
+def set_active_collection(view_layer, collection : Collection) -> bool:
+    """
+    makes the layer collection of collection the active one of view_layer,
+    into which operators link the objects they create; returns False if the
+    collection is not in the view layer. Blender does not activate an
+    excluded layer collection
+    """
+    layer_collection = _find_layer_collection(view_layer.layer_collection, collection)
+    if layer_collection is None:
+        return False
+    view_layer.active_layer_collection = layer_collection
+    return view_layer.active_layer_collection.collection == collection
     
+def _find_layer_collection(layer_collection, collection : Collection):
+    if layer_collection.collection == collection:
+        return layer_collection
+    for child in layer_collection.children:
+        found = _find_layer_collection(child, collection)
+        if found is not None:
+            return found
+    return None
     
 _collection_template_dict  = {
     MANIFEST_TYPE : {
@@ -151,45 +193,94 @@ Blender collections
 """
 
 
+class _ResourceGraph:
+    """
+    index of the Blender collections that represent IIIF resources, 
+    built in one pass over bpy.data.collections:
+        by_type  : iiif_type -> collections, in bpy.data.collections order
+        parent   : collection -> first collection (in bpy.data.collections
+                   order) that has it as a child
+        children : collection -> child collections, in children order
+        bodies   : Annotation collection -> objects with an iiif_type
+    
+    Collections are keyed by as_pointer(), the index is discarded on any
+    depsgraph update, file load, undo or redo and by the functions of this
+    module that create or re-parent collections; so pointers are never
+    used after the datablocks may have been freed.
+    """
+    def __init__(self):
+        self.by_type  : Dict[str, List[Collection]] = {}
+        self.parent   : Dict[int, Collection] = {}
+        self.children : Dict[int, List[Collection]] = {}
+        self.bodies   : Dict[int, List[Object]] = {}
+        
+        for coll in bpy.data.collections:
+            iiif_type = coll.get("iiif_type", None)
+            if iiif_type is None:
+                continue
+            key = coll.as_pointer()
+            self.by_type.setdefault(iiif_type, []).append(coll)
+            self.children[key] = list(coll.children)
+            for child in self.children[key]:
+                self.parent.setdefault(child.as_pointer(), coll)
+            if iiif_type == ANNOTATION_TYPE:
+                self.bodies[key] = [obj for obj in coll.objects if obj.get("iiif_type", None)]
+
+_resource_graph : Optional[_ResourceGraph] = None
+
+def _get_resource_graph() -> _ResourceGraph:
+    global _resource_graph
+    if _resource_graph is None:
+        _resource_graph = _ResourceGraph()
+    return _resource_graph
+    
+@persistent
+def invalidate_resource_graph(*args) -> None:
+    """
+    handler for bpy.app.handlers depsgraph_update_post, load_post,
+    undo_post and redo_post; also called directly when collections are
+    created or re-parented within an operator
+    """
+    global _resource_graph
+    _resource_graph = None
+    
 def _find_resources_by_type(what_iiif_type:str) -> list[Collection]:
-    return [
-        coll for coll in bpy.data.collections \
-        if coll.get("iiif_type", None) == what_iiif_type \
-    ]
+    return list( _get_resource_graph().by_type.get(what_iiif_type, []) )
         
 
 def _find_enclosing_resource(iiif_resource : Collection, enclosing_type : str ):
     """
-    iiif_resource must be a Python instances for which the calls
-    iiif_resource.get("iiif_id") and
-    iiif_resource.get("iiif_type")
-    return strings, 
+    iiif_resource must be a Blender collection for which the call
+    iiif_resource.get("iiif_type") returns a string
     
     enclosing_type will be one of:
     Manifest, Scene, AnnotationPage
     
-    will return the Blender Collection instance that matches teh enclosing_type
+    will return the Blender Collection instance that matches the enclosing_type
     """
     parent_type_dict = {
         ANNOTATION_TYPE : ANNOTATIONPAGE_TYPE ,
         ANNOTATIONPAGE_TYPE : SCENE_TYPE,
         SCENE_TYPE : MANIFEST_TYPE
     }
-    search_id = iiif_resource.get("iiif_id", None)
-    if search_id is None:
-        return None
-        
-    for coll in _find_resources_by_type(parent_type_dict[iiif_resource.get("iiif_type",None)]):
-        
-        for ch in coll.children:
-            if ch.get("iiif_id",None) == search_id:
-                if coll.get("iiif_type", None) == enclosing_type:
-                    return coll
-                else:
-                    return _find_enclosing_resource(coll, enclosing_type)
+    graph = _get_resource_graph()
+    resource = iiif_resource
+    while True:
+        parent_type = parent_type_dict.get( resource.get("iiif_type", None), None)
+        parent = graph.parent.get( resource.as_pointer(), None)
+        if parent_type is None or parent is None or parent.get("iiif_type", None) != parent_type:
+            return None
+        if parent_type == enclosing_type:
+            return parent
+        resource = parent
 
 def _find_child_resources_by_type( parent_collection, what_iiif_type ):
-    return [coll for coll in parent_collection.children \
+    graph = _get_resource_graph()
+    children = graph.children.get( parent_collection.as_pointer(), None)
+    if children is None:
+        # not an IIIF resource collection, so not in the index
+        children = parent_collection.children
+    return [coll for coll in children \
             if coll.get("iiif_type",None) == what_iiif_type ]
               
 def getTargetScene(iiif_resource):
@@ -219,9 +310,11 @@ def getAnnotations(page_collection):
     
 def getBodyObject(anno_collection) -> bpy.types.Object | None:
     
-    bodyObjList = [obj for obj in anno_collection.objects if obj.get("iiif_type", None)]
+    bodyObjList = _get_resource_graph().bodies.get( anno_collection.as_pointer(), None)
+    if bodyObjList is None:
+        bodyObjList = [obj for obj in anno_collection.objects if obj.get("iiif_type", None)]
     if len(bodyObjList) == 0:
         return None
     if len(bodyObjList) > 1:
         logger.warning("multiple body objects in single Annotation")
-    return bodyObjList[0]
\ No newline at end of file
+    return bodyObjList[0]
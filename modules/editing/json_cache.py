@@ -0,0 +1,255 @@
+import json
+import zlib
+import bpy
+from bpy.app.handlers import persistent
+from typing import Any, Dict, TextIO, Tuple, Union
+
+import logging
+logger = logging.getLogger("iiif.json_cache")
+
+# Developer Note:
+# The IIIF data of manifests, scenes, annotations, and their bodies is stored
+# as json-encoded strings in custom properties (iiif_json and the IIIFMetadata
+# properties). get_json_property decodes such a property once and returns the
+# same decoded value until the string stored in the property changes.
+#
+# The cache is keyed by (as_pointer() of the datablock, property name), each
+# entry holds the string that was decoded; a lookup compares the current
+# string with it, which is far cheaper than decoding it again.
+#
+# The values handed out are shared by all readers, so they are FrozenDict and
+# FrozenList instances which raise TypeError on modification. A client that
+# needs to modify the data calls thaw on the value (or on a nested value) for
+# a mutable shallow copy, and encodes the result back into the property.
+# FrozenDict and FrozenList are subclasses of dict and list, so json.dumps and
+# isinstance checks treat them as the plain types.
+#
+# The setters tag the datablock for a depsgraph update, so that the
+# depsgraph_update_post handlers see the change.
+#
+# Storage: the json text is written by set_json_property / set_json_text.
+# Texts of COMPRESS_MIN_LENGTH characters or more are stored as bytes,
+# STORAGE_PREFIX followed by the zlib compression of the utf-8 text with the
+# preset dictionary ZDICT; shorter texts are stored as strings, so that they
+# remain readable in the custom properties panel. ZDICT holds the keys and
+# values which recur in every annotation, so that even a small payload
+# compresses well. ZDICT must not be changed without changing STORAGE_PREFIX,
+# the files saved hold data compressed with it.
+# Strings stored by earlier versions are read as before, and are compressed
+# by the load_post handler compress_json_properties.
+
+MAX_ENTRIES = 100000
+
+COMPRESS_MIN_LENGTH = 256
+STORAGE_PREFIX = b"iiifz1:"
+
+ZDICT = (
+    '"label": {"en": ["'
+    '{"id": "https://'
+    '"type": "Annotation", "motivation": ["painting"], '
+    '"body": {"type": "SpecificResource", "source": '
+    '"type": "Model", "format": "model/gltf-binary"}, '
+    '"transform": [{"type": "ScaleTransform", "x": 1.0, "y": 1.0, "z": 1.0}, '
+    '{"type": "RotateTransform", "x": 0.0, "y": 0.0, "z": 0.0}, '
+    '{"type": "TranslateTransform", "x": 0.0, "y": 0.0, "z": 0.0}]'
+    '"target": {"type": "SpecificResource", "source": [{"id": "'
+    '"type": "Scene"}], "selector": [{"type": "PointSelector", '
+    '"type": "PerspectiveCamera", "fieldOfView": '
+    '"type": "AnnotationPage", "items": [], '
+    '"summary": {"en": ["'
+    '"metadata": [{"label": {"en": ["'
+    '"value": {"en": ["'
+    '"@context": "http://iiif.io/api/presentation/4/context.json", '
+    '"type": "Manifest", '
+).encode("utf-8")
+
+# names of the json-valued properties, converted by compress_json_properties
+JSON_PROPERTY_NAMES = ( "iiif_json", "iiif_manifest", "iiif_annotation", "iiif_body", "iiif_scene" )
+
+
+def encode_json_text( text : str ) -> Union[str,bytes]:
+    """
+    the value stored in a custom property for the json text
+    """
+    if len(text) < COMPRESS_MIN_LENGTH:
+        return text
+    compressor = zlib.compressobj(zdict=ZDICT)
+    return STORAGE_PREFIX + compressor.compress( text.encode("utf-8") ) + compressor.flush()
+
+def encode_json_stream( f : TextIO, chunk_size : int = 1 << 20 ) -> Union[str,bytes]:
+    """
+    as encode_json_text for the text read from f, which is compressed as it
+    is read in chunks of chunk_size characters; the text is not held in memory
+    """
+    text = f.read(chunk_size)
+    if len(text) < COMPRESS_MIN_LENGTH:
+        text += f.read(COMPRESS_MIN_LENGTH - len(text))
+        if len(text) < COMPRESS_MIN_LENGTH:
+            return text
+    compressor = zlib.compressobj(zdict=ZDICT)
+    parts = [STORAGE_PREFIX]
+    while text:
+        parts.append( compressor.compress( text.encode("utf-8") ) )
+        text = f.read(chunk_size)
+    parts.append( compressor.flush() )
+    return b"".join(parts)
+
+def decode_json_text( stored : Union[str,bytes] ) -> str:
+    """
+    the json text of a value stored by encode_json_text, or
+    a string stored by earlier versions
+    """
+    if isinstance(stored, str):
+        return stored
+    if not stored.startswith(STORAGE_PREFIX):
+        raise ValueError("unknown encoding of json property")
+    decompressor = zlib.decompressobj(zdict=ZDICT)
+    data = decompressor.decompress( stored[len(STORAGE_PREFIX):] ) + decompressor.flush()
+    return data.decode("utf-8")
+
+
+def _read_only(self, *args, **keyw):
+    raise TypeError("cached IIIF json data is read-only, use thaw() for a modifiable copy")
+
+
+class FrozenDict(dict):
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo) -> dict:
+        return json.loads( json.dumps(self) )
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class FrozenList(list):
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = reverse = sort = clear = _read_only
+
+    def __copy__(self) -> list:
+        return list(self)
+
+    def __deepcopy__(self, memo) -> list:
+        return json.loads( json.dumps(self) )
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def freeze( value : Any ) -> Any:
+    """
+    returns value, a decoded json value, with dicts and lists
+    replaced by FrozenDict and FrozenList
+    """
+    if isinstance(value, dict):
+        return FrozenDict( (key, freeze(v)) for key, v in value.items() )
+    if isinstance(value, list):
+        return FrozenList( freeze(v) for v in value )
+    return value
+
+def thaw( value : Any ) -> Any:
+    """
+    returns a modifiable shallow copy of a FrozenDict or FrozenList,
+    other values are returned unchanged. The values nested in the copy
+    are still frozen.
+    """
+    if isinstance(value, FrozenDict):
+        return dict(value)
+    if isinstance(value, FrozenList):
+        return list(value)
+    return value
+
+
+class ParsedJSONCache:
+
+    def __init__(self):
+        self._entries : Dict[ Tuple[int,str], Tuple[Union[str,bytes],Any] ] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, datablock : Any, name : str, default : Any = None) -> Any:
+        stored = datablock.get(name, None)
+        if not stored:
+            return default
+        key = (datablock.as_pointer(), name)
+        entry = self._entries.get(key, None)
+        if entry is not None and entry[0] == stored:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = freeze( json.loads( decode_json_text(stored) ) )
+        if len(self._entries) >= MAX_ENTRIES:
+            logger.debug("parsed json cache full, cleared")
+            self._entries.clear()
+        self._entries[key] = (stored, value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+_parsed_json_cache = ParsedJSONCache()
+
+def get_json_property( datablock : Any, name : str = "iiif_json", default : Any = None) -> Any:
+    """
+    returns the decoded value of the json-encoded custom property name
+    of the datablock, as FrozenDict / FrozenList, or default if the
+    property is not set or is empty
+    """
+    return _parsed_json_cache.get(datablock, name, default)
+
+def set_json_text( datablock : Any, text : str, name : str = "iiif_json") -> None:
+    """
+    stores json text in the custom property name of the datablock
+    """
+    datablock[name] = encode_json_text(text)
+    datablock.update_tag()
+
+def set_json_text_from_stream( datablock : Any, f : TextIO, name : str = "iiif_json") -> None:
+    """
+    stores the json text read from f in the custom property name of the
+    datablock, see encode_json_stream
+    """
+    datablock[name] = encode_json_stream(f)
+    datablock.update_tag()
+
+def set_json_property( datablock : Any, value : Any, name : str = "iiif_json") -> None:
+    """
+    json encodes value and stores it in the custom property name of the datablock
+    """
+    datablock[name] = encode_json_text( json.dumps(value) )
+    datablock.update_tag()
+
+@persistent
+def clear_parsed_json_cache(*args) -> None:
+    """
+    bpy.app.handlers load_post, undo_post, and redo_post handler; the
+    datablocks, and so the pointers of the cache keys, are reallocated
+    """
+    _parsed_json_cache.clear()
+
+@persistent
+def compress_json_properties(*args) -> None:
+    """
+    bpy.app.handlers load_post handler, stores the json-valued properties
+    saved as strings by earlier versions in the compressed form
+    """
+    converted = 0
+    for datablocks in (bpy.data.collections, bpy.data.objects):
+        for datablock in datablocks:
+            if datablock.library is not None:
+                continue
+            for name in JSON_PROPERTY_NAMES:
+                stored = datablock.get(name, None)
+                if isinstance(stored, str) and len(stored) >= COMPRESS_MIN_LENGTH:
+                    datablock[name] = encode_json_text(stored)
+                    converted += 1
+    if converted:
+        logger.info("%i json properties compressed" % converted)
@@ -1,13 +1,16 @@
-import json
-from bpy.types import Object
-from typing import  List, Iterable, Tuple
+import re
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import Mesh, Object
+from typing import  Any, Dict, List, Iterable, Optional, Tuple
 
-# Developer Note 9/15/2025: the following types not appear explicitly
-# in the code but are required to decode the INITIAL_TRANSFORM string
-from mathutils import Vector, Quaternion # noqa: F401
-from .transforms import Placement, Scaling, Translation, Rotation # noqa: F401
+from mathutils import Vector, Quaternion
+from .transforms import Placement, Scaling, Translation, Rotation
 
 from .transforms import  Transform, transformsToPlacements
+from ..utils.timing import timed
+from . import reserve_id
+from .json_cache import get_json_property, set_json_property, thaw, FrozenDict
 
 import logging
 logger = logging.getLogger("iiif.models")
@@ -20,11 +23,19 @@ IIIF_TEMP_FORMAT="iiif.temp.format"
 
 # the string constant INITIAL_TRANSFORM is shared between the ImportLocalModel class,
 # as the key for a custom property attached to a Blender object when it is loaded,
-# the value of the custom property is a string encoding of glTF properties which
+# the value of the custom property is an encoding of glTF properties which
 # may rotate, translate, and scale the mesh defined in the glTF binary buffers.
+# See encode_blender_placement for the encoding.
 INITIAL_TRANSFORM="iiif.initial.transform"
 
+# the string constant IIIF_PROXY is the key for a custom property marking a
+# Blender object as a placeholder for a model whose geometry has not been
+# loaded. The proxy carries the same iiif_id, iiif_type, iiif_json properties
+# and placement as a loaded model, but no INITIAL_TRANSFORM
+IIIF_PROXY="iiif.proxy"
 
+
+@timed("configure_model")
 def configure_model(    new_model : Object,
                         resource_data  : dict,
                         placement      : Placement ) -> None :
@@ -48,6 +59,7 @@ def configure_model(    new_model : Object,
         raise ValueError()
         
     new_model["iiif_id"] = model_id
+    reserve_id(model_id)
     MODEL="Model"
     
     try:
@@ -65,7 +77,7 @@ def configure_model(    new_model : Object,
             logger.warn(message)
         resource_data["format"] = mimetype
     new_model["iiif_type"] = "Model"
-    new_model["iiif_json"] = json.dumps(resource_data)
+    set_json_property(new_model, resource_data)
 
     # now combine any placement defined during the resource import
     # with that that defined in the placment passed INITIAL_TRANSFORM
@@ -110,15 +122,105 @@ def configure_model(    new_model : Object,
     
     return    
 
+def duplicate_linked_model( model : Object ) -> Object:
+    """
+    Returns a linked duplicate of the object tree rooted at model; 
+    equivalent to the Blender UI Duplicate Linked (Alt-D) operation.
+    
+    Each new Object shares its object data (mesh, materials, images) with
+    the original, and has its own location, rotation, scale. The custom 
+    properties, including INITIAL_TRANSFORM, are copied.
+    
+    The new objects are not linked into any collection, it is the 
+    responsibility of the client to do so.
+    """
+    return _duplicate_object_tree(model, copy_data=False)
+
+def duplicate_model( model : Object ) -> Object:
+    """
+    Returns a duplicate of the object tree rooted at model, as
+    duplicate_linked_model but each new Object has its own copy of the
+    object data (mesh); the materials and images are shared, as in the
+    Blender UI Duplicate (Shift-D) operation with the default preferences.
+    
+    The new objects are not linked into any collection.
+    """
+    return _duplicate_object_tree(model, copy_data=True)
+
+def _duplicate_object_tree( model : Object, copy_data : bool ) -> Object:
+    copies : dict = {}
+    root_copy : Object | None = None
+    for _depth, obj in walk_object_tree(model):
+        new_obj = obj.copy()        # shares obj.data with obj
+        if copy_data and obj.data is not None:
+            new_obj.data = obj.data.copy()
+        copies[obj.as_pointer()] = new_obj
+        if root_copy is None:
+            root_copy = new_obj
+        elif obj.parent is not None:
+            new_obj.parent = copies[obj.parent.as_pointer()]
+    if root_copy is None:
+        raise ValueError("no object to duplicate")
+    return root_copy
+
+def new_proxy_model(    name : str,
+                        bounds : Optional[Tuple[Tuple[float,float,float], Tuple[float,float,float]]]
+                    ) -> Object:
+    """
+    Returns a new Blender object, a box mesh displayed as wireframe, to stand
+    in for a model until the model is loaded.
+    
+    bounds are the (min,max) corners of the model in the glTF/IIIF axes; if None
+    a unit cube is used. The new object is not linked into any collection.
+    """
+    mesh = bpy.data.meshes.new(name)
+    _set_box_geometry(mesh, bounds)
+    
+    proxy = bpy.data.objects.new(name, mesh)
+    proxy.display_type = "WIRE"
+    proxy[IIIF_PROXY] = True
+    return proxy
+    
+def set_proxy_bounds(   proxy : Object,
+                        bounds : Optional[Tuple[Tuple[float,float,float], Tuple[float,float,float]]]
+                    ) -> None:
+    """
+    replaces the box of a proxy model from new_proxy_model by the box of
+    bounds; the linked duplicates of the proxy share its mesh and are changed too
+    """
+    mesh = proxy.data
+    mesh.clear_geometry()
+    _set_box_geometry(mesh, bounds)
+    
+def _set_box_geometry(  mesh : Mesh,
+                        bounds : Optional[Tuple[Tuple[float,float,float], Tuple[float,float,float]]]
+                    ) -> None:
+    lo, hi = bounds or ((-0.5,-0.5,-0.5), (0.5,0.5,0.5))
+    
+    # Blender <- IIIF axes mapping: X <- X ; Y <- -Z ; Z <- Y
+    xs = (lo[0], hi[0])
+    ys = (-hi[2], -lo[2])
+    zs = (lo[1], hi[1])
+    vertices = [ (x,y,z) for x in xs for y in ys for z in zs ]
+    faces = [   (0,1,3,2), (4,6,7,5), (0,4,5,1),
+                (2,3,7,6), (0,2,6,4), (1,5,7,3) ]
+    
+    mesh.from_pydata(vertices, [], faces)
+    mesh.update()
+    
+def is_proxy_model( blender_obj : Object ) -> bool:
+    return bool( blender_obj.get(IIIF_PROXY, False) )
+
 def replace_model_id(model : Object, new_id:str) -> None:
     """
     replace the existing value of the id, in both places
     in which the Blender object stores it.
     """
     model["iiif_id"] = new_id
-    model_data = json.loads( model.get("iiif_json","{}"))
+    reserve_id(new_id)
+    model_data = thaw( get_json_property(model, default=FrozenDict()) )
     model_data["id"] = new_id
-    model["iiif_json"] = json.dumps(model_data)
+    set_json_property(model, model_data)
     return
     
 _ext_to_mime_dict = {
@@ -142,25 +244,103 @@ def mimetype_from_extension( fname: str ) -> str:
     except KeyError:
         return ""
         
-def encode_blender_placement( placement : Placement ) -> str:
+# Developer Note: the INITIAL_TRANSFORM property is a float array
+#   [version, sx, sy, sz, qw, qx, qy, qz, tx, ty, tz]
+# the version is INITIAL_TRANSFORM_VERSION. Files saved by earlier versions
+# of the add-on hold the repr() of the Placement, which was decoded by eval;
+# these strings are parsed by a regular expression, and are converted to the
+# array encoding by the load_post handler migrate_initial_transforms.
+
+INITIAL_TRANSFORM_VERSION = 1
+INITIAL_TRANSFORM_LENGTH = 11
+
+_LEGACY_PLACEMENT_PATTERN = re.compile(
+    r"^\s*Placement\(\s*"
+    r"Scaling\(Vector\(\(([^()]*)\)\)\)\s*,\s*"
+    r"Rotation\(Quaternion\(\(([^()]*)\)\)\)\s*,\s*"
+    r"Translation\(Vector\(\(([^()]*)\)\)\)\s*\)\s*$"
+)
+
+MAX_DECODED_ENTRIES = 10000
+
+_decoded_placements : Dict[Any, Placement] = {}
+
+def encode_blender_placement( placement : Placement ) -> List[float]:
     """
-    encode the 3 values used in Blender object into a string that can be stored
-    as a Blender custom property, and decoded back into the original values
-    
-    uses the repr function to encode
+    encode the 3 values used in Blender object into a list of floats that can
+    be stored as a Blender custom property, and decoded back into the original values
     """
-    return repr(placement)
+    return  [ float(INITIAL_TRANSFORM_VERSION) ] + \
+            list(placement.scaling.data) + \
+            list(placement.rotation.data) + \
+            list(placement.translation.data)
+    
+def _parse_numbers( text : str, count : int ) -> List[float]:
+    values = [ float(v) for v in text.split(",") if v.strip() ]
+    if len(values) != count:
+        raise ValueError("expected %i values in %r" % (count, text))
+    return values
     
+def _decode_values( encoding : Any ) -> Tuple[List[float], List[float], List[float]]:
+    """
+    the scaling, rotation, translation values of the array encoding or
+    of a legacy repr() string; raises ValueError if encoding is neither
+    """
+    if isinstance(encoding, str):
+        match = _LEGACY_PLACEMENT_PATTERN.match(encoding)
+        if match is None:
+            raise ValueError("not a Placement repr")
+        return (_parse_numbers(match.group(1), 3),
+                _parse_numbers(match.group(2), 4),
+                _parse_numbers(match.group(3), 3))
+    values = [ float(v) for v in encoding ]
+    if len(values) != INITIAL_TRANSFORM_LENGTH or values[0] != INITIAL_TRANSFORM_VERSION:
+        raise ValueError("unsupported initial transform encoding")
+    return values[1:4], values[4:8], values[8:11]
 
-def decode_blender_transform( encoding : str ) -> Placement:
+def decode_blender_transform( encoding : Any ) -> Placement:
     """
-    reverses the encoding performed by function encode_blender_transform
+    reverses the encoding performed by function encode_blender_placement;
+    encoding is the value of the INITIAL_TRANSFORM property, a float array or
+    a string saved by an earlier version. Returns a new Placement, which
+    the caller may modify
     """
-    try:
-        return eval( encoding )
-    except Exception as exc:
-        logger.error(f"unable to decode transform: {repr(encoding)}", exc)
-        return Placement()
+    key = encoding if isinstance(encoding, str) else tuple(encoding)
+    placement = _decoded_placements.get(key, None)
+    if placement is None:
+        try:
+            scaling, rotation, translation = _decode_values(key)
+        except (ValueError, TypeError) as exc:
+            logger.error("unable to decode transform %r : %s" % (encoding, exc))
+            return Placement()
+        placement = Placement(  Scaling( Vector(scaling) ),
+                                Rotation( Quaternion(rotation) ),
+                                Translation( Vector(translation) ))
+        if len(_decoded_placements) >= MAX_DECODED_ENTRIES:
+            _decoded_placements.clear()
+        _decoded_placements[key] = placement
+    return placement.copy()
+    
+@persistent
+def migrate_initial_transforms(*args) -> None:
+    """
+    bpy.app.handlers load_post handler, replaces the repr() strings of
+    INITIAL_TRANSFORM saved by earlier versions with the array encoding
+    """
+    migrated = 0
+    for obj in bpy.data.objects:
+        encoding = obj.get(INITIAL_TRANSFORM, None)
+        if not isinstance(encoding, str) or obj.library is not None:
+            continue
+        try:
+            _decode_values(encoding)
+        except ValueError:
+            logger.warning("initial transform of %s not migrated: %r" % (obj.name, encoding))
+            continue
+        obj[INITIAL_TRANSFORM] = encode_blender_placement( decode_blender_transform(encoding) )
+        migrated += 1
+    if migrated:
+        logger.info("initial transforms of %i objects converted to the array encoding" % migrated)
         
 def walk_object_tree(parent_object : Object , depth:int = 0)  -> Iterable[Tuple[int,Object]]:
     """
@@ -1,9 +1,11 @@
 from __future__ import annotations
-from  typing import  Any, Dict, List,  Callable, Generator, Iterable
-from mathutils import Vector, Quaternion, Euler
+from  typing import  Any, Dict, List,  Callable, Generator, Iterable, Optional, Tuple
+from mathutils import Vector, Quaternion, Euler, Matrix
 from math import radians, degrees,   pi
 from . import generate_id
+import bpy
 from bpy.types import Object
+from ..utils.timing import timed
 
 
 # Dev Note: 9 Aug 2025
@@ -24,6 +26,7 @@ POINT_SELECTOR      = "PointSelector"
 
 
 class Transform:
+    __slots__ = ()
         
     def inverse(self) -> Transform:
         raise NotImplementedError()
@@ -46,17 +49,40 @@ class Transform:
             raise Exception("unsupported iiif transform type: %s" % str(exc))
         return handler(iiif_data)
         
-    def to_iiif_dict( self )  -> dict :
+    def iiif_values( self, places : Optional[int] = None ) -> Dict[str,float]:
+        """
+        the x, y, z properties of the IIIF transform, omitting those which 
+        have the identity value. If places is not None the values are rounded
+        to places decimal digits, so that round-off noise is removed and
+        a nearly identity transform has no values.
+        """
+        raise NotImplementedError()
+        
+    def to_iiif_dict( self, places : Optional[int] = None )  -> dict :
         raise NotImplementedError() 
+        
+    def key(self) -> tuple:
+        """
+        hashable value identifying the transform, used by transformsToPlacements
+        """
+        return (self.__class__, tuple(self.data)) # pyright: ignore[reportAttributeAccessIssue]
 
 XYZ : List[str] = ["x" , "y" , "z"]
 
+def _axis_values( iv : List[float], identity_value : float, places : Optional[int] ) -> Dict[str,float]:
+    if places is not None:
+        iv = [round(v, places) for v in iv]
+    # note: a value rounded to -0.0 compares equal to 0.0, so it is omitted
+    return { label : v for label, v in zip(XYZ, iv) if v != identity_value }
+
 class Translation(Transform):
+    __slots__ = ("data",)
+    
     def __init__(self, vec : Vector):
         self.data : Vector = vec
 
     def applyToPlacement(self,placement:Placement) -> bool:        
-        placement.translation = Translation( placement.translation.data + self.data )
+        placement.translation.data += self.data
         return True
             
     def inverse(self) -> Translation:
@@ -83,24 +109,25 @@ class Translation(Transform):
         vec = Vector(bv)
         return Translation(vec)
         
-    def to_iiif_dict( self ) -> dict:
-        
+    def iiif_values( self, places : Optional[int] = None ) -> Dict[str,float]:
         # 1. convert back to iiif axes under 
         # iiif <- Blender axes mapping X <- X. Y <- Z; Z <- -Y
         iv = [self.data.x, self.data.z, -self.data.y]
+        return _axis_values(iv, 0.0, places)
         
+    def to_iiif_dict( self, places : Optional[int] = None ) -> dict:
         # express as dictionary
         retVal : Dict[str,Any] = {  "type": TRANSLATE_TRANSFORM,
                                     "id": generate_id(TRANSLATE_TRANSFORM) }
-        for label, v in zip( XYZ, iv):
-            if v != 0.0:
-                retVal[label] = v
+        retVal.update( self.iiif_values(places) )
         return retVal
 
     def __repr__(self):
         return "Translation(%r)" %  self.data  
                 
 class Rotation(Transform):
+    __slots__ = ("data",)
+    
     def __init__(self, quat : Quaternion ):
         self.data : Quaternion = quat
         
@@ -121,8 +148,8 @@ class Rotation(Transform):
         return self.data @ coord
         
     def applyToPlacement(self,placement:Placement) -> bool:        
-        placement.translation = self.commuteWithTranslation(placement.translation)
-        placement.rotation  = Rotation( self.data @ placement.rotation.data )
+        placement.translation.data = self.data @ placement.translation.data
+        placement.rotation.data = self.data @ placement.rotation.data
         return True
         
     @staticmethod
@@ -140,27 +167,28 @@ class Rotation(Transform):
         quat:Quaternion = Euler(bv, "YZX").to_quaternion()
         return Rotation(quat)
         
-    def to_iiif_dict( self ) -> dict:
-        
+    def iiif_values( self, places : Optional[int] = None ) -> Dict[str,float]:
         # 1. convert to Euler rotation in YZX extrinsic order
         euler:Euler = self.data.to_euler("YZX")
         
         # 2. convert back to iiif axes under 
         # iiif <- Blender axes mapping X <- X. Y <- Z; Z <- -Y
         iv = [degrees(r) for r in [euler.x, euler.z, -euler.y]]
+        return _axis_values(iv, 0.0, places)
         
+    def to_iiif_dict( self, places : Optional[int] = None ) -> dict:
         # express as dictionary
         retVal : Dict[str,Any] = {"type": ROTATE_TRANSFORM,
                                     "id": generate_id(ROTATE_TRANSFORM) }
-        for label, v in zip( XYZ, iv):
-            if v != 0.0:
-                retVal[label] = v
+        retVal.update( self.iiif_values(places) )
         return retVal
 
     def __repr__(self):
         return "Rotation(%r)" %  self.data  
     
 class Scaling(Transform):
+    __slots__ = ("data",)
+    
     def __init__(self, vec: Vector ):
         self.data : Vector = vec
         
@@ -170,12 +198,16 @@ class Scaling(Transform):
                 return False
         return True
         
-    def commuteWithRotation( self, r: Rotation) -> Rotation:
+    def commuteWithRotation( self, r: Rotation) -> Optional[Rotation]:
+        """
+        returns the rotation which, applied after this scaling, gives the same
+        transform as r applied before it; or None if the scaling is not uniform
+        and r is not the identity, see decomposeIntoPlacement
+        """
         if (r.isIdentity() or self.isUniform()):
             rotationPart:Rotation = self.rotationComponent()
             return rotationPart.commuteWithRotation(r)
-        else:
-            raise NotImplementedError()
+        return None
            
     def commuteWithTranslation( self, t : Translation ) -> Translation:
         return Translation( self.data * t.data )
@@ -237,12 +269,48 @@ class Scaling(Transform):
     def applyToPlacement(self,placement:Placement) -> bool: 
         # following is the test of whether this scale transformation
         # can be commuted with the previous Rotation
-        if self.isUniform() or placement.rotation.isIdentity():            
-            placement.translation = self.commuteWithTranslation(placement.translation)
-            placement.rotation = self.commuteWithRotation(placement.rotation)
-            placement.scaling = Scaling( placement.scaling.data * self.data )
+        rotation = self.commuteWithRotation(placement.rotation)
+        if rotation is not None:
+            placement.translation.data *= self.data
+            placement.rotation.data = rotation.data
+            placement.scaling.data *= self.data
             return True
-        return False
+        return self.decomposeIntoPlacement(placement)
+        
+    def decomposeIntoPlacement(self, placement:Placement) -> bool:
+        """
+        for a non-uniform scaling following a rotation: the linear part
+        of the combined transform is split by polar decomposition into a
+        rotation and a stretch. If the stretch is a scaling along the axes,
+        which is the case when the rotation maps the axes onto the axes,
+        the placement is updated and True returned. Otherwise the combination
+        includes a shear, which a single Placement cannot express, and
+        False is returned
+        """
+        linear = Matrix.Diagonal(self.data) @ \
+                 placement.rotation.data.to_matrix() @ \
+                 Matrix.Diagonal(placement.scaling.data)
+        decomposition = polarDecomposition(linear)
+        if decomposition is None:
+            return False
+        orthogonal, stretch = decomposition
+        
+        diagonal = Vector( [stretch[i][i] for i in range(3)] )
+        tolerance = POLAR_TOLERANCE * max( abs(d) for d in diagonal )
+        for i in range(3):
+            for j in range(3):
+                if i != j and abs(stretch[i][j]) > tolerance:
+                    return False
+        
+        if orthogonal.determinant() < 0.0:
+            # the reflection is moved from the orthogonal part into the scaling
+            orthogonal = orthogonal @ Matrix.Diagonal((-1.0, 1.0, 1.0))
+            diagonal[0] = -diagonal[0]
+            
+        placement.translation.data *= self.data
+        placement.rotation.data = orthogonal.to_quaternion()
+        placement.scaling.data = diagonal
+        return True
 
     @staticmethod
     def from_iiif_dict( iiif_data : dict )  -> Scaling:
@@ -256,25 +324,52 @@ class Scaling(Transform):
         vec = Vector(bv)
         return Scaling(vec)
         
-    def to_iiif_dict( self ) -> dict:
-        
+    def iiif_values( self, places : Optional[int] = None ) -> Dict[str,float]:
         # 1. convert back to iiif axes under 
         # iiif <- Blender axes mapping X <- X. Y <- Z; Z <- -Y
         iv = [self.data.x, self.data.z,self.data.y]
+        return _axis_values(iv, 1.0, places)
         
+    def to_iiif_dict( self, places : Optional[int] = None ) -> dict:
         # express as dictionary
         retVal : Dict[str,Any] = {  "type": SCALE_TRANSFORM,
                                     "id": generate_id(SCALE_TRANSFORM) }
-        for label, v in zip( XYZ, iv):
-            if v != 1.0:
-                retVal[label] = v
+        retVal.update( self.iiif_values(places) )
         return retVal
         
     def __repr__(self):
         return "Scaling(%r)" %  self.data
         
 
+# relative size of off-diagonal elements of the stretch below
+# which a polar decomposition is accepted as a scaling
+POLAR_TOLERANCE = 1.0e-5
+POLAR_MAX_ITERATIONS = 32
+
+def polarDecomposition( linear : Matrix ) -> Optional[Tuple[Matrix,Matrix]]:
+    """
+    returns (orthogonal, stretch), 3x3 matrices such that 
+    linear = orthogonal @ stretch, with stretch symmetric; or None if
+    linear is singular. Computed by the Newton iteration
+    Q <- (Q + Q^-T) / 2
+    """
+    orthogonal = linear.copy()
+    for _ in range(POLAR_MAX_ITERATIONS):
+        if orthogonal.determinant() == 0.0:
+            return None
+        updated = (orthogonal + orthogonal.inverted().transposed()) * 0.5
+        change = max( abs(updated[i][j] - orthogonal[i][j]) for i in range(3) for j in range(3))
+        orthogonal = updated
+        if change < 1.0e-7:
+            break
+    stretch = orthogonal.transposed() @ linear
+    stretch = (stretch + stretch.transposed()) * 0.5
+    return orthogonal, stretch
+
+
 class Placement:
+    __slots__ = ("scaling", "rotation", "translation")
+    
     def __init__(self, scaling=None, rotation=None, translation=None):
         self.scaling :  Scaling = scaling or Scaling(Vector((1,1,1)))
         self.rotation : Rotation = rotation or Rotation(Quaternion((1,0,0),0.0))
@@ -287,23 +382,59 @@ class Placement:
                 
     def to_transform_list(self) -> List[Transform]:
         return [self.scaling, self.rotation, self.translation]
+        
+    def copy(self) -> Placement:
+        return Placement(   Scaling( self.scaling.data.copy() ),
+                            Rotation( self.rotation.data.copy() ),
+                            Translation( self.translation.data.copy() ))
 
     def __repr__(self):
         return "Placement( %r, %r, %r)" % (self.scaling, self.rotation, self.translation)
               
-def transformsToPlacements( transforms:Iterable[Transform]) -> Generator[Placement]:
+# Developer Note: the placements computed for a sequence of transforms are
+# memoized, keyed by the types and values of the transforms; on import the
+# same transforms recur for every instance of a model, and on export for
+# every object not moved since import. The Placement instances in the memo
+# are not handed out, callers receive copies which they may modify.
+
+MAX_MEMO_ENTRIES = 10000
+
+_placements_memo : Dict[tuple, List[Placement]] = {}
+
+def composePlacements( transforms:Iterable[Transform]) -> List[Placement]:
+    """
+    the transforms applied in order to accumulating placements, starting a
+    new placement when a transform cannot be combined with the current one;
+    identity transforms are skipped, an identity final placement omitted. 
+    The transforms are applied in place to the accumulating placement.
+    """
+    retVal : List[Placement] = []
     accum : Placement = Placement()
     for transform in transforms:
         if not transform.isIdentity():
             if transform.applyToPlacement(accum):
                 continue
             else:
-                yield accum
+                retVal.append(accum)
                 accum = Placement()
                 transform.applyToPlacement(accum)
     if not accum.isIdentity():
-        yield accum
+        retVal.append(accum)
+    return retVal
+
+def transformsToPlacements( transforms:Iterable[Transform]) -> Generator[Placement]:
+    transform_list = list(transforms)
+    key = tuple( t.key() for t in transform_list )
+    placements = _placements_memo.get(key, None)
+    if placements is None:
+        placements = composePlacements(transform_list)
+        if len(_placements_memo) >= MAX_MEMO_ENTRIES:
+            _placements_memo.clear()
+        _placements_memo[key] = placements
+    for placement in placements:
+        yield placement.copy()
 
+@timed("simplify_transforms")
 def simplifyTransforms( transforms : Iterable[Transform] )  -> List[Transform]:
     """
     simplifies the list of transforms by combinging into Placements then
@@ -318,6 +449,14 @@ def simplifyTransforms( transforms : Iterable[Transform] )  -> List[Transform]:
                 retVal.append(t)
     return retVal
 
+def quantizeTransforms( transforms : Iterable[Transform], places : int ) -> List[Transform]:
+    """
+    omits the transforms that are identities when their IIIF values
+    are rounded to places decimal digits; the rounding itself is done
+    by passing places to to_iiif_dict
+    """
+    return [t for t in transforms if t.iiif_values(places)]
+
 
 import_transform_callables : Dict[str,Callable] = {
     ROTATE_TRANSFORM :    Rotation.from_iiif_dict,
@@ -326,19 +465,80 @@ import_transform_callables : Dict[str,Callable] = {
     SCALE_TRANSFORM :     Scaling.from_iiif_dict,    
 }      
 
+# Developer Note: the placement of an object is read without changing its
+# rotation_mode; a write to rotation_mode tags the object for re-evaluation
+# by the depsgraph, and converts the rotation values back and forth. The 
+# quaternion is computed from the rotation values of the current mode.
+
+def rotation_quaternion( rotation_mode : str, 
+                         quaternion : Iterable[float], 
+                         euler : Iterable[float], 
+                         axis_angle : Iterable[float] ) -> Quaternion:
+    """
+    the rotation of an object as a quaternion, from its rotation_mode and
+    its rotation_quaternion, rotation_euler, rotation_axis_angle values
+    """
+    if rotation_mode == "QUATERNION":
+        return Quaternion(quaternion)
+    if rotation_mode == "AXIS_ANGLE":
+        angle, x, y, z = axis_angle
+        return Quaternion((x, y, z), angle)
+    return Euler(euler, rotation_mode).to_quaternion()
+
+@timed("get_object_placement")
 def get_object_placement( blender_obj : Object ) -> Placement:
+    return Placement(
+                scaling = Scaling(blender_obj.scale.copy()),
+                rotation = Rotation( rotation_quaternion(   blender_obj.rotation_mode,
+                                                            blender_obj.rotation_quaternion,
+                                                            blender_obj.rotation_euler,
+                                                            blender_obj.rotation_axis_angle) ),
+                translation = Translation(blender_obj.location.copy())
+                )        
 
-    saved_mode = blender_obj.rotation_mode 
-    try:
-        blender_obj.rotation_mode = "QUATERNION"
-        quat = blender_obj.rotation_quaternion
-        return Placement(
-                    scaling = Scaling(blender_obj.scale.copy()),
-                    rotation = Rotation( quat.copy() ),
-                    translation = Translation(blender_obj.location.copy())
-                    )        
-    finally:
-        blender_obj.rotation_mode = saved_mode
+_BULK_PROPERTIES : List[Tuple[str,int]] = [
+    ("location", 3),
+    ("scale", 3),
+    ("rotation_quaternion", 4),
+    ("rotation_euler", 3),
+    ("rotation_axis_angle", 4),
+]
+
+@timed("get_object_placements")
+def get_object_placements( objects : Iterable[Object] ) -> Dict[int,Placement]:
+    """
+    the placements of objects, keyed by as_pointer(); the location, scale,
+    and rotation values of all objects in bpy.data.objects are read by
+    foreach_get into arrays, so that per object only the rotation_mode is
+    read through RNA
+    """
+    import numpy as np
+    all_objects = bpy.data.objects
+    count = len(all_objects)
+    index : Dict[int,int] = { obj.as_pointer() : i for i, obj in enumerate(all_objects) }
+    
+    values : Dict[str, Any] = {}
+    for name, size in _BULK_PROPERTIES:
+        array = np.empty(count * size, dtype=np.float32)
+        all_objects.foreach_get(name, array)
+        values[name] = array.reshape((count, size)).tolist()
+        
+    retVal : Dict[int,Placement] = {}
+    for obj in objects:
+        pointer = obj.as_pointer()
+        i = index.get(pointer, None)
+        if i is None:
+            retVal[pointer] = get_object_placement(obj)
+            continue
+        retVal[pointer] = Placement(
+                scaling = Scaling( Vector(values["scale"][i]) ),
+                rotation = Rotation( rotation_quaternion(   obj.rotation_mode,
+                                                            values["rotation_quaternion"][i],
+                                                            values["rotation_euler"][i],
+                                                            values["rotation_axis_angle"][i]) ),
+                translation = Translation( Vector(values["location"][i]) )
+                )
+    return retVal
         
 def set_object_placement( blender_obj : Object , placement : Placement) -> None:
 
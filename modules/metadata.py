@@ -1,6 +1,11 @@
 import json
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, TextIO
+
+from .editing.json_cache import (   get_json_property, 
+                                    set_json_property, 
+                                    set_json_text, 
+                                    set_json_text_from_stream )
 
 
 class IIIFMetadata:
@@ -20,6 +25,9 @@ class IIIFMetadata:
     annotation_data (dict); encoded as json, with the model object
     
     And likewise a copy of the annotation_data is stored in the camera obj
+    
+    The get_ methods return read-only values shared through the parsed json
+    cache, see editing.json_cache
     """
 
     def __init__(self, obj: Any):
@@ -33,16 +41,29 @@ class IIIFMetadata:
 
     def store_manifest(self, data: Dict) -> None:
         """Store complete manifest data"""
-        self.obj[self._get_key("manifest")] = json.dumps(data)
+        self.store_manifest_json(json.dumps(data), data.get("id","not_supplied"))
+
+    def store_manifest_json(self, encoded: str, manifest_id: str) -> None:
+        """Store complete manifest data, already json encoded"""
+        set_json_text(self.obj, encoded, self._get_key("manifest"))
+        self._store_manifest_identity(manifest_id)
+        
+    def store_manifest_file(self, f: TextIO, manifest_id: str) -> None:
+        """Store complete manifest data, the json text read from the file f
+        and compressed in chunks, without the text held in memory"""
+        set_json_text_from_stream(self.obj, f, self._get_key("manifest"))
+        self._store_manifest_identity(manifest_id)
+        
+    def _store_manifest_identity(self, manifest_id: str) -> None:
         self.obj[self._get_key("import_date")] = datetime.now().isoformat()
         self.obj[self._get_key("type")] = "Manifest"
-        self.obj[self._get_key("id")] = data.get("id","not_supplied")
+        self.obj[self._get_key("id")] = manifest_id
 
     def store_annotation(self, data: Dict) -> None:
         """Store annotation data and its body"""
-        self.obj[self._get_key("annotation")] = json.dumps(data)
+        set_json_property(self.obj, data, self._get_key("annotation"))
         if "body" in data:
-            self.obj[self._get_key("body")] = json.dumps(data["body"])
+            set_json_property(self.obj, data["body"], self._get_key("body"))
         if "id" in data:
             self.obj[self._get_key("id")] = data["id"]
         if "type" in data:
@@ -50,25 +71,22 @@ class IIIFMetadata:
 
     def store_scene(self, data: Dict) -> None:
         """Store scene data"""
-        self.obj[self._get_key("scene")] = json.dumps(data)
+        set_json_property(self.obj, data, self._get_key("scene"))
         self.obj[self._get_key("type")] = "Scene"
         if "id" in data:
             self.obj[self._get_key("id")] = data.get("id","not_supplied")
 
     def get_manifest(self) -> Optional[Dict]:
         """Retrieve stored manifest data"""
-        data = self.obj.get(self._get_key("manifest"))
-        return json.loads(data) if data else None
+        return get_json_property(self.obj, self._get_key("manifest"))
 
     def get_annotation(self) -> Optional[Dict]:
         """Retrieve stored annotation data"""
-        data = self.obj.get(self._get_key("annotation"))
-        return json.loads(data) if data else None
+        return get_json_property(self.obj, self._get_key("annotation"))
 
     def get_scene(self) -> Optional[Dict]:
         """Retrieve stored scene data"""
-        data = self.obj.get(self._get_key("scene"))
-        return json.loads(data) if data else None
+        return get_json_property(self.obj, self._get_key("scene"))
 
     def get_import_date(self) -> Optional[str]:
         """Get the import date"""
@@ -0,0 +1,9 @@
+"""
+network access used when importing models referenced by http(s) URLs
+in an IIIF manifest.
+
+Developer Note: The functions and classes in this package do not import
+bpy, they may be (and are) executed on worker threads. Any value that
+has to come from Blender (a temp directory, a user preference) must be
+read by the client on the main thread and passed in.
+"""
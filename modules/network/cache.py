@@ -0,0 +1,267 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, NamedTuple, Optional
+
+from .fetch import DownloadResult, FetchError, ProgressCallback, download_with_retry, url_basename
+
+import logging
+logger = logging.getLogger("iiif.network.cache")
+
+# Developer Note: Layout of the cache directory
+#   index.json   : url -> entry dictionary, see DownloadCache.fetch
+#   cache.lock   : file locked while the index is read or written
+#   objects/     : the cached files, named by the sha256 of the content
+#                  so that identical content downloaded from two urls
+#                  is stored once
+#   partial/     : the downloads in progress, named by the sha256 of the url;
+#                  a download interrupted by a transient error leaves its .part
+#                  file here, and the next fetch of the url, in this or another
+#                  Blender process, resumes it (see fetch.stream_download). Each
+#                  download holds the lock of its .lock file; a second download
+#                  of the url at the same time uses a temporary file instead
+#
+# The lock is only held while the index is read or modified, never during
+# a download, so that a slow download in one Blender process does not block
+# other processes sharing the cache.
+
+INDEX_FILENAME = "index.json"
+LOCK_FILENAME  = "cache.lock"
+OBJECTS_DIRNAME = "objects"
+PARTIAL_DIRNAME = "partial"
+
+# an entry used within this many seconds is not evicted even if the cache
+# is over budget: another Blender process may be about to import the file
+EVICTION_GRACE_SECONDS = 300
+
+# files in partial/ not modified for this many seconds are removed
+PARTIAL_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+class CachedFile(NamedTuple):
+    filepath : str
+    content_type : str
+    
+    
+class _FileLock:
+    """
+    exclusive lock on a file, shared between processes and threads
+    """
+    def __init__(self, lock_filepath : str):
+        self.lock_filepath = lock_filepath
+        self._thread_lock = threading.Lock()
+    
+    @contextlib.contextmanager
+    def held(self) -> Iterator[None]:
+        with self._thread_lock:
+            with open(self.lock_filepath, "a+b") as lock_file:
+                _lock_file(lock_file)
+                try:
+                    yield
+                finally:
+                    _unlock_file(lock_file)
+
+if os.name == "nt":
+    import msvcrt
+    
+    def _lock_file(f) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)    # pyright: ignore
+        
+    def _try_lock_file(f) -> bool:
+        f.seek(0)
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)   # pyright: ignore
+        except OSError:
+            return False
+        return True
+        
+    def _unlock_file(f) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)   # pyright: ignore
+else:
+    import fcntl
+    
+    def _lock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        
+    def _try_lock_file(f) -> bool:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        return True
+        
+    def _unlock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class DownloadCache:
+    """
+    Persistent cache of downloaded files keyed by URL.
+    
+    A cached url is revalidated with a conditional request (If-None-Match,
+    If-Modified-Since) on every fetch; a 304 response is served from disk.
+    When the total size of the cached files exceeds max_bytes the least
+    recently used entries are evicted.
+    """
+    
+    def __init__(self, directory : str, max_bytes : int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(directory, OBJECTS_DIRNAME)
+        self.partial_dir = os.path.join(directory, PARTIAL_DIRNAME)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._lock = _FileLock(os.path.join(directory, LOCK_FILENAME))
+        
+    def fetch(self, url : str, progress : Optional[ProgressCallback] = None) -> CachedFile:
+        """
+        returns the local file holding the content of url, downloading
+        it only if the cached copy is missing or stale; progress is
+        passed to download_with_retry
+        
+        raises FetchError, or OSError or http.client.HTTPException on network failure
+        """
+        with self._lock.held():
+            entry = self._read_index().get(url)
+            if entry is not None and not os.path.exists(self._object_path(entry)):
+                entry = None
+                
+        headers : Dict[str,str] = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        
+        with self._download_filepath(url) as temp_filepath:
+            result = download_with_retry(url, temp_filepath, headers=headers, progress=progress)
+            if result is not None:
+                return self._store(url, self._new_entry(url, result), temp_filepath)
+        if entry is None:
+            raise FetchError("HTTP status returned as 304 for unconditional request of %s" % url)
+        logger.debug("cache revalidated %s" % url)
+        return self._touch(url, entry)
+        
+    def _new_entry(self, url : str, result : DownloadResult) -> dict:
+        return {
+            "etag"          : result.etag,
+            "last_modified" : result.last_modified,
+            "content_type"  : result.content_type,
+            "extension"     : os.path.splitext(url_basename(url))[1],
+            "sha256"        : result.sha256,
+            "size"          : result.size,
+        }
+        
+    @contextlib.contextmanager
+    def _download_filepath(self, url : str) -> Iterator[str]:
+        """
+        the file to download url into, in partial/ and named by the url so
+        that an interrupted download is resumed; a temporary file, removed
+        on exit, if another download of the url holds the lock
+        """
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        with open(os.path.join(self.partial_dir, name + ".lock"), "a+b") as lock_file:
+            if _try_lock_file(lock_file):
+                try:
+                    yield os.path.join(self.partial_dir, name + ".download")
+                finally:
+                    _unlock_file(lock_file)
+                return
+        logger.debug("%s is being downloaded by another fetch" % url)
+        fd, temp_filepath = tempfile.mkstemp(dir=self.partial_dir, suffix=".download")
+        os.close(fd)
+        try:
+            yield temp_filepath
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temp_filepath)
+        
+    def _remove_stale_partials(self) -> None:
+        """
+        removes the files of downloads in partial/ which have not been
+        resumed within PARTIAL_MAX_AGE_SECONDS
+        """
+        oldest = time.time() - PARTIAL_MAX_AGE_SECONDS
+        with os.scandir(self.partial_dir) as entries:
+            stale = [ entry.path for entry in entries 
+                        if not entry.name.endswith(".lock") and entry.stat().st_mtime < oldest ]
+        for filepath in stale:
+            with contextlib.suppress(OSError):
+                os.unlink(filepath)
+            logger.debug("removed stale partial download %s" % filepath)
+        
+    def _store(self, url : str, entry : dict, temp_filepath : str) -> CachedFile:
+        with self._lock.held():
+            index = self._read_index()
+            object_path = self._object_path(entry)
+            if os.path.exists(object_path):
+                os.unlink(temp_filepath)
+            else:
+                os.replace(temp_filepath, object_path)
+            entry["last_access"] = time.time()
+            index[url] = entry
+            self._evict(index, keep=url)
+            self._write_index(index)
+            self._remove_stale_partials()
+        logger.debug("cached %s as %s" % (url, object_path))
+        return CachedFile(object_path, entry["content_type"])
+            
+    def _touch(self, url : str, entry : dict) -> CachedFile:
+        with self._lock.held():
+            index = self._read_index()
+            current = index.get(url, entry)
+            current["last_access"] = time.time()
+            index[url] = current
+            self._write_index(index)
+        return CachedFile(self._object_path(current), current.get("content_type",""))
+        
+    def _evict(self, index : Dict[str,dict], keep : str) -> None:
+        """
+        removes least recently used entries from index, and their files
+        if no longer referenced, until the total size is within max_bytes
+        """
+        sizes : Dict[str,int] = {}
+        for entry in index.values():
+            sizes[self._object_path(entry)] = entry.get("size", 0)
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+            
+        now = time.time()
+        for url, entry in sorted(index.items(), key=lambda kv: kv[1].get("last_access", 0.0)):
+            if total <= self.max_bytes:
+                break
+            if url == keep or now - entry.get("last_access", 0.0) < EVICTION_GRACE_SECONDS:
+                continue
+            del index[url]
+            object_path = self._object_path(entry)
+            if not any(self._object_path(e) == object_path for e in index.values()):
+                total -= sizes[object_path]
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(object_path)
+            logger.debug("evicted %s from download cache" % url)
+        
+    def _object_path(self, entry : dict) -> str:
+        return os.path.join(self.objects_dir, entry["sha256"] + entry.get("extension",""))
+            
+    def _read_index(self) -> Dict[str,dict]:
+        try:
+            with open(os.path.join(self.directory, INDEX_FILENAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning("download cache index unreadable, starting empty")
+            return {}
+            
+    def _write_index(self, index : Dict[str,dict]) -> None:
+        index_path = os.path.join(self.directory, INDEX_FILENAME)
+        temp_path = index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(temp_path, index_path)
@@ -0,0 +1,494 @@
+import contextlib
+import hashlib
+import http.client
+import json
+import os
+import re
+import struct
+import threading
+import urllib.parse
+import zlib
+from typing import Callable, List, Mapping, NamedTuple, Optional, Tuple
+
+from .mirror import get_url_mapper
+from .pool import get_connection_pool
+from .retry import get_failure_registry, get_retry_policy, hedged_call, is_transient, retry_call
+from ..editing.fileops import uri_scheme, uri_to_path
+from ..utils.gltf_bounds import Bounds, gltf_bounds, gltf_json_from_reader
+
+import logging
+logger = logging.getLogger("iiif.network.fetch")
+
+
+# Developer Note: downloads are streamed to a .part file next to the target
+# in chunks of CHUNK_SIZE bytes and renamed to the target once complete. The
+# partial file holds the decoded content; the decoder and the sha256 state
+# are kept across a resume, so a resumed transfer continues from the byte
+# offset in the encoded body without reading the partial file again.
+#
+# A transfer without Content-Encoding, whose response has a validator (a
+# strong ETag, or Last-Modified) for If-Range, also writes the state file
+# <target>.part.json. If the download then fails with a transient error the
+# .part file and its state are kept, and a later download of the url into the
+# same target, a retry or another Blender process, resumes from them after
+# hashing the bytes already received. The .part file is deleted on success,
+# on a 304 response, when a resume is answered with different content, and on
+# an error that is not transient (see retry.is_transient), such as a cancel.
+
+CHUNK_SIZE = 1 << 20
+
+# resumes of an interrupted transfer before the error is raised
+MAX_RESUMES = 3
+
+# errors of a connection dropped or stalled while the body is read
+RESUMABLE_ERRORS = (
+    http.client.IncompleteRead,
+    ConnectionError,
+    TimeoutError,
+)
+
+# the request headers of a conditional request, not sent when resuming
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+
+# progress(received, total) : bytes transferred, and the expected total or None
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+class FetchError(Exception):
+    """
+    status is the HTTP status of the response, or None; retry_after
+    the seconds of a Retry-After header of the response, or None
+    """
+    def __init__(self, message : str, status : Optional[int] = None,
+                       retry_after : Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        
+        
+class DownloadCancelled(FetchError):
+    pass
+
+
+# errors of a retrieval which failed, after the retries
+RETRIEVAL_ERRORS = (FetchError, OSError, http.client.HTTPException)
+
+
+def url_basename( url : str, default : str = "model" ) -> str:
+    """
+    returns the last component of the path of the url, ignoring any query
+    or fragment; returns default if the path is empty
+    """
+    path = urllib.parse.urlparse(url).path
+    return os.path.basename( urllib.parse.unquote(path) ) or default
+
+
+def download_to_file( url : str, local_filepath : str,
+                      progress : Optional[ProgressCallback] = None ) -> str:
+    """
+    download the resource at url into local_filepath
+    
+    returns the Content-Type from the response headers, or "" if
+    there was no Content-Type header
+    
+    raises FetchError if the HTTP status is not 200
+    """
+    result = download_with_retry(url, local_filepath, progress=progress)
+    assert result is not None       # no conditional headers were sent
+    logger.debug(f"http header shows Content-Type {result.content_type}")
+    return result.content_type
+
+
+class DownloadResult(NamedTuple):
+    filepath : str
+    content_type : str
+    size : int              # of the file, after Content-Encoding decoding
+    sha256 : str            # hex digest of the file
+    etag : str
+    last_modified : str
+
+
+class _ContentDecoder:
+    """
+    incremental decoding of a gzip, deflate, or identity Content-Encoding.
+    For deflate both the zlib format of RFC 9110 and the raw deflate
+    stream some servers send are accepted
+    """
+    def __init__(self, encoding : str):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._decompressor = zlib.decompressobj()
+            self._first = True
+        elif encoding in ("", "identity"):
+            self._decompressor = None
+        else:
+            raise FetchError("unsupported Content-Encoding %s" % encoding)
+    
+    def decode(self, data : bytes) -> bytes:
+        if self._decompressor is None:
+            return data
+        if self.encoding == "deflate" and self._first:
+            self._first = False
+            try:
+                return self._decompressor.decompress(data)
+            except zlib.error:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        try:
+            return self._decompressor.decompress(data)
+        except zlib.error as exc:
+            raise FetchError("%s Content-Encoding corrupt : %s" % (self.encoding, exc))
+            
+    def flush(self) -> bytes:
+        if self._decompressor is None:
+            return b""
+        if not self._decompressor.eof:
+            raise FetchError("%s Content-Encoding truncated" % self.encoding)
+        return self._decompressor.flush()
+
+
+def _content_range( response ) -> Tuple[int, Optional[int]]:
+    """
+    the first byte and the complete length from the Content-Range
+    header of a 206 response, "bytes 100-199/1000" -> (100, 1000)
+    """
+    match = re.fullmatch(r"\s*bytes\s+(\d+)-\d+/(\d+|\*)\s*", response.headers.get("Content-Range", ""))
+    if match is None:
+        raise FetchError("invalid Content-Range %r" % response.headers.get("Content-Range", ""))
+    return int(match.group(1)), None if match.group(2) == "*" else int(match.group(2))
+
+
+def _retry_after( response ) -> Optional[float]:
+    value = response.headers.get("Retry-After", "").strip()
+    return float(value) if value.isdigit() else None
+    
+
+def _part_state_filepath( part_filepath : str ) -> str:
+    return part_filepath + ".json"
+
+def _read_part_state( part_filepath : str, url : str ) -> Optional[dict]:
+    """
+    the state of a partial download of url left by an earlier attempt, with 
+    "size" the bytes in the .part file; None if there is none to resume
+    """
+    try:
+        with open(_part_state_filepath(part_filepath), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        size = os.path.getsize(part_filepath)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("url") != url or not state.get("validator"):
+        return None
+    total = state.get("total")
+    if total is not None and size > total:
+        return None
+    state["size"] = size
+    return state
+
+def _write_part_state( part_filepath : str, state : dict ) -> None:
+    with open(_part_state_filepath(part_filepath), "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+def _remove_part( part_filepath : str ) -> None:
+    for filepath in (part_filepath, _part_state_filepath(part_filepath)):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(filepath)
+
+
+def stream_download( url : str, local_filepath : str,
+                     headers : Optional[Mapping[str,str]] = None,
+                     progress : Optional[ProgressCallback] = None,
+                     max_resumes : int = MAX_RESUMES,
+                     cancelled : Optional[threading.Event] = None ) -> Optional[DownloadResult]:
+    """
+    downloads the resource at url into local_filepath in chunks of
+    CHUNK_SIZE bytes, decoding a gzip or deflate Content-Encoding and
+    computing the sha256 of the file as it is written
+    
+    headers : additional request headers, for a conditional request;
+              returns None if the server responds 304 Not Modified
+    progress : called as progress(received, total) after each chunk; bytes
+               of the transfer as sent, total is None if the length is unknown
+               
+    If the connection drops, the transfer is resumed with a Range request
+    (If-Range against the ETag or Last-Modified of the first response) up
+    to max_resumes times; a server that does not honour the Range restarts
+    the download from the beginning. A partial download kept by an earlier
+    call for the same url and local_filepath is resumed in the same way.
+    
+    If cancelled is set the download stops with DownloadCancelled.
+    
+    raises FetchError on a bad status or a truncated transfer, or OSError or
+    http.client.HTTPException on network failure once the resumes are exhausted
+    """
+    part_filepath = local_filepath + ".part"
+    received = 0            # bytes of the encoded body
+    total : Optional[int] = None
+    validator = ""
+    content_type = etag = last_modified = ""
+    resumes = 0
+    decoder = _ContentDecoder("")
+    digest = hashlib.sha256()
+    size = 0
+    # whether the .part file is kept for a later call after a transient error
+    keep_part = False
+    
+    state = _read_part_state(part_filepath, url)
+    if state is not None:
+        with open(part_filepath, "rb") as part_file:
+            for data in iter(lambda: part_file.read(CHUNK_SIZE), b""):
+                digest.update(data)
+        received = size = state["size"]
+        total = state.get("total", None)
+        validator = state["validator"]
+        content_type = state.get("content_type", "")
+        etag = state.get("etag", "")
+        last_modified = state.get("last_modified", "")
+        keep_part = True
+        logger.info("found %i bytes of an earlier download of %s" % (received, url))
+    else:
+        _remove_part(part_filepath)
+        
+    not_modified = False
+    try:
+        with open(part_filepath, "r+b" if state is not None else "wb") as part_file:
+            part_file.seek(received)
+            while True:
+                if received and total is not None and received >= total:
+                    # an earlier call received the whole file
+                    break
+                request_headers = dict(headers or {})
+                request_headers["Accept-Encoding"] = "gzip, deflate"
+                if received and validator:
+                    # without a validator the partial file may not match
+                    # the current content; the download is restarted
+                    for name in list(request_headers):
+                        if name.lower() in CONDITIONAL_HEADERS:
+                            del request_headers[name]
+                    request_headers["Range"] = "bytes=%i-" % received
+                    request_headers["If-Range"] = validator
+                try:
+                    with get_connection_pool().request("GET", url, request_headers) as response:
+                        if response.status == 304 and not received:
+                            response.read()
+                            not_modified = True
+                            break
+                        if response.status == 206 and received:
+                            start, complete_length = _content_range(response)
+                            if start != received:
+                                raise FetchError("resume of %s returned bytes from %i, expected %i" \
+                                                    % (url, start, received))
+                            encoding = response.headers.get("Content-Encoding", "").strip().lower()
+                            if encoding.replace("identity", "") != decoder.encoding.replace("identity", ""):
+                                raise FetchError("resume of %s returned %s Content-Encoding, expected %s" \
+                                                    % (url, encoding or "identity", decoder.encoding or "identity"))
+                            if complete_length is not None:
+                                total = complete_length
+                            logger.info("resuming download of %s at %i bytes" % (url, received))
+                        elif response.status == 200:
+                            if received:
+                                logger.info("server did not resume %s, restarting download" % url)
+                                part_file.seek(0)
+                                part_file.truncate()
+                                received = size = 0
+                                digest = hashlib.sha256()
+                            content_type = response.headers.get("Content-Type", "")
+                            etag = response.headers.get("ETag", "")
+                            last_modified = response.headers.get("Last-Modified", "")
+                            # a weak ETag cannot be used in If-Range
+                            validator = etag if etag and not etag.startswith("W/") else last_modified
+                            encoding = response.headers.get("Content-Encoding", "").strip().lower()
+                            decoder = _ContentDecoder(encoding)
+                            content_length = response.headers.get("Content-Length", "")
+                            total = int(content_length) if content_length.isdigit() else None
+                            # the state of a decoder is not saved, only a transfer 
+                            # without encoding is resumed by a later call
+                            keep_part = bool(validator) and encoding in ("", "identity")
+                            if keep_part:
+                                _write_part_state(part_filepath, {
+                                    "url" : url, "validator" : validator, "total" : total,
+                                    "content_type" : content_type, "etag" : etag,
+                                    "last_modified" : last_modified })
+                            else:
+                                with contextlib.suppress(FileNotFoundError):
+                                    os.unlink(_part_state_filepath(part_filepath))
+                        else:
+                            raise FetchError("HTTP status returned as %s for %s" % (response.status, url),
+                                             response.status, _retry_after(response))
+                            
+                        while True:
+                            if cancelled is not None and cancelled.is_set():
+                                raise DownloadCancelled("download of %s cancelled" % url)
+                            chunk = response.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            received += len(chunk)
+                            data = decoder.decode(chunk)
+                            digest.update(data)
+                            size += len(data)
+                            part_file.write(data)
+                            if progress is not None:
+                                progress(received, total)
+                    if total is not None and received < total:
+                        raise http.client.IncompleteRead(b"", total - received)
+                    break
+                except RESUMABLE_ERRORS as exc:
+                    if resumes >= max_resumes or not received:
+                        raise
+                    resumes += 1
+                    logger.warning("download of %s interrupted at %i of %s bytes : %r" \
+                                        % (url, received, total if total is not None else "?", exc))
+                    
+            if not not_modified:
+                if total is not None and received != total:
+                    raise FetchError("received %i bytes for %s, expected %i" % (received, url, total))
+                data = decoder.flush()
+                digest.update(data)
+                size += len(data)
+                part_file.write(data)
+    except BaseException as exc:
+        if keep_part and received and is_transient(exc):
+            logger.info("kept %i bytes of the download of %s to resume" % (received, url))
+        else:
+            _remove_part(part_filepath)
+        raise
+    if not_modified:
+        _remove_part(part_filepath)
+        return None
+    os.replace(part_filepath, local_filepath)
+    _remove_part(part_filepath)
+    return DownloadResult(local_filepath, content_type, size, digest.hexdigest(), etag, last_modified)
+
+
+def download_with_retry( url : str, local_filepath : str,
+                         headers : Optional[Mapping[str,str]] = None,
+                         progress : Optional[ProgressCallback] = None ) -> Optional[DownloadResult]:
+    """
+    stream_download with the retries and hedged requests of the configured
+    RetryPolicy. The outcome is recorded in the FailureRegistry by the
+    clients, under the model url of the manifest: url may be the rewritten
+    url of a mirror
+    """
+    policy = get_retry_policy()
+    
+    def attempt() -> Optional[DownloadResult]:
+        if policy.hedge_after > 0:
+            return _hedged_download(url, local_filepath, headers, progress, policy.hedge_after)
+        return stream_download(url, local_filepath, headers, progress)
+        
+    return retry_call(attempt, "download of %s" % url, policy)
+    
+
+def _hedged_download( url : str, local_filepath : str,
+                      headers : Optional[Mapping[str,str]],
+                      progress : Optional[ProgressCallback],
+                      hedge_after : float ) -> Optional[DownloadResult]:
+    """
+    the requests run in worker threads, each into a file of its own; the
+    progress of the latest chunk received is reported from the calling
+    thread, so that progress may update the Blender UI
+    """
+    latest : List[Tuple[int, Optional[int]]] = []
+    
+    def attempt(index : int, cancelled : threading.Event) -> Optional[DownloadResult]:
+        def report(received : int, total : Optional[int]) -> None:
+            latest[:] = [(received, total)]
+        return stream_download( url, "%s.%i" % (local_filepath, index), headers, report,
+                                cancelled=cancelled )
+        
+    def poll() -> None:
+        if progress is not None and latest:
+            progress(*latest[0])
+            
+    def discard(result : Optional[DownloadResult]) -> None:
+        if result is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(result.filepath)
+                
+    result = hedged_call(attempt, hedge_after, poll=poll, discard=discard)
+    if result is None:
+        return None
+    os.replace(result.filepath, local_filepath)
+    return result._replace(filepath=local_filepath)
+
+
+def http_prefix_reader( url : str ) -> Callable[[int], bytes]:
+    """
+    returns a function read_prefix(n) returning the first n bytes of the
+    resource at url (all of it for n < 0), retrieved with HTTP Range
+    requests so that only the start of a large file is transferred. 
+    Bytes already retrieved are not requested again.
+    """
+    received = bytearray()
+    complete = False
+    
+    def read_prefix( nbytes : int ) -> bytes:
+        nonlocal complete
+        if complete or 0 <= nbytes <= len(received):
+            return bytes(received)
+        if nbytes >= 0:
+            headers = {"Range" : "bytes=%i-%i" % (len(received), nbytes - 1)}
+        else:
+            headers = {"Range" : "bytes=%i-" % len(received)}
+        with get_connection_pool().request("GET", url, headers) as response:
+            if response.status == 200:
+                # server ignored the Range header, the body starts at byte 0
+                received.clear()
+            elif response.status == 416 and received:
+                # the previous read ended exactly at the end of the file
+                response.read()
+                complete = True
+                return bytes(received)
+            elif response.status != 206:
+                raise FetchError("HTTP status returned as %s for %s" % (response.status, url),
+                                 response.status)
+            while nbytes < 0 or len(received) < nbytes:
+                chunk = response.read(1 << 16)
+                if not chunk:
+                    complete = True
+                    break
+                received.extend(chunk)
+        return bytes(received)
+        
+    return read_prefix
+    
+    
+def file_prefix_reader( filepath : str ) -> Callable[[int], bytes]:
+    def read_prefix( nbytes : int ) -> bytes:
+        with open(filepath, "rb") as f:
+            return f.read(nbytes)
+    return read_prefix
+    
+
+def read_model_bounds( model_url : str ) -> Optional[Bounds]:
+    """
+    returns the bounding box, in glTF axes, of the glTF model at the http(s)
+    or file model_url; or None if the bounds could not be determined from
+    the json. The url rewrite rules apply.
+    
+    The retrieval is retried as the downloads are, see download_with_retry; a
+    retrieval still failing is recorded in the FailureRegistry under model_url
+    and raised, one of RETRIEVAL_ERRORS
+    """
+    source_url = get_url_mapper().resolve(model_url)
+    
+    def attempt() -> Optional[Bounds]:
+        if uri_scheme(source_url) == "file":
+            read_prefix = file_prefix_reader( uri_to_path(source_url) )
+        else:
+            read_prefix = http_prefix_reader( source_url )
+        try:
+            return gltf_bounds( gltf_json_from_reader(read_prefix) )
+        except (ValueError, KeyError, IndexError, TypeError, struct.error) as exc:
+            logger.warning("unable to determine bounds of %s : %s" % (source_url, str(exc)[:200]))
+            return None
+            
+    try:
+        bounds = retry_call(attempt, "bounds of %s" % model_url)
+    except Exception as exc:
+        get_failure_registry().record_failure(model_url, exc)
+        raise
+    get_failure_registry().record_success(model_url)
+    return bounds
+    
@@ -0,0 +1,221 @@
+"""
+rewriting of model urls to a local mirror
+
+A UrlMapper holds an ordered list of RewriteRule; resolve(url) returns the
+url produced by the first rule that matches, or url itself. The target of a
+rule is a url (a local HTTP mirror) or a filesystem path (a local copy of the
+assets), which resolve returns as a file url. A rule whose target is a path
+is passed over when the file does not exist, so that a partial mirror falls
+back to the following rules and then to the original url.
+
+The rules are read from a json file, a list of objects:
+
+    [
+        {   "match"   : "prefix",
+            "pattern" : "https://iiif.example.org/assets/",
+            "replace" : "/srv/mirror/assets/" },
+        {   "match"   : "glob",
+            "pattern" : "https://*.example.org/models/*.glb",
+            "replace" : "http://mirror.local/\\1/\\2.glb" },
+        {   "match"   : "regex",
+            "pattern" : "^https://cdn[0-9]+\\.example\\.org/(.*)$",
+            "replace" : "http://mirror.local/cdn/\\1" }
+    ]
+
+prefix : a url starting with pattern has it replaced by replace
+glob   : the whole url matches pattern, where * matches any run of
+         characters and ? any one character; \\1, \\2 ... in replace are
+         the text matched by the wildcards, in order
+regex  : the first match of the regular expression pattern in the url is
+         replaced by replace, as re.sub
+
+Rewriting only changes where a model is read from: the iiif id of the
+imported model remains the url in the manifest.
+"""
+
+import json
+import os
+import re
+import threading
+import urllib.parse
+from typing import Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+from ..editing.fileops import path_to_uri
+
+import logging
+logger = logging.getLogger("iiif.network.mirror")
+
+RULE_KINDS = ("prefix", "glob", "regex")
+
+
+class RuleStats(NamedTuple):
+    hits : int          # urls rewritten by the rule
+    missing : int       # matches passed over, the local file not existing
+
+
+class RewriteRule:
+    """
+    raises ValueError for an unknown kind or an invalid regex
+    """
+    def __init__(self, kind : str, pattern : str, replace : str):
+        if kind not in RULE_KINDS:
+            raise ValueError("unknown url rewrite rule match %r" % kind)
+        self.kind = kind
+        self.pattern = pattern
+        self.replace = replace
+        self._regex : Optional[Pattern] = None
+        try:
+            if kind == "glob":
+                self._regex = re.compile( _glob_to_regex(pattern) )
+            elif kind == "regex":
+                self._regex = re.compile( pattern )
+        except re.error as exc:
+            raise ValueError("invalid url rewrite pattern %r : %s" % (pattern, exc))
+
+    @classmethod
+    def from_dict(cls, data : dict) -> "RewriteRule":
+        try:
+            return cls( data.get("match", "prefix"), data["pattern"], data["replace"] )
+        except (KeyError, AttributeError, TypeError):
+            raise ValueError("url rewrite rule requires pattern and replace : %r" % (data,))
+
+    def rewrite(self, url : str) -> Optional[str]:
+        """
+        the rewritten url or path, or None if the rule does not match url
+        """
+        if self.kind == "prefix":
+            if url.startswith(self.pattern):
+                return self.replace + url[len(self.pattern):]
+            return None
+        assert self._regex is not None
+        if self.kind == "glob":
+            match = self._regex.fullmatch(url)
+            return match.expand(self.replace) if match else None
+        rewritten, count = self._regex.subn(self.replace, url, count=1)
+        return rewritten if count else None
+
+    def __str__(self) -> str:
+        return "%s %s -> %s" % (self.kind, self.pattern, self.replace)
+
+
+def _glob_to_regex( pattern : str ) -> str:
+    parts = []
+    for char in pattern:
+        if char == "*":
+            parts.append("(.*)")
+        elif char == "?":
+            parts.append("(.)")
+        else:
+            parts.append(re.escape(char))
+    return "".join(parts)
+
+
+def _as_url( target : str ) -> Optional[str]:
+    """
+    target, a url or a filesystem path from a rule; returns the file url of a
+    path, or None if the file does not exist
+    """
+    if "://" in target:
+        return target
+    # the part taken over from the original url is percent-encoded
+    filepath = os.path.abspath( os.path.expanduser( urllib.parse.unquote(target) ) )
+    if not os.path.isfile(filepath):
+        return None
+    return path_to_uri(filepath)
+
+
+class UrlMapper:
+    """
+    thread safe, resolve is called from the prefetch threads
+    """
+    def __init__(self, rules : Optional[List[RewriteRule]] = None):
+        self.rules : List[RewriteRule] = list(rules or [])
+        self._hits = [0] * len(self.rules)
+        self._missing = [0] * len(self.rules)
+        self._lock = threading.Lock()
+
+    def resolve(self, url : str, count : bool = True) -> str:
+        """
+        the url from which the resource url is read; count False for a
+        lookup which does not read the resource and is not counted in stats
+        """
+        for index, rule in enumerate(self.rules):
+            target = rule.rewrite(url)
+            if target is None:
+                continue
+            resolved = _as_url(target)
+            if not count:
+                if resolved is None:
+                    continue
+                return resolved
+            with self._lock:
+                if resolved is None:
+                    self._missing[index] += 1
+                    continue
+                self._hits[index] += 1
+            logger.debug("%s rewritten to %s" % (url, resolved))
+            return resolved
+        return url
+
+    def stats(self) -> Dict[str, RuleStats]:
+        with self._lock:
+            return { str(rule) : RuleStats(self._hits[i], self._missing[i])
+                        for i, rule in enumerate(self.rules) }
+
+    def stats_lines(self) -> List[str]:
+        return [ "%s : %i urls rewritten, %i local files missing" % (name, stats.hits, stats.missing)
+                    for name, stats in self.stats().items() ]
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._hits = [0] * len(self.rules)
+            self._missing = [0] * len(self.rules)
+
+
+def read_rules( filepath : str ) -> List[RewriteRule]:
+    """
+    the rules of a json rules file; raises OSError or ValueError
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError("url rewrite rules file %s is not a json list" % filepath)
+    return [ RewriteRule.from_dict(item) for item in data ]
+
+
+_url_mapper = UrlMapper()
+
+# (filepath, modification time) of the rules file of _url_mapper
+_rules_source : Optional[Tuple[str, float]] = None
+
+def configure_url_mapper( rules : List[RewriteRule] ) -> None:
+    global _url_mapper, _rules_source
+    _url_mapper = UrlMapper(rules)
+    _rules_source = None
+
+def configure_url_mapper_from_file( filepath : str ) -> None:
+    """
+    the rules of the json file filepath, or no rules for ""; the file is
+    read again only if it has been modified, so that the hit counts are
+    kept. A file that cannot be read is logged and gives no rules
+    """
+    global _url_mapper, _rules_source
+    if not filepath:
+        if _rules_source is not None or _url_mapper.rules:
+            configure_url_mapper([])
+        return
+    try:
+        source = (filepath, os.path.getmtime(filepath))
+        if source == _rules_source:
+            return
+        rules = read_rules(filepath)
+    except (OSError, ValueError) as exc:
+        logger.error("url rewrite rules not read from %s : %s" % (filepath, exc))
+        configure_url_mapper([])
+        return
+    _url_mapper = UrlMapper(rules)
+    _rules_source = source
+    logger.info("%i url rewrite rules read from %s" % (len(rules), filepath))
+
+def get_url_mapper() -> UrlMapper:
+    return _url_mapper
@@ -0,0 +1,329 @@
+"""
+shared HTTP(S) connection pool with keep-alive
+
+Every network request of the add-on goes through the ConnectionPool returned
+by get_connection_pool(), so that the downloads of many models from the same
+IIIF host reuse a few connections instead of paying a TCP and TLS handshake
+for each model.
+
+usage:
+    with get_connection_pool().request("GET", url, {"Range" : "bytes=0-99"}) as response:
+        if response.status == 200:
+            data = response.read()
+
+Unlike urllib.request.urlopen an HTTP error status is not raised as an
+exception, the client checks response.status. Redirects of GET and HEAD
+requests are followed.
+
+A connection is returned to the pool when its response has been read to the
+end and closed; a response closed before it is read completely also closes
+its connection. At most max_per_host connections to a host are in use at a
+time, further requests wait for one to be released.
+
+A connection is opened with connect_timeout, and reads of a response wait
+at most read_timeout seconds for data; either raises TimeoutError.
+
+Where a proxy is configured for the scheme (the http_proxy / https_proxy
+environment variables), requests are passed to urllib.request instead,
+without keep-alive.
+"""
+
+import http.client
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import logging
+logger = logging.getLogger("iiif.network.pool")
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+# http.client sends no User-Agent, which some servers refuse
+DEFAULT_HEADERS = { "User-Agent" : "blender_iiif_3d_plugin" }
+
+# errors on sending a request over, or reading the status from, a kept-alive
+# connection that the server has closed in the meantime
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+    ConnectionAbortedError,
+)
+
+HostKey = Tuple[str, str, int]   # scheme, host, port
+
+
+class HostStats(NamedTuple):
+    requests : int
+    connections_opened : int
+    reuses : int
+    max_in_use : int
+    connect_seconds : float     # total time spent establishing connections
+
+
+class _Host:
+    def __init__(self, max_per_host : int):
+        self.idle : List[Tuple[http.client.HTTPConnection, float]] = []
+        self.slots = threading.BoundedSemaphore(max_per_host)
+        self.in_use = 0
+        self.requests = 0
+        self.connections_opened = 0
+        self.reuses = 0
+        self.max_in_use = 0
+        self.connect_seconds = 0.0
+
+
+class PooledResponse:
+    """
+    the response to a ConnectionPool request; read, status, headers
+    as http.client.HTTPResponse. url is the url after any redirects
+    """
+    def __init__(self, pool : "ConnectionPool", key : Optional[HostKey],
+                       connection : Optional[http.client.HTTPConnection],
+                       response, url : str):
+        self._pool = pool
+        self._key = key
+        self._connection = connection
+        self._response = response
+        self.url = url
+        self.status : int = response.status
+        self.reason : str = response.reason
+        self.headers = response.headers
+
+    def read(self, amt : Optional[int] = None) -> bytes:
+        return self._response.read(amt)
+
+    def close(self) -> None:
+        if self._key is None:
+            self._response.close()
+            return
+        if self._connection is None:
+            return
+        reusable = self._response.isclosed() and not self._response.will_close
+        self._response.close()
+        self._pool._release(self._key, self._connection, reusable)
+        self._connection = None
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ConnectionPool:
+
+    def __init__(   self, max_per_host : int = 6,
+                    max_idle_per_host : int = 6,
+                    idle_seconds : float = 15.0,
+                    connect_timeout : float = 10.0,
+                    read_timeout : float = 60.0,
+                    max_redirects : int = 5):
+        self.max_per_host = max_per_host
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_seconds = idle_seconds
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_redirects = max_redirects
+        self._hosts : Dict[HostKey, _Host] = {}
+        self._lock = threading.Lock()
+        self._ssl_context : Optional[ssl.SSLContext] = None
+
+    def configure_timeouts(self, connect_timeout : float, read_timeout : float) -> None:
+        """
+        applies to the connections opened, or taken from the idle
+        connections, from now on
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    def request(self, method : str, url : str,
+                      headers : Optional[Mapping[str,str]] = None) -> PooledResponse:
+        """
+        sends the request, following redirects, and returns the response;
+        raises OSError or http.client.HTTPException on network failure
+        """
+        for _ in range(self.max_redirects + 1):
+            response = self._request_once(method, url, headers or {})
+            location = response.headers.get("Location", None)
+            if response.status not in REDIRECT_STATUSES or not location:
+                return response
+            # the body of a redirect is small, it is read so that
+            # the connection can be reused
+            response.read()
+            response.close()
+            url = urllib.parse.urljoin(url, location)
+            if response.status == 303:
+                method = "GET"
+            logger.debug("redirected to %s" % url)
+        raise http.client.HTTPException("more than %i redirects for %s" % (self.max_redirects, url))
+
+    def _request_once(self, method : str, url : str, headers : Mapping[str,str]) -> PooledResponse:
+        parsed = urllib.parse.urlsplit(url)
+        scheme = parsed.scheme.lower()
+        if scheme not in ("http", "https"):
+            raise ValueError("unsupported url scheme for %s" % url)
+        if _uses_proxy(scheme, parsed.hostname or ""):
+            return self._request_urllib(method, url, headers)
+
+        key : HostKey = (scheme, parsed.hostname or "", parsed.port or (443 if scheme == "https" else 80))
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        headers = dict(DEFAULT_HEADERS, **headers)
+        host = self._host(key)
+        host.slots.acquire()
+        connection : Optional[http.client.HTTPConnection] = None
+        try:
+            connection, reused = self._connection(key, host)
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                connection.close()
+                logger.debug("kept-alive connection to %s closed by server, reconnecting" % key[1])
+                connection, reused = None, False
+                connection = self._new_connection(key, host)
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+        except BaseException:
+            if connection is not None:
+                connection.close()
+            self._release(key, None, False)
+            raise
+        # Developer Note: a reuse is counted once a response has been
+        # received over the kept-alive connection
+        if reused:
+            with self._lock:
+                host.reuses += 1
+        return PooledResponse(self, key, connection, response, url)
+
+    def _request_urllib(self, method : str, url : str, headers : Mapping[str,str]) -> PooledResponse:
+        request = urllib.request.Request(url, headers=dict(headers), method=method)
+        try:
+            response = urllib.request.urlopen(request, timeout=self.read_timeout)
+        except urllib.error.HTTPError as exc:
+            # as for the pooled connections, the status is returned not raised
+            response = exc
+        return PooledResponse(self, None, None, response, response.geturl())
+
+    def _host(self, key : HostKey) -> _Host:
+        with self._lock:
+            host = self._hosts.get(key, None)
+            if host is None:
+                host = _Host(self.max_per_host)
+                self._hosts[key] = host
+            return host
+
+    def _connection(self, key : HostKey, host : _Host) -> Tuple[http.client.HTTPConnection, bool]:
+        """
+        an idle connection to the host, or a new one; and whether it is reused.
+        The caller holds one of the host slots
+        """
+        now = time.monotonic()
+        with self._lock:
+            host.requests += 1
+            host.in_use += 1
+            host.max_in_use = max(host.max_in_use, host.in_use)
+            while host.idle:
+                connection, released = host.idle.pop()
+                if now - released < self.idle_seconds:
+                    if connection.sock is not None:
+                        connection.sock.settimeout(self.read_timeout)
+                    return connection, True
+                connection.close()
+        return self._new_connection(key, host), False
+
+    def _new_connection(self, key : HostKey, host : _Host) -> http.client.HTTPConnection:
+        scheme, hostname, port = key
+        connection : http.client.HTTPConnection
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            connection = http.client.HTTPSConnection(hostname, port, timeout=self.connect_timeout,
+                                                     context=self._ssl_context)
+        else:
+            connection = http.client.HTTPConnection(hostname, port, timeout=self.connect_timeout)
+        start = time.perf_counter()
+        try:
+            connection.connect()
+        except BaseException:
+            connection.close()
+            raise
+        connection.sock.settimeout(self.read_timeout)
+        with self._lock:
+            host.connections_opened += 1
+            host.connect_seconds += time.perf_counter() - start
+        return connection
+
+    def _release(self, key : HostKey, connection : Optional[http.client.HTTPConnection],
+                       reusable : bool) -> None:
+        host = self._hosts[key]
+        with self._lock:
+            host.in_use -= 1
+            if connection is not None:
+                if reusable and len(host.idle) < self.max_idle_per_host:
+                    host.idle.append( (connection, time.monotonic()) )
+                    connection = None
+        if connection is not None:
+            connection.close()
+        host.slots.release()
+
+    def stats(self) -> Dict[str, HostStats]:
+        """
+        counts per host, keyed by scheme://host:port
+        """
+        with self._lock:
+            return { "%s://%s:%i" % key : HostStats( host.requests, host.connections_opened,
+                                                     host.reuses, host.max_in_use,
+                                                     host.connect_seconds )
+                        for key, host in self._hosts.items() }
+
+    def stats_lines(self) -> List[str]:
+        """
+        one line per host; the saving is estimated as the number of reused
+        connections times the mean time taken to open a connection
+        """
+        lines = []
+        for name, stats in self.stats().items():
+            mean_connect = stats.connect_seconds / stats.connections_opened if stats.connections_opened else 0.0
+            lines.append("%s : %i requests, %i connections opened, %i reused, "
+                         "at most %i in use, connect %.3f s, saved about %.3f s" %
+                         (name, stats.requests, stats.connections_opened, stats.reuses,
+                          stats.max_in_use, stats.connect_seconds, stats.reuses * mean_connect))
+        return lines
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for host in self._hosts.values():
+                host.requests = host.connections_opened = host.reuses = host.max_in_use = 0
+                host.connect_seconds = 0.0
+
+    def close(self) -> None:
+        """
+        closes the idle connections
+        """
+        with self._lock:
+            idle = [connection for host in self._hosts.values() for connection, _ in host.idle]
+            for host in self._hosts.values():
+                host.idle = []
+        for connection in idle:
+            connection.close()
+
+
+def _uses_proxy( scheme : str, hostname : str ) -> bool:
+    proxies = urllib.request.getproxies()
+    return scheme in proxies and not urllib.request.proxy_bypass(hostname)
+
+
+_connection_pool = ConnectionPool()
+
+def get_connection_pool() -> ConnectionPool:
+    return _connection_pool
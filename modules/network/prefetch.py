@@ -0,0 +1,173 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from .cache import DownloadCache
+from .fetch import download_to_file, url_basename
+from .mirror import get_url_mapper
+from .retry import get_failure_registry
+from ..editing.fileops import uri_scheme, uri_to_path
+from ..utils.json_patterns import force_as_list, force_as_object, force_as_singleton
+from ..utils.timing import span
+
+import logging
+logger = logging.getLogger("iiif.network.prefetch")
+
+# Developer Note: The prefetch stage exists because importing a manifest
+# alternates between downloading a model and running the (single-threaded)
+# Blender glTF importer on it. The downloads do not need Blender, so all
+# of them are started up front on a thread pool and the import stage only 
+# waits on the download of the model it is about to import.
+
+NETWORK_SCHEMES = {"http", "https"}
+
+class PrefetchedModel(NamedTuple):
+    filepath : str
+    content_type : str
+    
+
+def collect_model_urls( manifest_data : dict ) -> List[str]:
+    """
+    walks the manifest json, following the same Manifest -> Scene ->
+    AnnotationPage -> Annotation structure as the ImportManifest operator, and
+    returns the list of the distinct http(s) id values of Model resources 
+    in annotation bodies, including those which are the source of a
+    SpecificResource body. Order is the order of first appearance.
+    """
+    urls : Dict[str,None] = {}   # a dict used as an insertion ordered set
+    for scene in force_as_list(manifest_data.get("items")):
+        for url in collect_scene_model_urls(scene):
+            urls[url] = None
+    return list(urls)
+
+def collect_scene_model_urls( scene_data : dict ) -> Iterable[str]:
+    for page in force_as_list(scene_data.get("items")):
+        for url in collect_page_model_urls(page):
+            yield url
+        
+def collect_page_model_urls( page_data : dict ) -> Iterable[str]:
+    for annotation in force_as_list(page_data.get("items")):
+        if not isinstance(annotation, dict):
+            continue
+        for body in force_as_list(annotation.get("body")):
+            body = force_as_object(body, default_type="Model")
+            if body.get("type") == "SpecificResource":
+                body = force_as_object(
+                    force_as_singleton(body.get("source")), default_type="Model"
+                ) or {}
+            model_url = body.get("id")
+            if  body.get("type") == "Model" and \
+                isinstance(model_url, str) and \
+                uri_scheme(model_url) in NETWORK_SCHEMES:
+                yield model_url
+
+class ModelPrefetcher:
+    """
+    Downloads model files concurrently into dest_dir on a bounded
+    thread pool. If a DownloadCache is supplied the files are retrieved
+    through the cache instead, and dest_dir is not used.
+    
+    A client may supply a different fetch callable, called on the worker
+    thread as fetch(url, local_filepath), whose return value is then 
+    the result for the url; for example to retrieve only the bounds of 
+    each model.
+    
+    Usage is as a context manager; on exit queued downloads that have not
+    started are cancelled and the client waits for any running downloads
+    to finish, so that dest_dir can be safely deleted afterwards.
+    """
+    
+    def __init__(   self, dest_dir : str, max_workers : int = 8, 
+                    cache : Optional[DownloadCache] = None,
+                    fetch : Optional[Callable[[str,str], Any]] = None):
+        self.dest_dir = dest_dir
+        self.max_workers = max_workers
+        self.cache = cache
+        self._fetch : Callable[[str,str], Any] = fetch or self._download
+        self._executor : Optional[ThreadPoolExecutor] = None
+        self._futures : Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        
+    def __enter__(self) -> "ModelPrefetcher":
+        if self.max_workers > 0:
+            self._executor = ThreadPoolExecutor(    max_workers=self.max_workers,
+                                                    thread_name_prefix="iiif-prefetch")
+        return self
+        
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, url : str) -> None:
+        """
+        queue the download of url, a url already submitted is not
+        downloaded a second time
+        """
+        if self._executor is None:
+            return
+        with self._lock:
+            if url in self._futures:
+                return
+            local_filepath = os.path.join(  self.dest_dir, 
+                                            "%i_%s" % (len(self._futures), url_basename(url)))
+            self._futures[url] = self._executor.submit(self._timed_fetch, url, local_filepath)
+            
+    def submit_all(self, urls : Iterable[str]) -> None:
+        for url in urls:
+            self.submit(url)
+        
+    def was_submitted(self, url : str) -> bool:
+        """
+        whether url has been queued, so that result(url) is the outcome of its
+        retrieval; the client distinguishes a None result of a failed or empty
+        retrieval from that of a url which was never submitted
+        """
+        with self._lock:
+            return url in self._futures
+            
+    def result(self, url : str) -> Optional[Any]:
+        """
+        blocks until the download of url has completed and returns
+        the local file (or the result of the client fetch callable). 
+        Returns None if url was never submitted or if the download failed;
+        in which case the client is expected to fall back to the (serial) 
+        network download.
+        """
+        with self._lock:
+            future = self._futures.get(url)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as exc:
+            logger.warning("prefetch of %s failed: %r" % (url, exc))
+            return None
+            
+    def _timed_fetch(self, url : str, local_filepath : str) -> Any:
+        with span("prefetch_download", id=url):
+            return self._fetch(url, local_filepath)
+            
+    def _download(self, url : str, local_filepath : str) -> PrefetchedModel:
+        source_url = get_url_mapper().resolve(url)
+        if uri_scheme(source_url) == "file":
+            # a local mirror file is imported in place
+            return PrefetchedModel(uri_to_path(source_url), "")
+        # the outcome is recorded under url, as the manifest has it
+        try:
+            if self.cache is not None:
+                cached = self.cache.fetch(source_url)
+                prefetched = PrefetchedModel(cached.filepath, cached.content_type)
+            else:
+                logger.debug("prefetch %s to %s" % (source_url, local_filepath))
+                content_type = download_to_file(source_url, local_filepath)
+                prefetched = PrefetchedModel(local_filepath, content_type)
+        except Exception as exc:
+            get_failure_registry().record_failure(url, exc)
+            raise
+        get_failure_registry().record_success(url)
+        return prefetched
@@ -0,0 +1,217 @@
+"""
+retries with exponential backoff, hedged requests, and the accounting
+of urls whose retrieval failed
+
+retry_call calls a function until it succeeds, the error is not transient,
+or RetryPolicy.max_attempts is reached; the delay before a retry is drawn
+uniformly from [0, base_delay * 2**n], capped at max_delay ("full jitter"),
+so that the many downloads of a manifest import do not retry in step.
+
+hedged_call runs a function in a worker thread and, if it has not finished
+after hedge_after seconds, runs a second copy; the first to succeed is
+returned and the other is cancelled. This bounds the time lost to the
+occasional stalled response.
+
+The FailureRegistry records the urls whose retrieval failed after all
+retries, so that an import does not wait again on a url that failed.
+"""
+
+import http.client
+import queue
+import random
+import ssl
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, TypeVar
+
+import logging
+logger = logging.getLogger("iiif.network.retry")
+
+T = TypeVar("T")
+
+# HTTP statuses of a failure that may not recur on a later request
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class RetryPolicy(NamedTuple):
+    max_attempts : int = 4
+    base_delay : float = 0.5        # seconds
+    max_delay : float = 8.0
+    hedge_after : float = 0.0       # seconds before a hedged request is sent; 0 for none
+
+
+_retry_policy = RetryPolicy()
+
+def configure_retry( policy : RetryPolicy ) -> None:
+    global _retry_policy
+    _retry_policy = policy
+
+def get_retry_policy() -> RetryPolicy:
+    return _retry_policy
+
+
+def is_transient( exc : BaseException ) -> bool:
+    """
+    whether a request failing with exc may succeed when repeated: network
+    errors, timeouts, and the HTTP statuses in TRANSIENT_STATUSES (an
+    exception with a status attribute, as FetchError)
+    """
+    status = getattr(exc, "status", None)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    if isinstance(exc, ssl.SSLCertVerificationError):
+        return False
+    return isinstance(exc, (OSError, http.client.HTTPException))
+
+
+def backoff_delay( policy : RetryPolicy, attempt : int,
+                   retry_after : Optional[float] = None,
+                   rng : Optional[random.Random] = None ) -> float:
+    """
+    seconds to wait before retry number attempt (from 0); a Retry-After
+    of the server is honoured up to max_delay
+    """
+    delay = (rng or random).uniform(0.0, min(policy.max_delay, policy.base_delay * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, policy.max_delay))
+    return delay
+
+
+def retry_call( func : Callable[[], T], description : str,
+                policy : Optional[RetryPolicy] = None,
+                sleep : Callable[[float], None] = time.sleep,
+                rng : Optional[random.Random] = None ) -> T:
+    """
+    returns func(), retrying on a transient error; the last error is
+    raised when the attempts are exhausted or the error is not transient.
+    sleep and rng, for the backoff delays, may be replaced in tests
+    """
+    policy = policy or get_retry_policy()
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as exc:
+            attempt += 1
+            if attempt >= policy.max_attempts or not is_transient(exc):
+                raise
+            delay = backoff_delay(policy, attempt - 1, getattr(exc, "retry_after", None), rng)
+            logger.warning("%s failed : %r; retry %i of %i in %.1f s" %
+                           (description, exc, attempt, policy.max_attempts - 1, delay))
+            sleep(delay)
+
+
+def hedged_call( func : Callable[[int, threading.Event], T], hedge_after : float,
+                 poll : Optional[Callable[[], None]] = None,
+                 discard : Optional[Callable[[T], None]] = None,
+                 poll_interval : float = 0.1 ) -> T:
+    """
+    calls func(index, cancelled) in a worker thread with index 0, and again
+    with index 1 if the first call has not returned after hedge_after seconds.
+    Returns the result of the first call to succeed; cancelled is then set,
+    and a func still running is expected to check it and stop. The result of
+    a call that succeeds after another is passed to discard. If every call
+    fails the error of the last one is raised.
+
+    poll is called on the calling thread every poll_interval seconds while
+    waiting, for example to report progress.
+    """
+    results : "queue.Queue" = queue.Queue()
+    cancelled = threading.Event()
+    claim = threading.Lock()
+
+    def run(index : int) -> None:
+        try:
+            value = func(index, cancelled)
+        except BaseException as exc:
+            results.put( (False, exc) )
+            return
+        with claim:
+            won = not cancelled.is_set()
+            cancelled.set()
+        if won:
+            results.put( (True, value) )
+        elif discard is not None:
+            discard(value)
+
+    def start(index : int) -> None:
+        threading.Thread(target=run, args=(index,), daemon=True,
+                         name="iiif-hedge-%i" % index).start()
+
+    start(0)
+    started, finished = 1, 0
+    start_time = time.monotonic()
+    try:
+        while True:
+            try:
+                succeeded, value = results.get(timeout=poll_interval)
+            except queue.Empty:
+                if poll is not None:
+                    poll()
+                if started == 1 and hedge_after > 0 and time.monotonic() - start_time >= hedge_after:
+                    logger.info("no response after %.1f s, sending hedged request" % hedge_after)
+                    start(1)
+                    started = 2
+                continue
+            finished += 1
+            if succeeded:
+                if poll is not None:
+                    poll()
+                return value
+            if finished == started:
+                raise value
+    finally:
+        cancelled.set()
+
+
+class FailureRecord(NamedTuple):
+    failures : int
+    last_error : str
+
+
+class FailureRegistry:
+    """
+    urls whose retrieval failed after all retries; thread safe. The urls are
+    the model urls of the manifest, before any url rewrite rule is applied
+    """
+    def __init__(self):
+        self._records : Dict[str, FailureRecord] = {}
+        self._lock = threading.Lock()
+
+    def record_failure(self, url : str, exc : BaseException) -> None:
+        with self._lock:
+            record = self._records.get(url, None)
+            self._records[url] = FailureRecord( (record.failures if record else 0) + 1,
+                                                str(exc)[:200] or repr(exc) )
+
+    def record_success(self, url : str) -> None:
+        with self._lock:
+            self._records.pop(url, None)
+
+    def has_failed(self, url : str) -> bool:
+        with self._lock:
+            return url in self._records
+
+    def forget(self, url : str) -> None:
+        """
+        the next retrieval of url is attempted again
+        """
+        self.record_success(url)
+
+    def failures(self) -> Dict[str, FailureRecord]:
+        with self._lock:
+            return dict(self._records)
+
+    def summary_lines(self) -> List[str]:
+        return [ "%s : failed %i times, %s" % (url, record.failures, record.last_error)
+                    for url, record in self.failures().items() ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+_failure_registry = FailureRegistry()
+
+def get_failure_registry() -> FailureRegistry:
+    return _failure_registry
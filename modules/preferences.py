@@ -0,0 +1,204 @@
+import os
+import tempfile
+from typing import Optional
+
+import bpy
+from bpy.props import BoolProperty, FloatProperty, IntProperty, StringProperty
+from bpy.types import AddonPreferences
+
+from .network.cache import DownloadCache
+from .network.mirror import configure_url_mapper_from_file
+from .network.pool import get_connection_pool
+from .network.retry import RetryPolicy, configure_retry
+from .utils import timing
+
+import logging
+logger = logging.getLogger("iiif.preferences")
+
+# a url rewrite rules file named by this environment variable is used in
+# place of the one in the preferences, for render nodes run in background mode
+URL_REWRITE_ENVIRON = "IIIF_URL_REWRITE_RULES"
+
+# the AddonPreferences bl_idname must be the package name of the add-on,
+# which is the package that contains this modules package
+ADDON_PACKAGE : str = (__package__ or "").rpartition(".")[0]
+
+
+class IIIFAddonPreferences(AddonPreferences):
+    bl_idname = ADDON_PACKAGE
+    
+    use_download_cache: BoolProperty(  # type: ignore
+        name="Cache Downloaded Models",
+        description="Keep downloaded models on disk and revalidate them "
+                    "with the server instead of downloading again",
+        default=True,
+    )
+    
+    download_cache_directory: StringProperty(  # type: ignore
+        name="Cache Directory",
+        description="Directory for cached models, may be shared by several "
+                    "Blender processes; empty uses the extension user directory",
+        default="",
+        subtype="DIR_PATH",
+    )
+    
+    download_cache_size_mb: IntProperty(  # type: ignore
+        name="Cache Size (MB)",
+        description="Least recently used models are removed from the cache "
+                    "when it grows beyond this size",
+        default=2048,
+        min=0,
+    )
+    
+    connect_timeout: FloatProperty(  # type: ignore
+        name="Connect Timeout (s)",
+        description="Time allowed to open a connection to a server",
+        default=10.0,
+        min=1.0,
+    )
+    
+    read_timeout: FloatProperty(  # type: ignore
+        name="Read Timeout (s)",
+        description="Time allowed for a server to send the next data of a response "
+                    "before the download is resumed or retried",
+        default=60.0,
+        min=1.0,
+    )
+    
+    download_attempts: IntProperty(  # type: ignore
+        name="Download Attempts",
+        description="Attempts of a download failing with a network error or a "
+                    "server error (5xx) before it is given up; retries wait with "
+                    "an exponential backoff",
+        default=4,
+        min=1,
+        max=10,
+    )
+    
+    hedge_after: FloatProperty(  # type: ignore
+        name="Hedge After (s)",
+        description="If a download has not finished after this time, a second "
+                    "request for it is sent and the first to finish is used; "
+                    "0 disables hedged requests",
+        default=0.0,
+        min=0.0,
+    )
+    
+    url_rewrite_filepath: StringProperty(  # type: ignore
+        name="URL Rewrite Rules",
+        description="Json file of rules rewriting model urls to a local directory or "
+                    "mirror server; the %s environment variable, if set, "
+                    "takes precedence" % URL_REWRITE_ENVIRON,
+        default="",
+        subtype="FILE_PATH",
+    )
+    
+    record_timings: BoolProperty(  # type: ignore
+        name="Record Timings",
+        description="Record the time spent in each stage of manifest import and "
+                    "export, and log a summary table at the end of the operation",
+        default=False,
+    )
+    
+    timing_trace_filepath: StringProperty(  # type: ignore
+        name="Trace File",
+        description="If set, the recorded timings are also written to this file "
+                    "as Chrome trace-event json",
+        default="",
+        subtype="FILE_PATH",
+    )
+    
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "use_download_cache")
+        column = layout.column()
+        column.enabled = self.use_download_cache
+        column.prop(self, "download_cache_directory")
+        column.prop(self, "download_cache_size_mb")
+        
+        layout.prop(self, "connect_timeout")
+        layout.prop(self, "read_timeout")
+        layout.prop(self, "download_attempts")
+        layout.prop(self, "hedge_after")
+        layout.prop(self, "url_rewrite_filepath")
+        
+        layout.prop(self, "record_timings")
+        column = layout.column()
+        column.enabled = self.record_timings
+        column.prop(self, "timing_trace_filepath")
+        
+
+def get_preferences() -> Optional[IIIFAddonPreferences]:
+    """
+    returns None if the add-on preferences are not registered, for example
+    when the modules are run outside of an installed extension
+    """
+    context = bpy.context
+    if context is None or context.preferences is None:
+        return None
+    addon = context.preferences.addons.get(ADDON_PACKAGE)
+    if addon is None:
+        return None
+    return addon.preferences    # type: ignore
+    
+    
+def configure_timing() -> None:
+    """
+    switch recording of timing spans on or off according to the preferences
+    """
+    prefs = get_preferences()
+    if prefs is None:
+        timing.configure(False)
+    else:
+        timing.configure(   prefs.record_timings, 
+                            bpy.path.abspath(prefs.timing_trace_filepath))
+
+def configure_network() -> None:
+    """
+    apply the timeouts, retry policy, and url rewrite rules of
+    the preferences to the network downloads
+    """
+    prefs = get_preferences()
+    if prefs is None:
+        get_connection_pool().configure_timeouts(10.0, 60.0)
+        configure_retry( RetryPolicy() )
+    else:
+        get_connection_pool().configure_timeouts(prefs.connect_timeout, prefs.read_timeout)
+        configure_retry( RetryPolicy(   max_attempts=prefs.download_attempts,
+                                        hedge_after=prefs.hedge_after) )
+        
+    rules_filepath = os.environ.get(URL_REWRITE_ENVIRON, "")
+    if not rules_filepath and prefs is not None and prefs.url_rewrite_filepath:
+        rules_filepath = bpy.path.abspath(prefs.url_rewrite_filepath)
+    configure_url_mapper_from_file(rules_filepath)
+        
+
+def _default_cache_directory() -> str:
+    try:
+        return bpy.utils.extension_path_user(ADDON_PACKAGE, path="download_cache", create=True)
+    except ValueError:
+        # not running as an extension 
+        return os.path.join(tempfile.gettempdir(), "iiif_download_cache")
+    
+
+def get_download_cache() -> Optional[DownloadCache]:
+    """
+    returns the DownloadCache configured in the preferences, or None 
+    if caching is disabled
+    
+    must be called on the main thread
+    """
+    prefs = get_preferences()
+    if prefs is not None and not prefs.use_download_cache:
+        return None
+        
+    directory = ""
+    max_bytes = 2048 << 20
+    if prefs is not None:
+        directory = bpy.path.abspath(prefs.download_cache_directory)
+        max_bytes = prefs.download_cache_size_mb << 20
+    try:
+        return DownloadCache(directory or _default_cache_directory(), max_bytes)
+    except OSError as exc:
+        logger.warning("download cache unavailable: %r" % (exc,))
+        return None
@@ -4,6 +4,19 @@ from bpy.types import  Context, Operator
 from typing import Set
 import unittest
 from . import transforms
+from . import json_writer
+from . import json_patch
+from . import batch_transforms
+from . import url_rewrite
+from . import stream_import
+from . import download_cache
+from . import id_allocator
+from . import resource_graph
+from . import fragment_cache
+from . import json_cache
+from . import pool
+from . import partial_download
+from . import retry
 
 
 # Achieving the formatting I like
@@ -23,5 +36,18 @@ class RunUnitTests(Operator):
     
         suite=unittest.TestSuite()
         suite.addTest(transforms.suite)
+        suite.addTest(json_writer.suite)
+        suite.addTest(json_patch.suite)
+        suite.addTest(batch_transforms.suite)
+        suite.addTest(url_rewrite.suite)
+        suite.addTest(stream_import.suite)
+        suite.addTest(download_cache.suite)
+        suite.addTest(id_allocator.suite)
+        suite.addTest(resource_graph.suite)
+        suite.addTest(fragment_cache.suite)
+        suite.addTest(json_cache.suite)
+        suite.addTest(pool.suite)
+        suite.addTest(partial_download.suite)
+        suite.addTest(retry.suite)
         TextTestRunner(verbosity=2).run(suite)
         return {"FINISHED"}
\ No newline at end of file
@@ -0,0 +1,44 @@
+import  random
+import  unittest
+
+from ..editing.transforms import Transform, transformsToPlacements
+from ..utils.batch_transforms import placements_from_iiif
+
+
+def random_transform( rng ):
+    ttype = rng.choice(["RotateTransform", "ScaleTransform", "TranslateTransform", "PointSelector"])
+    data = { "type" : ttype }
+    for axis in "xyz":
+        if rng.random() < 0.6:
+            if ttype == "ScaleTransform":
+                data[axis] = rng.choice([1.0, 2.0, -2.0, 0.5, -1.0])
+            elif ttype == "RotateTransform":
+                data[axis] = rng.choice([0.0, 90.0, -30.0, 180.0, rng.uniform(-180.0, 180.0)])
+            else:
+                data[axis] = rng.uniform(-5.0, 5.0)
+    return data
+
+class BatchTransformTest(unittest.TestCase):
+
+    def test10(self):
+        "batch_transforms: placements agree with transformsToPlacements"
+        rng = random.Random(17)
+        records = [ [random_transform(rng) for _ in range(rng.randint(0, 4))] for _ in range(500) ]
+        batch = placements_from_iiif(records)
+
+        for row, record in enumerate(records):
+            placements = list( transformsToPlacements( map(Transform.from_iiif_dict, record) ) )
+            if len(placements) > 1:
+                self.assertTrue( batch.split[row], msg=repr(record))
+            if batch.split[row] or len(placements) != 1:
+                continue
+            placement = placements[0]
+            for first, second in [
+                    (batch.scaling[row],     placement.scaling.data),
+                    (batch.rotation[row],    placement.rotation.data),
+                    (batch.translation[row], placement.translation.data)]:
+                for i in range(len(first)):
+                    self.assertAlmostEqual( float(first[i]), second[i], places=6, msg=repr(record) )
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( BatchTransformTest )  )
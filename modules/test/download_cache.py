@@ -0,0 +1,106 @@
+import  json
+import  os
+import  tempfile
+import  threading
+import  unittest
+
+from ..network import cache
+from ..network.cache import DownloadCache, INDEX_FILENAME, LOCK_FILENAME
+from .local_server import LocalServer
+
+
+class DownloadCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.server = LocalServer().__enter__()
+        self.grace_seconds = cache.EVICTION_GRACE_SECONDS
+
+    def tearDown(self):
+        cache.EVICTION_GRACE_SECONDS = self.grace_seconds
+        self.server.__exit__(None, None, None)
+        self.directory.cleanup()
+
+    def read_index(self) -> dict:
+        with open(os.path.join(self.directory.name, INDEX_FILENAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def test10(self):
+        "download_cache: a miss downloads, a hit is revalidated and served from disk"
+        self.server.add("/chair.glb", b"glTF chair", etag='"v1"')
+        download_cache = DownloadCache(self.directory.name, 1 << 20)
+        url = self.server.url("/chair.glb")
+
+        first = download_cache.fetch(url)
+        second = download_cache.fetch(url)
+        self.assertEqual( first, second )
+        self.assertEqual( first.content_type, "model/gltf-binary" )
+        with open(first.filepath, "rb") as f:
+            self.assertEqual( f.read(), b"glTF chair" )
+        self.assertTrue( first.filepath.endswith(".glb") )
+
+        requests = self.server.requested("/chair.glb")
+        self.assertEqual( len(requests), 2 )
+        self.assertNotIn( "If-None-Match", requests[0] )
+        self.assertEqual( requests[1].get("If-None-Match"), '"v1"' )
+
+    def test20(self):
+        "download_cache: a changed resource replaces the cached copy"
+        resource = self.server.add("/chair.glb", b"glTF chair", etag='"v1"')
+        download_cache = DownloadCache(self.directory.name, 1 << 20)
+        url = self.server.url("/chair.glb")
+        first = download_cache.fetch(url)
+        resource.body, resource.etag = b"glTF chair, remodelled", '"v2"'
+        second = download_cache.fetch(url)
+        self.assertNotEqual( first.filepath, second.filepath )
+        with open(second.filepath, "rb") as f:
+            self.assertEqual( f.read(), b"glTF chair, remodelled" )
+        self.assertEqual( self.read_index()[url]["etag"], '"v2"' )
+
+    def test30(self):
+        "download_cache: least recently used entries are evicted over max_bytes"
+        cache.EVICTION_GRACE_SECONDS = 0
+        for name in ("a", "b", "c"):
+            self.server.add("/%s.glb" % name, name.encode("ascii") * 100, etag='"%s"' % name)
+        download_cache = DownloadCache(self.directory.name, 250)
+
+        cached = { name : download_cache.fetch(self.server.url("/%s.glb" % name))
+                        for name in ("a", "b", "c") }
+        index = self.read_index()
+        self.assertNotIn( self.server.url("/a.glb"), index )
+        self.assertIn( self.server.url("/b.glb"), index )
+        self.assertIn( self.server.url("/c.glb"), index )
+        self.assertFalse( os.path.exists(cached["a"].filepath) )
+        self.assertTrue( os.path.exists(cached["c"].filepath) )
+
+    def test40(self):
+        "download_cache: recently used entries are kept within the grace period"
+        for name in ("a", "b", "c"):
+            self.server.add("/%s.glb" % name, name.encode("ascii") * 100, etag='"%s"' % name)
+        download_cache = DownloadCache(self.directory.name, 250)
+        for name in ("a", "b", "c"):
+            download_cache.fetch(self.server.url("/%s.glb" % name))
+        self.assertEqual( len(self.read_index()), 3 )
+
+    def test50(self):
+        "download_cache: the index is only read and written with the lock file held"
+        self.server.add("/chair.glb", b"glTF chair", etag='"v1"')
+        download_cache = DownloadCache(self.directory.name, 1 << 20)
+        lock_filepath = os.path.join(self.directory.name, LOCK_FILENAME)
+
+        # a second lock on the file stands in for another Blender process
+        other_process = cache._FileLock(lock_filepath)
+        fetched = []
+        with other_process.held():
+            worker = threading.Thread(target=lambda: fetched.append(
+                                        download_cache.fetch(self.server.url("/chair.glb"))))
+            worker.start()
+            worker.join(0.5)
+            self.assertTrue( worker.is_alive() )
+            self.assertEqual( self.server.requested("/chair.glb"), [] )
+        worker.join(10.0)
+        self.assertEqual( len(fetched), 1 )
+        self.assertTrue( os.path.exists(lock_filepath) )
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( DownloadCacheTest )  )
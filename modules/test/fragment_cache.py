@@ -0,0 +1,132 @@
+import  json
+import  os
+import  tempfile
+import  unittest
+
+import bpy
+
+from ..editing.annotation_cache import get_fragment_cache, clear_fragment_cache
+from ..editing.collections import ( new_manifest,
+                                    new_scene,
+                                    new_annotation_page,
+                                    new_annotation,
+                                    move_collection_into_parent,
+                                    move_object_into_collection,
+                                    invalidate_resource_graph )
+from ..editing.json_cache import get_json_property, set_json_property, thaw
+
+
+class FragmentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.manifest = new_manifest()
+        scene = new_scene()
+        page = new_annotation_page()
+        self.annotation = new_annotation()
+        move_collection_into_parent(scene, self.manifest)
+        move_collection_into_parent(page, scene)
+        move_collection_into_parent(self.annotation, page)
+        # linked to the scene, so that the depsgraph evaluates the model
+        bpy.context.scene.collection.children.link(self.manifest)
+
+        self.model = bpy.data.objects.new("fragment_cache_test", None)
+        self.model["iiif_id"] = "https://example.org/iiif/fragment_cache/model.glb"
+        self.model["iiif_type"] = "Model"
+        set_json_property(self.model, { "id" : self.model["iiif_id"], "type" : "Model",
+                                        "format" : "model/gltf-binary" })
+        move_object_into_collection(self.model, self.annotation)
+        self.update()
+        clear_fragment_cache()
+
+    def tearDown(self):
+        bpy.context.scene.collection.children.unlink(self.manifest)
+        bpy.data.objects.remove(self.model)
+        for collection in self.manifest.children_recursive:
+            bpy.data.collections.remove(collection)
+        bpy.data.collections.remove(self.manifest)
+        invalidate_resource_graph()
+        clear_fragment_cache()
+        self.directory.cleanup()
+
+    def update(self) -> None:
+        """
+        evaluates the depsgraph, which runs the depsgraph_update_post handlers
+        """
+        bpy.context.view_layer.update()
+
+    def export(self) -> dict:
+        """
+        the annotation as exported
+        """
+        bpy.ops.export_scene.iiif_manifest( # pyright: ignore[reportAttributeAccessIssue]
+            filepath=os.path.join(self.directory.name, "manifest.json"),
+            export_all=True, manifest_names=self.manifest["iiif_id"] )
+        filepath = os.path.join(self.directory.name, bpy.path.clean_name(self.manifest.name) + ".json")
+        with open(filepath, "r", encoding="utf-8") as f:
+            manifest_data = json.load(f)
+        return manifest_data["items"][0]["items"][0]["items"][0]
+
+    def point(self, anno_data : dict) -> tuple:
+        selector = anno_data["target"]["selector"]
+        return ( selector["x"], selector["y"], selector["z"] )
+
+    def test10(self):
+        "fragment_cache: an unchanged annotation is reused"
+        self.model.location = (1.0, 2.0, 3.0)
+        self.update()
+        first = self.export()
+        cache = get_fragment_cache()
+        self.assertEqual( (cache.hits, cache.misses), (0, 1) )
+        self.assertEqual( self.export(), first )
+        self.assertEqual( (cache.hits, cache.misses), (1, 0) )
+
+    def test20(self):
+        "fragment_cache: an edit of the model, its undo, and re-exports"
+        self.model.location = (1.0, 2.0, 3.0)
+        self.update()
+        first = self.export()
+        self.assertEqual( self.point(first), (1.0, 2.0, 3.0) )
+
+        self.model.location = (4.0, 5.0, 6.0)
+        self.update()
+        edited = self.export()
+        self.assertEqual( self.point(edited), (4.0, 5.0, 6.0) )
+        self.assertEqual( get_fragment_cache().misses, 1 )
+
+        # an undo restores the data, and runs the undo_post handlers
+        self.model.location = (1.0, 2.0, 3.0)
+        for handler in bpy.app.handlers.undo_post:
+            if handler is clear_fragment_cache:
+                handler(None, None)
+        self.assertEqual( len(get_fragment_cache()), 0 )
+        self.assertEqual( self.point(self.export()), (1.0, 2.0, 3.0) )
+
+    def test30(self):
+        "fragment_cache: a change of the iiif_json of the annotation"
+        self.export()
+        data = thaw( get_json_property(self.annotation) )
+        data["label"] = { "en" : ["relabelled"] }
+        set_json_property(self.annotation, data)
+        self.update()
+        self.assertEqual( self.export()["label"], { "en" : ["relabelled"] } )
+
+    def test40(self):
+        "fragment_cache: the data stored are read-only"
+        self.export()
+        cache = get_fragment_cache()
+        fragment = cache.lookup(self.annotation, (None,))
+        self.assertIsNotNone( fragment )
+        with self.assertRaises(TypeError):
+            fragment["motivation"] = ["commenting"] # pyright: ignore[reportOptionalSubscript]
+        with self.assertRaises(TypeError):
+            fragment["motivation"].append("commenting") # pyright: ignore[reportOptionalSubscript]
+
+    def test50(self):
+        "fragment_cache: not used by a streaming export"
+        bpy.ops.export_scene.iiif_manifest( # pyright: ignore[reportAttributeAccessIssue]
+            filepath=os.path.join(self.directory.name, "streamed.json"), use_streaming=True )
+        self.assertEqual( len(get_fragment_cache()), 0 )
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( FragmentCacheTest )  )
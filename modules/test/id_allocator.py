@@ -0,0 +1,68 @@
+import  unittest
+
+import bpy
+
+from .. import editing
+from ..editing import RANDOM_TEXT, generate_id, is_generated_id, reserve_id, reset_id_allocator
+
+
+def id_number( iiif_id : str ) -> int:
+    return int( iiif_id.rsplit("/", 1)[1] )
+
+def generated_form( resource_type : str, number : int ) -> str:
+    return "https://%s/%s/%i" % (RANDOM_TEXT, resource_type, number)
+
+
+class IdAllocatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.objects = []
+
+    def tearDown(self):
+        for obj in self.objects:
+            bpy.data.objects.remove(obj)
+
+    def new_object_with_id(self, iiif_id : str) -> bpy.types.Object:
+        obj = bpy.data.objects.new("id_allocator_test", None)
+        obj["iiif_id"] = iiif_id
+        self.objects.append(obj)
+        return obj
+
+    def test10(self):
+        "id_allocator: generated ids are distinct, per resource type"
+        ids = [ generate_id("Scene") for _ in range(5) ] + [ generate_id("Model") for _ in range(5) ]
+        self.assertEqual( len(set(ids)), len(ids) )
+        for iiif_id in ids:
+            self.assertTrue( is_generated_id(iiif_id) )
+        self.assertTrue( all( "/scene/" in iiif_id for iiif_id in ids[:5] ) )
+        self.assertFalse( is_generated_id("https://example.org/scene/1") )
+
+    def test20(self):
+        "id_allocator: an id recorded with reserve_id is not generated again"
+        current = id_number( generate_id("Model") )
+        reserved = generated_form("model", current + 100)
+        self.new_object_with_id(reserved)
+        reserve_id(reserved)
+        self.assertGreater( id_number( generate_id("Model") ), current + 100 )
+
+    def test30(self):
+        "id_allocator: the index is rebuilt lazily from the Blender data"
+        current = id_number( generate_id("Model") )
+        # assigned without reserve_id, so only found by a rebuild of the index
+        self.new_object_with_id( generated_form("model", current + 500) )
+        reset_id_allocator()
+        self.assertIsNone( editing._allocator._counters )
+        self.assertGreater( id_number( generate_id("Model") ), current + 500 )
+        self.assertIsNotNone( editing._allocator._counters )
+
+    def test40(self):
+        "id_allocator: the index is reset when a blend file is loaded"
+        self.assertIn( reset_id_allocator, bpy.app.handlers.load_post )
+        generate_id("Model")
+        for handler in bpy.app.handlers.load_post:
+            if handler is reset_id_allocator:
+                handler(None, None)
+        self.assertIsNone( editing._allocator._counters )
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( IdAllocatorTest )  )
@@ -0,0 +1,248 @@
+import  copy
+import  io
+import  json
+import  pickle
+import  unittest
+
+import bpy
+
+from ..editing import json_cache
+from ..editing.json_cache import ( FrozenDict,
+                                   FrozenList,
+                                   freeze,
+                                   thaw,
+                                   get_json_property,
+                                   set_json_property,
+                                   set_json_text_from_stream,
+                                   clear_parsed_json_cache,
+                                   compress_json_properties,
+                                   encode_json_text,
+                                   encode_json_stream,
+                                   decode_json_text,
+                                   COMPRESS_MIN_LENGTH,
+                                   STORAGE_PREFIX )
+
+DATA = {
+    "id" : "https://example.org/iiif/json_cache/manifest.json",
+    "type" : "Manifest",
+    "label" : { "en" : ["Json Cache"] },
+    "items" : [ { "id" : "https://example.org/iiif/json_cache/scene", "type" : "Scene" } ],
+}
+
+class FrozenTest(unittest.TestCase):
+
+    def test10(self):
+        "json_cache: FrozenDict and FrozenList raise TypeError on modification"
+        frozen = freeze(DATA)
+        self.assertIsInstance( frozen, FrozenDict )
+        self.assertIsInstance( frozen["items"], FrozenList )
+        self.assertIsInstance( frozen["items"][0], FrozenDict )
+        modifications = [
+            lambda : frozen.__setitem__("type", "Scene"),
+            lambda : frozen.__delitem__("type"),
+            lambda : frozen.update(type="Scene"),
+            lambda : frozen.setdefault("summary", {}),
+            lambda : frozen.pop("type"),
+            lambda : frozen.clear(),
+            lambda : frozen["label"]["en"].append("more"),
+            lambda : frozen["items"].__setitem__(0, {}),
+            lambda : frozen["items"].extend([{}]),
+            lambda : frozen["items"].sort(),
+            lambda : frozen["items"][0].__setitem__("type", "Manifest"),
+        ]
+        for modification in modifications:
+            with self.assertRaises(TypeError):
+                modification()
+        self.assertEqual( frozen, DATA )
+
+    def test20(self):
+        "json_cache: frozen values are equal to, and encode as, the plain values"
+        frozen = freeze(DATA)
+        self.assertEqual( frozen, DATA )
+        self.assertEqual( DATA, frozen )
+        self.assertEqual( frozen["items"], DATA["items"] )
+        self.assertEqual( json.dumps(frozen), json.dumps(DATA) )
+        self.assertNotEqual( frozen, dict(DATA, type="Scene") )
+        # unhashable, as dict and list are
+        with self.assertRaises(TypeError):
+            hash(frozen)
+        with self.assertRaises(TypeError):
+            hash(frozen["items"])
+
+    def test30(self):
+        "json_cache: thaw, copy, deepcopy, and pickle give modifiable values"
+        frozen = freeze(DATA)
+        thawed = thaw(frozen)
+        self.assertIs( type(thawed), dict )
+        thawed["type"] = "Scene"
+        self.assertEqual( frozen["type"], "Manifest" )
+        # thaw is shallow, the nested values stay frozen
+        self.assertIsInstance( thawed["items"], FrozenList )
+
+        for plain in ( copy.copy(frozen), copy.deepcopy(frozen), pickle.loads(pickle.dumps(frozen)) ):
+            self.assertIs( type(plain), dict )
+            self.assertEqual( plain, DATA )
+            plain["type"] = "Scene"
+        deep = copy.deepcopy(frozen)
+        deep["items"].append({})
+        deep["label"]["en"].append("more")
+        self.assertEqual( frozen, DATA )
+
+
+class ParsedJSONCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = bpy.data.collections.new("json_cache_test")
+        clear_parsed_json_cache()
+        self.cache = json_cache._parsed_json_cache
+        self.cache.hits = self.cache.misses = 0
+
+    def tearDown(self):
+        bpy.data.collections.remove(self.collection)
+        clear_parsed_json_cache()
+
+    def test10(self):
+        "json_cache: a property is decoded once and the value shared"
+        set_json_property(self.collection, DATA)
+        first = get_json_property(self.collection)
+        second = get_json_property(self.collection)
+        self.assertIs( first, second )
+        self.assertEqual( first, DATA )
+        self.assertEqual( (self.cache.hits, self.cache.misses), (1, 1) )
+
+    def test20(self):
+        "json_cache: a changed property is decoded again"
+        set_json_property(self.collection, DATA)
+        first = get_json_property(self.collection)
+        set_json_property(self.collection, dict(DATA, type="Scene"))
+        second = get_json_property(self.collection)
+        self.assertIsNot( first, second )
+        self.assertEqual( second["type"], "Scene" )
+        self.assertEqual( first["type"], "Manifest" )
+
+        # a property assigned directly, not with set_json_property
+        self.collection["iiif_json"] = json.dumps(dict(DATA, type="AnnotationPage"))
+        self.assertEqual( get_json_property(self.collection)["type"], "AnnotationPage" )
+        self.assertEqual( self.cache.misses, 3 )
+
+    def test30(self):
+        "json_cache: the same text stored again is a hit"
+        set_json_property(self.collection, DATA)
+        first = get_json_property(self.collection)
+        set_json_property(self.collection, DATA)
+        self.assertIs( get_json_property(self.collection), first )
+
+    def test40(self):
+        "json_cache: the default for a missing or empty property, entries per property name"
+        self.assertIsNone( get_json_property(self.collection) )
+        self.collection["iiif_json"] = ""
+        self.assertEqual( get_json_property(self.collection, default=FrozenDict()), {} )
+        set_json_property(self.collection, DATA)
+        set_json_property(self.collection, {"type" : "Scene"}, "iiif_scene")
+        self.assertEqual( get_json_property(self.collection)["type"], "Manifest" )
+        self.assertEqual( get_json_property(self.collection, "iiif_scene")["type"], "Scene" )
+
+    def test50(self):
+        "json_cache: the cache is cleared on load, undo, and redo"
+        set_json_property(self.collection, DATA)
+        first = get_json_property(self.collection)
+        for handler_list in ( bpy.app.handlers.load_post,
+                              bpy.app.handlers.undo_post,
+                              bpy.app.handlers.redo_post ):
+            self.assertIn( clear_parsed_json_cache, handler_list )
+        clear_parsed_json_cache()
+        self.assertIsNot( get_json_property(self.collection), first )
+
+class StorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.datablocks = []
+
+    def tearDown(self):
+        for datablocks, datablock in self.datablocks:
+            datablocks.remove(datablock)
+        clear_parsed_json_cache()
+
+    def long_text(self) -> str:
+        data = dict(DATA, summary={ "en" : ["a summary " * 40] })
+        text = json.dumps(data)
+        self.assertGreaterEqual( len(text), COMPRESS_MIN_LENGTH )
+        return text
+
+    def test10(self):
+        "json_cache: a long text is stored compressed, with the storage prefix"
+        text = self.long_text()
+        stored = encode_json_text(text)
+        self.assertIsInstance( stored, bytes )
+        self.assertTrue( stored.startswith(STORAGE_PREFIX) )
+        self.assertLess( len(stored), len(text) )
+        self.assertEqual( decode_json_text(stored), text )
+        # non-ascii text
+        text = json.dumps({ "label" : { "de" : ["Stühle und Tische " * 20] } }, ensure_ascii=False)
+        self.assertEqual( decode_json_text(encode_json_text(text)), text )
+
+    def test20(self):
+        "json_cache: the compression threshold is COMPRESS_MIN_LENGTH characters"
+        self.assertEqual( COMPRESS_MIN_LENGTH, 256 )
+        short = "[" + " " * (COMPRESS_MIN_LENGTH - 3) + "]"
+        self.assertEqual( len(short), COMPRESS_MIN_LENGTH - 1 )
+        self.assertEqual( encode_json_text(short), short )
+        at_threshold = short + " "
+        stored = encode_json_text(at_threshold)
+        self.assertIsInstance( stored, bytes )
+        self.assertEqual( decode_json_text(stored), at_threshold )
+
+    def test30(self):
+        "json_cache: a streamed text is stored as encode_json_text stores it"
+        for text in ( self.long_text(), json.dumps(DATA) ):
+            for chunk_size in (7, 1 << 20):
+                stored = encode_json_stream( io.StringIO(text), chunk_size )
+                self.assertEqual( type(stored), type(encode_json_text(text)) )
+                self.assertEqual( decode_json_text(stored), text )
+
+    def test40(self):
+        "json_cache: set_json_property, set_json_text_from_stream and get_json_property round trip"
+        collection = bpy.data.collections.new("json_cache_test")
+        self.datablocks.append( (bpy.data.collections, collection) )
+        text = self.long_text()
+        set_json_property(collection, json.loads(text))
+        self.assertTrue( collection["iiif_json"].startswith(STORAGE_PREFIX) )
+        self.assertEqual( get_json_property(collection), json.loads(text) )
+        set_json_text_from_stream(collection, io.StringIO(text), "iiif_manifest")
+        self.assertEqual( get_json_property(collection, "iiif_manifest"), json.loads(text) )
+        with self.assertRaises(ValueError):
+            decode_json_text(b"unknown:" + collection["iiif_json"])
+
+    def test50(self):
+        "json_cache: compress_json_properties migrates legacy plain string properties"
+        text = self.long_text()
+        short = json.dumps({ "type" : "Scene" })
+        collection = bpy.data.collections.new("json_cache_test")
+        model = bpy.data.objects.new("json_cache_test", None)
+        self.datablocks += [ (bpy.data.collections, collection), (bpy.data.objects, model) ]
+        collection["iiif_json"] = text
+        collection["iiif_scene"] = short
+        model["iiif_json"] = text
+        model["iiif_body"] = text
+        model["other_property"] = text
+
+        legacy = get_json_property(collection)
+        compress_json_properties()
+        for datablock, name in ( (collection, "iiif_json"), (model, "iiif_json"), (model, "iiif_body") ):
+            self.assertTrue( datablock[name].startswith(STORAGE_PREFIX) )
+            self.assertEqual( decode_json_text(datablock[name]), text )
+        # short texts, and properties not holding json, are left as they are
+        self.assertEqual( collection["iiif_scene"], short )
+        self.assertEqual( model["other_property"], text )
+        self.assertEqual( get_json_property(collection), legacy )
+        self.assertIn( compress_json_properties, bpy.app.handlers.load_post )
+
+        # a second run leaves the compressed properties unchanged
+        stored = collection["iiif_json"]
+        compress_json_properties()
+        self.assertEqual( collection["iiif_json"], stored )
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( FrozenTest )  )
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( ParsedJSONCacheTest )  )
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( StorageTest )  )
@@ -0,0 +1,57 @@
+
+
+import  copy
+import  unittest 
+
+from ..utils.json_patch import (    make_json_patch, 
+                                    apply_json_patch,
+                                    make_merge_patch,
+                                    apply_merge_patch )
+
+
+ORIGINAL = {
+    "id" : "https://example.org/manifest",
+    "type" : "Manifest",
+    "label" : { "en" : ["original"] },
+    "items" : [
+        { "id" : "https://example.org/anno/%i" % i, "type" : "Annotation", "visible" : True }
+        for i in range(5)
+    ]
+}
+        
+class JSONPatchTest(unittest.TestCase):
+
+    def edited(self):
+        edited = copy.deepcopy(ORIGINAL)
+        edited["label"]["en"] = ["edited"]
+        edited["items"].insert(2, { "id" : "https://example.org/anno/new", "type" : "Annotation" })
+        del edited["items"][4]["visible"]
+        edited["rights"] = "https://creativecommons.org/licenses/by/4.0/"
+        return edited
+        
+    def test10(self):
+        "json_patch: patch applied to the original gives the edited manifest"
+        edited = self.edited()
+        patch = make_json_patch(ORIGINAL, edited)
+        self.assertEqual( apply_json_patch(ORIGINAL, patch), edited )
+        
+    def test20(self):
+        "json_patch: insertion into items is a single add operation"
+        edited = copy.deepcopy(ORIGINAL)
+        edited["items"].insert(2, { "id" : "https://example.org/anno/new" })
+        patch = make_json_patch(ORIGINAL, edited)
+        self.assertEqual( patch, [{"op" : "add", "path" : "/items/2", "value" : edited["items"][2]}] )
+
+    def test30(self):
+        "json_patch: true is not equal to 1"
+        self.assertEqual( len(make_json_patch([True], [1])), 1)
+
+    def test40(self):
+        "json_patch: merge patch applied to the original gives the edited manifest"
+        edited = self.edited()
+        patch = make_merge_patch(ORIGINAL, edited)
+        self.assertEqual( apply_merge_patch(ORIGINAL, patch), edited )
+        self.assertEqual( make_merge_patch(ORIGINAL, copy.deepcopy(ORIGINAL)), {} )
+        
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( JSONPatchTest )  )
@@ -0,0 +1,66 @@
+
+
+import  io
+import  json
+import  unittest 
+
+from ..utils.json_writer import JSONStreamWriter, StreamedArray
+
+
+MANIFEST = {
+    "@context": "http://iiif.io/api/presentation/4/context.json",
+    "id" : "https://example.org/manifest",
+    "type" : "Manifest",
+    "label" : { "en" : ["café \"scene\"\nline two"] },
+    "items" : [
+        {
+            "id" : "https://example.org/scene/1",
+            "type" : "Scene",
+            "items" : [
+                {
+                    "id" : "https://example.org/page/1",
+                    "type" : "AnnotationPage",
+                    "items" : [
+                        { "id" : "https://example.org/anno/1", "motivation" : ["painting"], "body" : {} },
+                        { "id" : "https://example.org/anno/2", "target" : [ 1.5, -2, None, True ] }
+                    ]
+                },
+                { "id" : "https://example.org/page/2", "type" : "AnnotationPage", "items" : [] }
+            ],
+            "backgroundColor" : "#FFFFFF"
+        }
+    ],
+    "rights" : "https://creativecommons.org/licenses/by/4.0/"
+}
+
+def streamed( data ):
+    """
+    copy of data in which each items list is replaced by a StreamedArray
+    over a generator
+    """
+    if isinstance(data, dict):
+        return { key : ( StreamedArray( streamed(item) for item in value ) if key == "items" else value )
+                 for key, value in data.items() }
+    return data
+        
+class JSONWriterTest(unittest.TestCase):
+
+    def check_identical(self, **keyw):
+        buffer = io.StringIO()
+        JSONStreamWriter(buffer, **keyw).write( streamed(MANIFEST) )
+        self.assertEqual( buffer.getvalue(), json.dumps(MANIFEST, **keyw) )
+        
+    def test10(self):
+        "json_writer: identical to json.dump with indent=2"
+        self.check_identical(indent=2)
+
+    def test20(self):
+        "json_writer: identical to json.dump without indent"
+        self.check_identical()
+        
+    def test30(self):
+        "json_writer: identical to json.dump with compact separators"
+        self.check_identical(separators=(",",":"))
+        
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( JSONWriterTest )  )
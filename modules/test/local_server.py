@@ -0,0 +1,142 @@
+"""
+a local HTTP/1.1 server for the tests of the network modules
+
+usage:
+    with LocalServer() as server:
+        server.add("/model.glb", b"...", etag='"v1"')
+        download_to_file( server.url("/model.glb"), filepath )
+
+The server keeps connections alive, and honours Range with If-Range, and
+If-None-Match. Each request is recorded in server.requests as the path and
+the request headers; server.connections counts the accepted connections.
+"""
+
+import http.server
+import socketserver
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class Resource:
+    """
+    drops : offsets in the body at which the connection is dropped, one
+            offset for each of the next requests of the resource
+    close_after : the server closes the connection after the response,
+                  without a Connection: close header, as a server closing
+                  an idle kept-alive connection
+    status : a status sent, without a body, instead of the resource
+    """
+    def __init__(self, body : bytes, etag : str = "", content_type : str = "model/gltf-binary",
+                       drops : Optional[List[int]] = None, close_after : bool = False,
+                       status : Optional[int] = None):
+        self.body = body
+        self.etag = etag
+        self.content_type = content_type
+        self.drops = list(drops or [])
+        self.close_after = close_after
+        self.status = status
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server : "_Server"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.owner.connections += 1
+
+    def do_GET(self) -> None:
+        owner = self.server.owner
+        with self.server.lock:
+            owner.requests.append( (self.path, dict(self.headers.items())) )
+            resource = owner.resources.get(self.path, None)
+            drop = resource.drops.pop(0) if resource is not None and resource.drops else None
+        if resource is None or resource.status is not None:
+            self.send_response(resource.status if resource is not None else 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if resource.etag and self.headers.get("If-None-Match", "") == resource.etag:
+            self.send_response(304)
+            self.send_header("ETag", resource.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = resource.body
+        start = 0
+        range_header = self.headers.get("Range", "")
+        if_range = self.headers.get("If-Range", None)
+        if range_header.startswith("bytes=") and (if_range is None or if_range == resource.etag):
+            start = int(range_header[len("bytes="):].split("-")[0])
+        if start:
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %i-%i/%i" % (start, len(body) - 1, len(body)))
+        else:
+            self.send_response(200)
+        if resource.etag:
+            self.send_header("ETag", resource.etag)
+        self.send_header("Content-Type", resource.content_type)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+
+        if drop is not None and start < drop < len(body):
+            self.wfile.write(body[start:drop])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+        if resource.close_after:
+            self.close_connection = True
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, owner : "LocalServer"):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.owner = owner
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address) -> None:
+        # a client closing a connection before the response is read is
+        # part of the tests, not an error of the server
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class LocalServer:
+    def __init__(self):
+        self.resources : Dict[str, Resource] = {}
+        self.requests : List[Tuple[str, Dict[str,str]]] = []
+        self.connections = 0
+        self._server = _Server(self)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def add(self, path : str, body : bytes, **keyw) -> Resource:
+        resource = Resource(body, **keyw)
+        self.resources[path] = resource
+        return resource
+
+    def url(self, path : str) -> str:
+        return "http://127.0.0.1:%i%s" % (self._server.server_address[1], path)
+
+    def requested(self, path : str) -> List[Dict[str,str]]:
+        """
+        the headers of the requests of path, in order
+        """
+        return [ headers for request_path, headers in self.requests if request_path == path ]
+
+    def __enter__(self) -> "LocalServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,116 @@
+import  hashlib
+import  os
+import  tempfile
+import  unittest
+
+from ..network import retry
+from ..network.cache import DownloadCache
+from ..network.fetch import FetchError, RESUMABLE_ERRORS, stream_download
+from ..network.retry import RetryPolicy, configure_retry
+from .local_server import LocalServer
+
+BODY = bytes( range(256) ) * 64         # 16 KiB
+
+
+class PartialDownloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.server = LocalServer().__enter__()
+        self.filepath = os.path.join(self.directory.name, "model.glb")
+        self.part_filepath = self.filepath + ".part"
+        self.policy = retry.get_retry_policy()
+
+    def tearDown(self):
+        configure_retry(self.policy)
+        self.server.__exit__(None, None, None)
+        self.directory.cleanup()
+
+    def interrupted(self, url : str) -> None:
+        """
+        a download of url which fails with a dropped connection, without resumes
+        """
+        with self.assertRaises(RESUMABLE_ERRORS):
+            stream_download(url, self.filepath, max_resumes=0)
+
+    def test10(self):
+        "partial_download: a dropped connection is resumed within the download"
+        self.server.add("/model.glb", BODY, etag='"v1"', drops=[5000, 9000])
+        result = stream_download(self.server.url("/model.glb"), self.filepath)
+        assert result is not None
+        self.assertEqual( result.sha256, hashlib.sha256(BODY).hexdigest() )
+        requests = self.server.requested("/model.glb")
+        self.assertEqual( [r.get("Range") for r in requests], [None, "bytes=5000-", "bytes=9000-"] )
+        self.assertEqual( requests[1].get("If-Range"), '"v1"' )
+        self.assertFalse( os.path.exists(self.part_filepath) )
+
+    def test20(self):
+        "partial_download: the .part file is kept after a dropped connection, and resumed by a later call"
+        self.server.add("/model.glb", BODY, etag='"v1"', drops=[5000])
+        url = self.server.url("/model.glb")
+        self.interrupted(url)
+        self.assertEqual( os.path.getsize(self.part_filepath), 5000 )
+        self.assertTrue( os.path.exists(self.part_filepath + ".json") )
+
+        result = stream_download(url, self.filepath, headers={"If-None-Match" : '"v0"'})
+        assert result is not None
+        with open(self.filepath, "rb") as f:
+            self.assertEqual( f.read(), BODY )
+        self.assertEqual( result.sha256, hashlib.sha256(BODY).hexdigest() )
+        self.assertEqual( (result.size, result.etag, result.content_type), 
+                          (len(BODY), '"v1"', "model/gltf-binary") )
+        resumed = self.server.requested("/model.glb")[-1]
+        self.assertEqual( resumed.get("Range"), "bytes=5000-" )
+        # the conditional headers are not sent with a resume
+        self.assertNotIn( "If-None-Match", resumed )
+        self.assertFalse( os.path.exists(self.part_filepath) )
+        self.assertFalse( os.path.exists(self.part_filepath + ".json") )
+
+    def test30(self):
+        "partial_download: a kept .part file is replaced if the resource has changed"
+        resource = self.server.add("/model.glb", BODY, etag='"v1"', drops=[5000])
+        url = self.server.url("/model.glb")
+        self.interrupted(url)
+        resource.body, resource.etag = BODY[::-1], '"v2"'
+
+        result = stream_download(url, self.filepath)
+        assert result is not None
+        with open(self.filepath, "rb") as f:
+            self.assertEqual( f.read(), BODY[::-1] )
+        self.assertEqual( result.sha256, hashlib.sha256(BODY[::-1]).hexdigest() )
+        self.assertEqual( result.etag, '"v2"' )
+
+    def test40(self):
+        "partial_download: a kept .part file is deleted on an error that is not transient"
+        resource = self.server.add("/model.glb", BODY, etag='"v1"', drops=[5000])
+        url = self.server.url("/model.glb")
+        self.interrupted(url)
+        resource.status = 404
+        with self.assertRaises(FetchError):
+            stream_download(url, self.filepath)
+        self.assertFalse( os.path.exists(self.part_filepath) )
+        self.assertFalse( os.path.exists(self.part_filepath + ".json") )
+
+    def test50(self):
+        "partial_download: without a validator the .part file is not kept"
+        self.server.add("/model.glb", BODY, drops=[5000])
+        self.interrupted( self.server.url("/model.glb") )
+        self.assertFalse( os.path.exists(self.part_filepath) )
+
+    def test60(self):
+        "partial_download: a DownloadCache fetch resumes across retries"
+        configure_retry( RetryPolicy(max_attempts=2, base_delay=0.0, max_delay=0.0) )
+        # more drops than the resumes of one attempt
+        self.server.add("/model.glb", BODY, etag='"v1"', drops=[1000, 2000, 3000, 4000, 5000])
+        url = self.server.url("/model.glb")
+        cached = DownloadCache(self.directory.name, 1 << 20).fetch(url)
+        with open(cached.filepath, "rb") as f:
+            self.assertEqual( f.read(), BODY )
+        ranges = [ r.get("Range") for r in self.server.requested("/model.glb") ]
+        self.assertEqual( ranges, [None, "bytes=1000-", "bytes=2000-", "bytes=3000-",
+                                   "bytes=4000-", "bytes=5000-"] )
+        self.assertEqual( [ name for name in os.listdir(os.path.join(self.directory.name, "partial"))
+                                if not name.endswith(".lock") ], [] )
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( PartialDownloadTest )  )
@@ -0,0 +1,122 @@
+import  socket
+import  threading
+import  unittest
+
+from ..network.pool import ConnectionPool
+from .local_server import LocalServer
+
+
+class SilentServer:
+    """
+    accepts one connection, reads the request and never responds; records
+    whether the client closed the connection
+    """
+    def __init__(self):
+        self._socket = socket.socket()
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(1)
+        self.client_closed = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def url(self, path : str) -> str:
+        return "http://127.0.0.1:%i%s" % (self._socket.getsockname()[1], path)
+
+    def _serve(self) -> None:
+        connection, _ = self._socket.accept()
+        with connection:
+            connection.recv(65536)
+            connection.settimeout(10.0)
+            try:
+                if connection.recv(65536) == b"":
+                    self.client_closed.set()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalServer().__enter__()
+        self.pool = ConnectionPool(max_per_host=1, connect_timeout=5.0, read_timeout=5.0)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.__exit__(None, None, None)
+
+    def get(self, url : str) -> bytes:
+        with self.pool.request("GET", url) as response:
+            self.assertEqual( response.status, 200 )
+            return response.read()
+
+    def only_stats(self):
+        stats = self.pool.stats()
+        self.assertEqual( len(stats), 1 )
+        return list(stats.values())[0]
+
+    def test10(self):
+        "pool: a kept-alive connection is reused and counted"
+        self.server.add("/a.glb", b"a" * 1000)
+        url = self.server.url("/a.glb")
+        for _ in range(3):
+            self.assertEqual( self.get(url), b"a" * 1000 )
+        stats = self.only_stats()
+        self.assertEqual( (stats.requests, stats.connections_opened, stats.reuses), (3, 1, 2) )
+        self.assertEqual( self.server.connections, 1 )
+
+    def test20(self):
+        "pool: a connection closed by the server is reopened, and not counted as reused"
+        self.server.add("/a.glb", b"a" * 1000, close_after=True)
+        url = self.server.url("/a.glb")
+        for _ in range(3):
+            self.assertEqual( self.get(url), b"a" * 1000 )
+        stats = self.only_stats()
+        self.assertEqual( (stats.requests, stats.connections_opened, stats.reuses), (3, 3, 0) )
+        self.assertEqual( self.server.connections, 3 )
+        self.assertIn( "saved about 0.000 s", self.pool.stats_lines()[0] )
+
+    def test30(self):
+        "pool: a response closed before it is read closes its connection"
+        self.server.add("/a.glb", b"a" * 100000)
+        url = self.server.url("/a.glb")
+        with self.pool.request("GET", url) as response:
+            response.read(10)
+        self.assertEqual( self.get(url), b"a" * 100000 )
+        stats = self.only_stats()
+        self.assertEqual( (stats.connections_opened, stats.reuses), (2, 0) )
+
+    def test40(self):
+        "pool: the connection is closed, and the slot released, when a request fails"
+        silent = SilentServer()
+        try:
+            self.pool.configure_timeouts(5.0, 0.2)
+            with self.assertRaises(TimeoutError):
+                self.pool.request("GET", silent.url("/a.glb"))
+            self.assertTrue( silent.client_closed.wait(5.0) )
+            host = list(self.pool._hosts.values())[0]
+            self.assertEqual( (host.in_use, host.idle), (0, []) )
+            # with max_per_host 1, a request waits for the slot
+            self.assertTrue( host.slots.acquire(timeout=1.0) )
+            host.slots.release()
+        finally:
+            silent.close()
+
+    def test50(self):
+        "pool: a refused connection is not counted, and releases its slot"
+        self.server.add("/a.glb", b"a")
+        url = self.server.url("/a.glb")
+        self.server.__exit__(None, None, None)
+        with self.assertRaises(OSError):
+            self.pool.request("GET", url)
+        stats = self.only_stats()
+        self.assertEqual( (stats.requests, stats.connections_opened, stats.reuses), (1, 0, 0) )
+        host = list(self.pool._hosts.values())[0]
+        self.assertEqual( host.in_use, 0 )
+        # started again so that tearDown can stop it
+        self.server = LocalServer().__enter__()
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( ConnectionPoolTest )  )
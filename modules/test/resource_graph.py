@@ -0,0 +1,102 @@
+import  unittest
+
+import bpy
+
+from ..editing import collections
+from ..editing.collections import ( new_manifest,
+                                    new_scene,
+                                    new_annotation_page,
+                                    new_annotation,
+                                    move_collection_into_parent,
+                                    move_object_into_collection,
+                                    invalidate_resource_graph,
+                                    getManifests,
+                                    getScenes,
+                                    getAnnotationPages,
+                                    getAnnotations,
+                                    getBodyObject,
+                                    getTargetScene )
+
+
+class ResourceGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.manifest = new_manifest()
+        self.scene = new_scene()
+        self.page = new_annotation_page()
+        self.annotation = new_annotation()
+        move_collection_into_parent(self.scene, self.manifest)
+        move_collection_into_parent(self.page, self.scene)
+        move_collection_into_parent(self.annotation, self.page)
+        self.objects = []
+
+    def tearDown(self):
+        for obj in self.objects:
+            bpy.data.objects.remove(obj)
+        for collection in self.manifest.children_recursive:
+            bpy.data.collections.remove(collection)
+        bpy.data.collections.remove(self.manifest)
+        invalidate_resource_graph()
+
+    def new_model(self) -> bpy.types.Object:
+        obj = bpy.data.objects.new("resource_graph_test", None)
+        obj["iiif_type"] = "Model"
+        self.objects.append(obj)
+        return obj
+
+    def test10(self):
+        "resource_graph: lookups of the manifest, scene, page and annotation"
+        self.assertIn( self.manifest, getManifests() )
+        self.assertEqual( getScenes(self.manifest), [self.scene] )
+        self.assertEqual( getAnnotationPages(self.scene), [self.page] )
+        self.assertEqual( getAnnotations(self.page), [self.annotation] )
+        self.assertEqual( getTargetScene(self.annotation), self.scene )
+        self.assertIsNone( getBodyObject(self.annotation) )
+
+    def test20(self):
+        "resource_graph: the index is built once and reused"
+        getManifests()
+        graph = collections._resource_graph
+        self.assertIsNotNone( graph )
+        getScenes(self.manifest)
+        getTargetScene(self.annotation)
+        self.assertIs( collections._resource_graph, graph )
+
+    def test30(self):
+        "resource_graph: move_collection_into_parent invalidates the index"
+        self.assertEqual( getScenes(self.manifest), [self.scene] )
+        second_scene = new_scene()
+        move_collection_into_parent(second_scene, self.manifest)
+        self.assertEqual( getScenes(self.manifest), [self.scene, second_scene] )
+
+        second_page = new_annotation_page()
+        second_annotation = new_annotation()
+        move_collection_into_parent(second_page, second_scene)
+        self.assertEqual( getAnnotationPages(second_scene), [second_page] )
+        move_collection_into_parent(second_annotation, second_page)
+        self.assertEqual( getTargetScene(second_annotation), second_scene )
+
+    def test40(self):
+        "resource_graph: move_object_into_collection invalidates the index"
+        self.assertIsNone( getBodyObject(self.annotation) )
+        model = self.new_model()
+        move_object_into_collection(model, self.annotation)
+        self.assertEqual( getBodyObject(self.annotation), model )
+
+        second_annotation = new_annotation()
+        move_collection_into_parent(second_annotation, self.page)
+        self.assertIsNone( getBodyObject(second_annotation) )
+        move_object_into_collection(model, second_annotation)
+        self.assertEqual( getBodyObject(second_annotation), model )
+        self.assertIsNone( getBodyObject(self.annotation) )
+
+    def test50(self):
+        "resource_graph: a change made with the Blender API is seen after the handler runs"
+        second_scene = new_scene()
+        self.assertEqual( getScenes(self.manifest), [self.scene] )
+        self.manifest.children.link(second_scene)
+        invalidate_resource_graph()
+        self.assertEqual( getScenes(self.manifest), [self.scene, second_scene] )
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( ResourceGraphTest )  )
@@ -0,0 +1,173 @@
+import  http.client
+import  random
+import  ssl
+import  threading
+import  unittest
+
+from ..network.fetch import FetchError
+from ..network.retry import ( RetryPolicy,
+                              FailureRegistry,
+                              backoff_delay,
+                              hedged_call,
+                              is_transient,
+                              retry_call )
+
+
+class UpperBound(random.Random):
+    """
+    an rng whose uniform(a, b) is always b, the longest delay
+    """
+    def uniform(self, a : float, b : float) -> float:
+        return b
+
+
+class Flaky:
+    """
+    a function raising each of errors in turn, then returning "done"
+    """
+    def __init__(self, *errors : BaseException):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "done"
+
+
+class RetryTest(unittest.TestCase):
+
+    policy = RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=3.0)
+
+    def setUp(self):
+        self.delays = []
+
+    def retry(self, func, rng : random.Random = UpperBound()):
+        return retry_call(func, "test", self.policy, sleep=self.delays.append, rng=rng)
+
+    def test10(self):
+        "retry: is_transient"
+        for exc in ( FetchError("unavailable", 503), FetchError("throttled", 429),
+                     ConnectionResetError(), TimeoutError(), OSError("network unreachable"),
+                     http.client.IncompleteRead(b"", 10), http.client.RemoteDisconnected() ):
+            self.assertTrue( is_transient(exc), repr(exc) )
+        for exc in ( FetchError("not found", 404), FetchError("forbidden", 403),
+                     FetchError("truncated"), ssl.SSLCertVerificationError(),
+                     ValueError("unsupported url scheme") ):
+            self.assertFalse( is_transient(exc), repr(exc) )
+
+    def test20(self):
+        "retry: backoff_delay grows exponentially up to max_delay, with jitter"
+        self.assertEqual( [ backoff_delay(self.policy, attempt, rng=UpperBound()) for attempt in range(5) ],
+                          [0.5, 1.0, 2.0, 3.0, 3.0] )
+        rng = random.Random(7)
+        for attempt in range(5):
+            delay = backoff_delay(self.policy, attempt, rng=rng)
+            self.assertGreaterEqual( delay, 0.0 )
+            self.assertLessEqual( delay, min(3.0, 0.5 * 2 ** attempt) )
+
+    def test30(self):
+        "retry: backoff_delay honours a Retry-After up to max_delay"
+        self.assertEqual( backoff_delay(self.policy, 0, retry_after=2.5, rng=UpperBound()), 2.5 )
+        self.assertEqual( backoff_delay(self.policy, 0, retry_after=60.0, rng=UpperBound()), 3.0 )
+        self.assertEqual( backoff_delay(self.policy, 2, retry_after=0.1, rng=UpperBound()), 2.0 )
+
+    def test40(self):
+        "retry: retry_call retries transient errors"
+        func = Flaky( ConnectionResetError(), FetchError("unavailable", 503, retry_after=2.5) )
+        self.assertEqual( self.retry(func), "done" )
+        self.assertEqual( func.calls, 3 )
+        self.assertEqual( self.delays, [0.5, 2.5] )
+
+    def test50(self):
+        "retry: retry_call raises an error that is not transient, or the last error"
+        func = Flaky( FetchError("not found", 404) )
+        with self.assertRaises(FetchError):
+            self.retry(func)
+        self.assertEqual( (func.calls, self.delays), (1, []) )
+
+        errors = [ TimeoutError("attempt %i" % i) for i in range(4) ]
+        func = Flaky( *errors )
+        with self.assertRaises(TimeoutError) as raised:
+            self.retry(func)
+        self.assertIs( raised.exception, errors[-1] )
+        self.assertEqual( func.calls, 4 )
+        self.assertEqual( self.delays, [0.5, 1.0, 2.0] )
+
+
+class HedgedCallTest(unittest.TestCase):
+
+    def test10(self):
+        "retry: hedged_call without a hedge when the first call returns in time"
+        calls = []
+        def func(index : int, cancelled : threading.Event) -> int:
+            calls.append(index)
+            return index
+        self.assertEqual( hedged_call(func, 10.0, poll_interval=0.01), 0 )
+        self.assertEqual( calls, [0] )
+
+    def test20(self):
+        "retry: hedged_call returns the hedge, the slow call is cancelled and its result discarded"
+        discarded = []
+        slow_done = threading.Event()
+        def func(index : int, cancelled : threading.Event) -> str:
+            if index == 0:
+                cancelled.wait(10.0)
+                slow_done.set()
+                return "slow"
+            return "hedge"
+        def discard(value : str) -> None:
+            discarded.append(value)
+        self.assertEqual( hedged_call(func, 0.05, discard=discard, poll_interval=0.01), "hedge" )
+        self.assertTrue( slow_done.wait(10.0) )
+        for _ in range(100):
+            if discarded:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual( discarded, ["slow"] )
+
+    def test30(self):
+        "retry: hedged_call raises the last error when every call fails"
+        def func(index : int, cancelled : threading.Event) -> str:
+            if index == 0:
+                threading.Event().wait(0.1)
+            raise FetchError("failed %i" % index, 503)
+        with self.assertRaises(FetchError) as raised:
+            hedged_call(func, 0.02, poll_interval=0.01)
+        self.assertEqual( str(raised.exception), "failed 0" )
+
+
+class FailureRegistryTest(unittest.TestCase):
+
+    def test10(self):
+        "retry: FailureRegistry records failures until a success"
+        registry = FailureRegistry()
+        url = "https://example.org/iiif/model.glb"
+        self.assertFalse( registry.has_failed(url) )
+        registry.record_failure(url, FetchError("not found", 404))
+        registry.record_failure(url, TimeoutError())
+        self.assertTrue( registry.has_failed(url) )
+        record = registry.failures()[url]
+        self.assertEqual( record.failures, 2 )
+        self.assertEqual( record.last_error, "TimeoutError()" )
+        self.assertEqual( registry.summary_lines(), ["%s : failed 2 times, TimeoutError()" % url] )
+        registry.record_success(url)
+        self.assertFalse( registry.has_failed(url) )
+        self.assertEqual( registry.failures(), {} )
+
+    def test20(self):
+        "retry: FailureRegistry forget and reset"
+        registry = FailureRegistry()
+        for name in ("a", "b"):
+            registry.record_failure("https://example.org/%s.glb" % name, FetchError("x" * 300, 500))
+        self.assertEqual( len(registry.failures()["https://example.org/a.glb"].last_error), 200 )
+        registry.forget("https://example.org/a.glb")
+        self.assertEqual( list(registry.failures()), ["https://example.org/b.glb"] )
+        registry.reset()
+        self.assertEqual( registry.failures(), {} )
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( RetryTest )  )
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( HedgedCallTest )  )
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( FailureRegistryTest )  )
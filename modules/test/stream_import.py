@@ -0,0 +1,63 @@
+import  json
+import  os
+import  tempfile
+import  unittest
+
+import bpy
+
+from ..editing.json_cache import get_json_property
+
+# the manifest keys follow its items, so that the streaming import creates
+# the manifest collection before its type, id, and label are read
+LATE_KEYS_MANIFEST = {
+    "@context" : "http://iiif.io/api/presentation/4/context.json",
+    "items" : [
+        {
+            "id" : "https://example.org/iiif/late_keys/scene",
+            "type" : "Scene",
+            "items" : [
+                { "id" : "https://example.org/iiif/late_keys/page", "type" : "AnnotationPage", "items" : [] }
+            ]
+        }
+    ],
+    "type" : "Manifest",
+    "id" : "https://example.org/iiif/late_keys/manifest.json",
+    "label" : { "en" : ["Late Keys"] },
+}
+
+class StreamImportTest(unittest.TestCase):
+
+    def import_streaming(self, manifest : dict) -> bpy.types.Collection:
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "manifest.json")
+            with open(filepath, "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            before = set(bpy.data.collections)
+            bpy.ops.import_scene.iiif_manifest(filepath=filepath, use_streaming=True) # pyright: ignore[reportAttributeAccessIssue]
+        created = [ c for c in bpy.data.collections if c not in before and c.get("iiif_type") == "Manifest" ]
+        self.assertEqual( len(created), 1 )
+        return created[0]
+
+    def remove(self, collection : bpy.types.Collection) -> None:
+        for child in collection.children_recursive:
+            bpy.data.collections.remove(child)
+        bpy.data.collections.remove(collection)
+
+    def test10(self):
+        "stream_import: items before the type, id, and label of the manifest"
+        # with "@context" a key precedes the items, without it the items are first
+        for items_first in (True, False):
+            manifest = dict(LATE_KEYS_MANIFEST)
+            if items_first:
+                del manifest["@context"]
+            collection = self.import_streaming(manifest)
+            try:
+                self.assertEqual( collection["iiif_id"], manifest["id"] )
+                self.assertEqual( collection["iiif_type"], "Manifest" )
+                self.assertTrue( collection.name.startswith("Late Keys") )
+                self.assertEqual( get_json_property(collection)["label"], manifest["label"] )
+            finally:
+                self.remove(collection)
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( StreamImportTest )  )
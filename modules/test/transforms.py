@@ -4,7 +4,8 @@ import  unittest
 
 from mathutils import Vector
 
-from ..editing.transforms import Transform
+from ..editing.transforms import Transform, transformsToPlacements
+from ..editing.models import encode_blender_placement, decode_blender_transform
 
 
 def iiif_to_blender_axes( seq ):
@@ -43,5 +44,76 @@ class TransformTest(unittest.TestCase):
     
         self.assertAmostEqualCoordinates(exact_test_out, test_out)
         
+    def test20(self):
+        "placements: non-uniform scale after an axis-aligned rotation is one placement"
+        transforms = [ Transform.from_iiif_dict(data) for data in [
+            { "type" : "ScaleTransform", "x" : 3.0 },
+            { "type" : "RotateTransform", "y" : 90.0 },
+            { "type" : "TranslateTransform", "x" : 1.0, "z" : 2.0 },
+            { "type" : "ScaleTransform", "x" : 2.0, "y" : 0.5 }
+        ]]
+        placements = list( transformsToPlacements(transforms) )
+        self.assertEqual( len(placements), 1 )
+        
+        for coord in [ Vector((1.0, 0.0, 0.0)), Vector((0.5, -2.0, 4.0)) ]:
+            expected = coord.copy()
+            for t in transforms:
+                expected = t.applyToCoordinate(expected)
+            placed = coord.copy()
+            for t in placements[0].to_transform_list():
+                placed = t.applyToCoordinate(placed)
+            self.assertAmostEqualCoordinates(expected, placed)
+            
+    def test30(self):
+        "placements: non-uniform scale after an oblique rotation starts a second placement"
+        transforms = [ Transform.from_iiif_dict(data) for data in [
+            { "type" : "RotateTransform", "y" : 30.0 },
+            { "type" : "ScaleTransform", "x" : 2.0 }
+        ]]
+        self.assertEqual( len( list( transformsToPlacements(transforms) ) ), 2 )
+        
+    def test35(self):
+        "placements: uniform scale with a reflection after an oblique rotation is one placement"
+        transforms = [ Transform.from_iiif_dict(data) for data in [
+            { "type" : "RotateTransform", "y" : 30.0, "x" : 10.0 },
+            { "type" : "ScaleTransform", "x" : -2.0, "y" : 2.0, "z" : 2.0 }
+        ]]
+        placements = list( transformsToPlacements(transforms) )
+        self.assertEqual( len(placements), 1 )
+        
+        coord = Vector((0.5, -2.0, 4.0))
+        expected = coord.copy()
+        for t in transforms:
+            expected = t.applyToCoordinate(expected)
+        placed = coord.copy()
+        for t in placements[0].to_transform_list():
+            placed = t.applyToCoordinate(placed)
+        self.assertAmostEqualCoordinates(expected, placed)
+        
+    def test40(self):
+        "placements: memoized placements are returned as copies"
+        transforms = [ Transform.from_iiif_dict( { "type" : "TranslateTransform", "x" : 1.0 } ) ]
+        first = list( transformsToPlacements(transforms) )[0]
+        first.translation.data.x = 5.0
+        second = list( transformsToPlacements(transforms) )[0]
+        self.assertEqual( second.translation.data.x, 1.0 )
+        
+    def test50(self):
+        "initial transform: array encoding and legacy repr decode to the placement"
+        placement = list( transformsToPlacements( [ Transform.from_iiif_dict(data) for data in [
+            { "type" : "ScaleTransform", "x" : 2.0 },
+            { "type" : "RotateTransform", "x" : 90.0 },
+            { "type" : "TranslateTransform", "y" : 3.0 }
+        ]] ) )[0]
+        for encoding in [ encode_blender_placement(placement), repr(placement) ]:
+            decoded = decode_blender_transform(encoding)
+            for first, second in [
+                    (decoded.scaling.data,     placement.scaling.data),
+                    (decoded.rotation.data,    placement.rotation.data),
+                    (decoded.translation.data, placement.translation.data)]:
+                self.assertEqual( tuple(first), tuple(second) )
+                
+        self.assertTrue( decode_blender_transform("__import__('os').getcwd()").isIdentity() )
+        
 suite=unittest.TestSuite()
 suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( TransformTest )  )
\ No newline at end of file
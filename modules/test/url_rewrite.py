@@ -0,0 +1,50 @@
+import  os
+import  tempfile
+import  unittest
+
+from ..network.mirror import RewriteRule, UrlMapper
+from ..editing.fileops import path_to_uri
+
+
+class UrlRewriteTest(unittest.TestCase):
+
+    def test10(self):
+        "url_rewrite: prefix, glob, and regex rules"
+        mapper = UrlMapper([
+            RewriteRule("prefix", "https://iiif.example.org/assets/", "http://mirror.local/assets/"),
+            RewriteRule("glob", "https://*.example.org/models/*.glb", r"http://mirror.local/\1/\2.glb"),
+            RewriteRule("regex", r"^https://cdn[0-9]+\.example\.org/(.*)$", r"http://mirror.local/cdn/\1"),
+        ])
+        for url, expected in [
+            ("https://iiif.example.org/assets/a/b.glb", "http://mirror.local/assets/a/b.glb"),
+            ("https://www.example.org/models/chair.glb", "http://mirror.local/www/chair.glb"),
+            ("https://cdn12.example.org/x/y.gltf",       "http://mirror.local/cdn/x/y.gltf"),
+            ("https://other.org/models/chair.glb",       "https://other.org/models/chair.glb"),
+        ]:
+            self.assertEqual( mapper.resolve(url), expected )
+        self.assertEqual( [stats.hits for stats in mapper.stats().values()], [1, 1, 1] )
+
+    def test20(self):
+        "url_rewrite: a missing local file falls back to the next rule"
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "chair model.glb")
+            with open(filepath, "wb") as f:
+                f.write(b"glTF")
+            mapper = UrlMapper([
+                RewriteRule("prefix", "https://example.org/", directory + "/"),
+                RewriteRule("prefix", "https://example.org/", "http://mirror.local/"),
+            ])
+            self.assertEqual( mapper.resolve("https://example.org/chair%20model.glb"), path_to_uri(filepath) )
+            self.assertEqual( mapper.resolve("https://example.org/table.glb"), "http://mirror.local/table.glb" )
+            self.assertEqual( list(mapper.stats().values())[0].missing, 1 )
+
+    def test30(self):
+        "url_rewrite: a lookup with count False is not counted"
+        mapper = UrlMapper([
+            RewriteRule("prefix", "https://example.org/", "http://mirror.local/"),
+        ])
+        self.assertEqual( mapper.resolve("https://example.org/a.glb", count=False), "http://mirror.local/a.glb" )
+        self.assertEqual( list(mapper.stats().values())[0].hits, 0 )
+
+suite=unittest.TestSuite()
+suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( UrlRewriteTest )  )
@@ -0,0 +1,287 @@
+"""
+vectorized counterpart of editing.transforms.transformsToPlacements
+
+The placements of many annotations are computed at once: the transforms of
+each annotation (the RotateTransform, ScaleTransform, TranslateTransform
+resources of a SpecificResource body, followed by a PointSelector target) are
+packed into arrays with one row per annotation and one column per transform,
+and the columns are composed for all rows together with numpy.
+
+usage:
+    kinds, values = pack_transforms( [transforms_of_annotation for ...] )
+    placements = compose_placements( *blender_transforms(kinds, values) )
+    for row in range(len(placements)):
+        if placements.split[row]:
+            ... use the scalar path for this annotation
+        else:
+            placements.scaling[row], placements.rotation[row], placements.translation[row]
+
+The arithmetic is that of the scalar path: the values are float32, as stored
+in mathutils Vector and Quaternion, and the quaternion products, rotations of
+vectors, inversions and Euler conversions are evaluated with the operations of
+the mathutils C code in the same order. The results therefore match those of
+transformsToPlacements up to differences in the trigonometric functions of
+the math libraries.
+
+Where a non-uniform scale follows a rotation the scalar path either combines
+them by a polar decomposition or starts a second Placement; this module does
+neither, such rows are flagged in Placements.split and their values are nan.
+
+No bpy or mathutils import, so this module can be tested and benchmarked
+outside Blender; it requires numpy, which is bundled with Blender.
+"""
+
+import math
+from typing import Any, Mapping, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+import logging
+logger = logging.getLogger("iiif.batch_transforms")
+
+
+ROTATE_TRANSFORM    = "RotateTransform"
+SCALE_TRANSFORM     = "ScaleTransform"
+TRANSLATE_TRANSFORM = "TranslateTransform"
+POINT_SELECTOR      = "PointSelector"
+
+# values of the kinds array, NONE pads the rows with fewer transforms
+NONE      = 0
+TRANSLATE = 1
+ROTATE    = 2
+SCALE     = 3
+
+# kind, and the value of an omitted axis
+_KINDS = {
+    TRANSLATE_TRANSFORM : (TRANSLATE, 0.0),
+    POINT_SELECTOR      : (TRANSLATE, 0.0),
+    ROTATE_TRANSFORM    : (ROTATE,    0.0),
+    SCALE_TRANSFORM     : (SCALE,     1.0),
+}
+
+XYZ = ("x", "y", "z")
+
+F32 = np.float32
+
+# Developer Note: Scaling.rotationComponent constructs Quaternion(axis, pi);
+# mathutils wraps the angle into [-pi, pi) in float, so the angle used is
+# -pi and the quaternion is (cos(-pi/2), -sin(-pi/2) * axis)
+_HALF_PI_WRAPPED = float( F32(-math.pi) * F32(0.5) )
+_COMPONENT_W = F32( math.cos(_HALF_PI_WRAPPED) )
+_COMPONENT_S = F32( math.sin(_HALF_PI_WRAPPED) )
+
+
+class Placements(NamedTuple):
+    """
+    one row per annotation; rotation quaternions are (w, x, y, z).
+    The values are in Blender axes.
+    """
+    scaling     : np.ndarray    # (n, 3) float32
+    rotation    : np.ndarray    # (n, 4) float32
+    translation : np.ndarray    # (n, 3) float32
+    split       : np.ndarray    # (n,) bool, rows to be computed by the scalar path
+
+    def __len__(self) -> int:
+        return len(self.split)
+
+
+def pack_transforms( records : Sequence[Sequence[Mapping[str,Any]]] ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    records holds, for each annotation, the sequence of IIIF transform
+    dictionaries in the order applied. Returns the kinds (n, m) uint8 and the
+    IIIF axis values (n, m, 3) float64, where m is the largest number of
+    transforms of an annotation; omitted axes have the identity value.
+    raises ValueError for an unsupported transform type
+    """
+    n = len(records)
+    m = max( (len(transforms) for transforms in records), default=0)
+    kinds = np.zeros((n, m), dtype=np.uint8)
+    values = np.zeros((n, m, 3), dtype=np.float64)
+    for row, transforms in enumerate(records):
+        for col, iiif_data in enumerate(transforms):
+            ttype = iiif_data.get("type", "")
+            try:
+                kind, default = _KINDS[ttype]
+            except KeyError:
+                raise ValueError("unsupported iiif transform type: %s" % ttype)
+            kinds[row, col] = kind
+            values[row, col] = [ float(iiif_data.get(axis, default)) for axis in XYZ ]
+    return kinds, values
+
+
+def blender_transforms( kinds : np.ndarray, values : np.ndarray ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    converts the IIIF axis values to Blender axes, as the from_iiif_dict
+    functions of editing.transforms. Returns kinds, vectors (n, m, 3) float32
+    for translations and scales, and quaternions (n, m, 4) float32 for rotations
+    """
+    x, y, z = values[..., 0], values[..., 1], values[..., 2]
+    # Blender <- IIIF axes mapping: X <- X ; Y <- -Z ; Z <- Y
+    # scales have no change of sign
+    vectors = np.where( (kinds == SCALE)[..., None],
+                        np.stack([x,  z, y], axis=-1),
+                        np.stack([x, -z, y], axis=-1) ).astype(F32)
+    vectors[kinds == ROTATE] = 0.0
+
+    quaternions = np.zeros(kinds.shape + (4,), dtype=F32)
+    quaternions[..., 0] = 1.0
+    is_rotation = kinds == ROTATE
+    if is_rotation.any():
+        euler = np.radians( np.stack([x, -z, y], axis=-1)[is_rotation] ).astype(F32)
+        quaternions[is_rotation] = euler_yzx_to_quaternion(euler)
+    return kinds, vectors, quaternions
+
+
+def euler_yzx_to_quaternion( euler : np.ndarray ) -> np.ndarray:
+    """
+    euler (k, 3) float32 angles in radians; the quaternions (k, 4) of
+    Euler(euler, "YZX").to_quaternion(), evaluated as eulO_to_quat of Blender
+    """
+    # axes i, j, k of the YZX order, parity 0
+    ti = (euler[:, 1] * F32(0.5)).astype(np.float64)
+    tj = (euler[:, 2] * F32(0.5)).astype(np.float64)
+    th = (euler[:, 0] * F32(0.5)).astype(np.float64)
+    ci, cj, ch = np.cos(ti), np.cos(tj), np.cos(th)
+    si, sj, sh = np.sin(ti), np.sin(tj), np.sin(th)
+    cc = ci * ch
+    cs = ci * sh
+    sc = si * ch
+    ss = si * sh
+    quat = np.empty((len(euler), 4), dtype=np.float64)
+    quat[:, 0] = cj * cc + sj * ss
+    quat[:, 2] = cj * sc - sj * cs
+    quat[:, 3] = cj * ss + sj * cc
+    quat[:, 1] = cj * cs - sj * sc
+    return quat.astype(F32)
+
+
+# quaternion operations on (k, 4) float32 arrays, as the functions
+# mul_qt_qtqt, mul_qt_v3, invert_qt, normalize_qt of Blender
+
+def quaternion_multiply( a : np.ndarray, b : np.ndarray ) -> np.ndarray:
+    a0, a1, a2, a3 = a[:, 0], a[:, 1], a[:, 2], a[:, 3]
+    b0, b1, b2, b3 = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+    q = np.empty(np.broadcast_shapes(a.shape, b.shape), dtype=F32)
+    q[:, 0] = a0 * b0 - a1 * b1 - a2 * b2 - a3 * b3
+    q[:, 1] = a0 * b1 + a1 * b0 + a2 * b3 - a3 * b2
+    q[:, 2] = a0 * b2 + a2 * b0 + a3 * b1 - a1 * b3
+    q[:, 3] = a0 * b3 + a3 * b0 + a1 * b2 - a2 * b1
+    return q
+
+def quaternion_rotate( q : np.ndarray, v : np.ndarray ) -> np.ndarray:
+    q0, q1, q2, q3 = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    r0, r1, r2 = v[:, 0], v[:, 1], v[:, 2]
+    t0 = -q1 * r0 - q2 * r1 - q3 * r2
+    t1 = q0 * r0 + q2 * r2 - q3 * r1
+    t2 = q0 * r1 + q3 * r0 - q1 * r2
+    r2 = q0 * r2 + q1 * r1 - q2 * r0
+    r0 = t1
+    r1 = t2
+    out = np.empty(v.shape, dtype=F32)
+    out[:, 0] = t0 * -q1 + r0 * q0 - r1 * q3 + r2 * q2
+    out[:, 1] = t0 * -q2 + r1 * q0 - r2 * q1 + r0 * q3
+    out[:, 2] = t0 * -q3 + r2 * q0 - r0 * q2 + r1 * q1
+    return out
+
+def quaternion_invert( q : np.ndarray ) -> np.ndarray:
+    f = q[:, 0] * q[:, 0] + q[:, 1] * q[:, 1] + q[:, 2] * q[:, 2] + q[:, 3] * q[:, 3]
+    nonzero = f != 0.0
+    inverse = q.copy()
+    scale = F32(1.0) / np.where(nonzero, f, F32(1.0))
+    inverse[nonzero, 0] = q[nonzero, 0] * scale[nonzero]
+    inverse[nonzero, 1:] = -q[nonzero, 1:] * scale[nonzero, None]
+    return inverse
+
+def is_identity_rotation( q : np.ndarray ) -> np.ndarray:
+    """
+    Rotation.isIdentity: the angle of the normalized quaternion is exactly 0.0
+    """
+    length = np.sqrt( q[:, 0] * q[:, 0] + q[:, 1] * q[:, 1] + q[:, 2] * q[:, 2] + q[:, 3] * q[:, 3] )
+    nonzero = length != 0.0
+    w = q[:, 0] * ( F32(1.0) / np.where(nonzero, length, F32(1.0)) )
+    return nonzero & (w >= 1.0)
+
+def is_uniform( s : np.ndarray ) -> np.ndarray:
+    a = np.abs(s)
+    return (a[:, 1] == a[:, 0]) & (a[:, 2] == a[:, 0])
+
+def rotation_components( s : np.ndarray ) -> np.ndarray:
+    """
+    Scaling.rotationComponent: the rotation by pi which, combined with
+    the reflections of the negative scale factors, leaves a positive
+    scaling or a reflection through the origin
+    """
+    negative = s < 0
+    n_positive = 3 - negative.sum(axis=1)
+    # the rotation axis is the positive axis if there is only one, else the negative axis
+    axis = np.where( (n_positive == 1)[:, None], ~negative, negative)
+    axis_index = np.argmax(axis, axis=1)
+    quat = np.zeros((len(s), 4), dtype=F32)
+    quat[:, 0] = 1.0
+    rotated = (n_positive == 1) | (n_positive == 2)
+    rows = np.nonzero(rotated)[0]
+    quat[rows, 0] = _COMPONENT_W
+    quat[rows, 1 + axis_index[rows]] = _COMPONENT_S
+    return quat
+
+
+def compose_placements( kinds : np.ndarray, vectors : np.ndarray, quaternions : np.ndarray ) -> Placements:
+    """
+    combines the transforms of each row into a single Placement, as
+    transformsToPlacements; identity transforms are skipped, and a row
+    whose placement is the identity gets the identity values of Placement()
+    """
+    n, m = kinds.shape
+    scaling = np.ones((n, 3), dtype=F32)
+    rotation = np.zeros((n, 4), dtype=F32)
+    rotation[:, 0] = 1.0
+    translation = np.zeros((n, 3), dtype=F32)
+    split = np.zeros(n, dtype=bool)
+
+    for col in range(m):
+        kind = kinds[:, col]
+        vec = vectors[:, col]
+
+        rows = np.nonzero( ~split & (kind == TRANSLATE) & np.any(vec != 0.0, axis=1) )[0]
+        if len(rows):
+            translation[rows] = translation[rows] + vec[rows]
+
+        quat = quaternions[:, col]
+        rows = np.nonzero( ~split & (kind == ROTATE) )[0]
+        rows = rows[ ~is_identity_rotation(quat[rows]) ]
+        if len(rows):
+            q = quat[rows]
+            translation[rows] = quaternion_rotate(q, translation[rows])
+            rotation[rows] = quaternion_multiply(q, rotation[rows])
+
+        rows = np.nonzero( ~split & (kind == SCALE) & np.any(vec != 1.0, axis=1) )[0]
+        if len(rows):
+            s = vec[rows]
+            commutes = is_uniform(s) | is_identity_rotation(rotation[rows])
+            split[ rows[~commutes] ] = True
+            rows, s = rows[commutes], s[commutes]
+            translation[rows] = s * translation[rows]
+            component = rotation_components(s)
+            rotation[rows] = quaternion_multiply(
+                                quaternion_multiply(component, rotation[rows]),
+                                quaternion_invert(component) )
+            scaling[rows] = scaling[rows] * s
+
+    identity = np.all(scaling == 1.0, axis=1) & \
+               is_identity_rotation(rotation) & \
+               np.all(translation == 0.0, axis=1)
+    scaling[identity] = 1.0
+    rotation[identity] = (1.0, 0.0, 0.0, 0.0)
+    translation[identity] = 0.0
+
+    scaling[split] = np.nan
+    rotation[split] = np.nan
+    translation[split] = np.nan
+    return Placements(scaling, rotation, translation, split)
+
+
+def placements_from_iiif( records : Sequence[Sequence[Mapping[str,Any]]] ) -> Placements:
+    """
+    the placements of the annotations whose IIIF transforms are records
+    """
+    return compose_placements( *blender_transforms( *pack_transforms(records) ) )
@@ -0,0 +1,146 @@
+"""
+Bounding box of a glTF model determined from the glTF json alone.
+
+The glTF 2.0 specification requires that the accessor for the POSITION
+attribute of a mesh primitive declares min and max values. Combined with
+the node transforms of the default scene this gives the bounding box of
+the model without reading the binary buffers; for a .glb file only the
+header and the JSON chunk, generally a few kB at the start of the file,
+are needed.
+
+Coordinates are in the glTF (and IIIF) axes, Y is up. No bpy or mathutils
+import so these functions can be run on worker threads.
+"""
+
+import json
+import struct
+from typing import Callable, List, Optional, Tuple
+
+import logging
+logger = logging.getLogger("iiif.gltf_bounds")
+
+Bounds = Tuple[Tuple[float,float,float], Tuple[float,float,float]]
+Matrix4 = List[float]   # 16 floats, column-major as in glTF
+
+GLB_MAGIC = b"glTF"
+GLB_HEADER_SIZE = 20    # 12 byte file header + 8 byte chunk header
+GLB_JSON_CHUNK = 0x4E4F534A
+
+_IDENTITY : Matrix4 = [ 1.0,0.0,0.0,0.0,
+                        0.0,1.0,0.0,0.0,
+                        0.0,0.0,1.0,0.0,
+                        0.0,0.0,0.0,1.0 ]
+
+
+def gltf_json_from_reader( read_prefix : Callable[[int], bytes] ) -> dict:
+    """
+    read_prefix(n) returns (at least) the first n bytes of the resource,
+    or the whole resource if it is shorter
+
+    returns the decoded glTF json, for either a .glb or a .gltf resource
+    """
+    head = read_prefix(GLB_HEADER_SIZE)
+    if head[:4] != GLB_MAGIC:
+        # not binary glTF, the resource should be the json
+        if head.lstrip()[:1] != b"{":
+            raise ValueError("resource is neither glb nor glTF json")
+        return json.loads( read_prefix(-1) )
+
+    chunk_length, chunk_type = struct.unpack_from("<II", head, 12)
+    if chunk_type != GLB_JSON_CHUNK:
+        raise ValueError("first chunk of glb is not JSON")
+    data = read_prefix(GLB_HEADER_SIZE + chunk_length)
+    return json.loads( data[GLB_HEADER_SIZE: GLB_HEADER_SIZE + chunk_length])
+
+
+def gltf_bounds( gltf : dict ) -> Optional[Bounds]:
+    """
+    returns (min, max) corners of the box enclosing the meshes of
+    the default scene, or None if it cannot be determined
+    """
+    nodes = gltf.get("nodes", [])
+    scenes = gltf.get("scenes", [])
+    if scenes:
+        roots = scenes[ gltf.get("scene", 0) ].get("nodes", [])
+    else:
+        roots = range(len(nodes))
+
+    lo = [float("inf")] * 3
+    hi = [float("-inf")] * 3
+
+    stack = [ (index, _IDENTITY) for index in roots ]
+    visited = 0
+    while stack:
+        index, parent_matrix = stack.pop()
+        visited += 1
+        if visited > 100000:
+            raise ValueError("node hierarchy too large or cyclic")
+        node = nodes[index]
+        matrix = _multiply(parent_matrix, _node_matrix(node))
+        if "mesh" in node:
+            mesh_bounds = _mesh_bounds(gltf, gltf["meshes"][node["mesh"]])
+            if mesh_bounds is not None:
+                for corner in _corners(mesh_bounds):
+                    p = _transform_point(matrix, corner)
+                    for i in range(3):
+                        lo[i] = min(lo[i], p[i])
+                        hi[i] = max(hi[i], p[i])
+        for child in node.get("children", []):
+            stack.append( (child, matrix) )
+
+    if lo[0] > hi[0]:
+        return None
+    return ( (lo[0], lo[1], lo[2]), (hi[0], hi[1], hi[2]) )
+
+
+def _mesh_bounds( gltf : dict, mesh : dict ) -> Optional[Bounds]:
+    accessors = gltf.get("accessors", [])
+    lo = [float("inf")] * 3
+    hi = [float("-inf")] * 3
+    for primitive in mesh.get("primitives", []):
+        position = primitive.get("attributes", {}).get("POSITION")
+        if position is None:
+            continue
+        accessor = accessors[position]
+        if "min" not in accessor or "max" not in accessor:
+            continue
+        for i in range(3):
+            lo[i] = min(lo[i], float(accessor["min"][i]))
+            hi[i] = max(hi[i], float(accessor["max"][i]))
+    if lo[0] > hi[0]:
+        return None
+    return ( (lo[0], lo[1], lo[2]), (hi[0], hi[1], hi[2]) )
+
+def _corners( bounds : Bounds ):
+    lo, hi = bounds
+    for x in (lo[0], hi[0]):
+        for y in (lo[1], hi[1]):
+            for z in (lo[2], hi[2]):
+                yield (x, y, z)
+
+def _node_matrix( node : dict ) -> Matrix4:
+    if "matrix" in node:
+        return [float(v) for v in node["matrix"]]
+    tx, ty, tz = node.get("translation", (0.0, 0.0, 0.0))
+    qx, qy, qz, qw = node.get("rotation", (0.0, 0.0, 0.0, 1.0))
+    sx, sy, sz = node.get("scale", (1.0, 1.0, 1.0))
+    # column-major T * R * S
+    return [
+        (1 - 2*(qy*qy + qz*qz)) * sx,   (2*(qx*qy + qz*qw)) * sx,       (2*(qx*qz - qy*qw)) * sx,       0.0,
+        (2*(qx*qy - qz*qw)) * sy,       (1 - 2*(qx*qx + qz*qz)) * sy,   (2*(qy*qz + qx*qw)) * sy,       0.0,
+        (2*(qx*qz + qy*qw)) * sz,       (2*(qy*qz - qx*qw)) * sz,       (1 - 2*(qx*qx + qy*qy)) * sz,   0.0,
+        tx,                             ty,                             tz,                             1.0,
+    ]
+
+def _multiply( a : Matrix4, b : Matrix4 ) -> Matrix4:
+    return [
+        sum( a[k*4 + row] * b[col*4 + k] for k in range(4) )
+        for col in range(4) for row in range(4)
+    ]
+
+def _transform_point( m : Matrix4, p ) -> Tuple[float,float,float]:
+    return (
+        m[0]*p[0] + m[4]*p[1] + m[8]*p[2]  + m[12],
+        m[1]*p[0] + m[5]*p[1] + m[9]*p[2]  + m[13],
+        m[2]*p[0] + m[6]*p[1] + m[10]*p[2] + m[14],
+    )
@@ -0,0 +1,182 @@
+"""
+differences between two json documents, as
+
+    RFC 6902 JSON Patch : a list of add, remove, replace operations
+                          https://www.rfc-editor.org/rfc/rfc6902
+    RFC 7386 JSON Merge Patch : a partial document merged into the original
+                          https://www.rfc-editor.org/rfc/rfc7386
+
+make_json_patch and make_merge_patch compute the patch from the source to the
+target document; apply_json_patch and apply_merge_patch return a new document
+with a patch applied, they are used to check the patches.
+
+The json patch does not use the move and copy operations. Arrays are compared
+after removing the common leading and trailing elements, so that an insertion or
+removal of a run of elements in an array of annotations gives a short patch.
+
+A merge patch cannot set a value to null, as null denotes removal of the key,
+and replaces arrays as a whole.
+"""
+
+from typing import Any, Dict, List
+
+import logging
+logger = logging.getLogger("iiif.json_patch")
+
+Operation = Dict[str, Any]
+
+
+def _escape( token : str ) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+def _unescape( token : str ) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+def _same( a : Any, b : Any ) -> bool:
+    """
+    json equality; differs from == in that true and false are not
+    equal to 1 and 0
+    """
+    if isinstance(a, dict):
+        return isinstance(b, dict) and len(a) == len(b) and \
+            all( key in b and _same(value, b[key]) for key, value in a.items() )
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and \
+            all( _same(x, y) for x, y in zip(a, b) )
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    return a == b
+
+
+def make_json_patch( source : Any, target : Any ) -> List[Operation]:
+    """
+    returns the list of RFC 6902 operations transforming source into target
+    """
+    operations : List[Operation] = []
+    _diff(source, target, "", operations)
+    return operations
+
+def _diff( source : Any, target : Any, path : str, operations : List[Operation]) -> None:
+    if isinstance(source, dict) and isinstance(target, dict):
+        for key in source:
+            if key not in target:
+                operations.append({"op" : "remove", "path" : path + "/" + _escape(key)})
+        for key, value in target.items():
+            child_path = path + "/" + _escape(key)
+            if key in source:
+                _diff(source[key], value, child_path, operations)
+            else:
+                operations.append({"op" : "add", "path" : child_path, "value" : value})
+    elif isinstance(source, list) and isinstance(target, list):
+        _diff_list(source, target, path, operations)
+    elif not _same(source, target):
+        operations.append({"op" : "replace", "path" : path, "value" : target})
+
+def _diff_list( source : list, target : list, path : str, operations : List[Operation]) -> None:
+    n_source, n_target = len(source), len(target)
+    start = 0
+    while start < min(n_source, n_target) and _same(source[start], target[start]):
+        start += 1
+    end = 0
+    while end < min(n_source, n_target) - start and \
+            _same(source[n_source - 1 - end], target[n_target - 1 - end]):
+        end += 1
+
+    source_middle = n_source - start - end
+    target_middle = n_target - start - end
+    for k in range(min(source_middle, target_middle)):
+        _diff(source[start + k], target[start + k], "%s/%i" % (path, start + k), operations)
+    if target_middle > source_middle:
+        for k in range(source_middle, target_middle):
+            operations.append({"op" : "add", "path" : "%s/%i" % (path, start + k), "value" : target[start + k]})
+    else:
+        # each removal shifts the following elements down
+        for k in range(target_middle, source_middle):
+            operations.append({"op" : "remove", "path" : "%s/%i" % (path, start + target_middle)})
+
+
+def apply_json_patch( document : Any, operations : List[Operation] ) -> Any:
+    """
+    returns a copy of document with the add, remove, and replace operations
+    applied; the values in operations are not copied
+    """
+    result = _copy_containers(document)
+    for operation in operations:
+        op = operation["op"]
+        path = operation["path"]
+        if path == "":
+            if op in ("add", "replace"):
+                result = _copy_containers(operation["value"])
+                continue
+            raise ValueError("cannot remove the document root")
+        tokens = [_unescape(token) for token in path.split("/")[1:]]
+        parent = result
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = len(parent) if last == "-" else int(last)
+            if op == "add":
+                parent.insert(index, _copy_containers(operation["value"]))
+            elif op == "remove":
+                del parent[index]
+            elif op == "replace":
+                parent[index] = _copy_containers(operation["value"])
+            else:
+                raise ValueError("unsupported operation %s" % op)
+        else:
+            if op in ("add", "replace"):
+                if op == "replace" and last not in parent:
+                    raise KeyError(path)
+                parent[last] = _copy_containers(operation["value"])
+            elif op == "remove":
+                del parent[last]
+            else:
+                raise ValueError("unsupported operation %s" % op)
+    return result
+
+def _copy_containers( value : Any ) -> Any:
+    if isinstance(value, dict):
+        return { key : _copy_containers(v) for key, v in value.items() }
+    if isinstance(value, list):
+        return [ _copy_containers(v) for v in value ]
+    return value
+
+
+def make_merge_patch( source : Any, target : Any ) -> Any:
+    """
+    returns the RFC 7386 merge patch transforming source into target
+    """
+    if not (isinstance(source, dict) and isinstance(target, dict)):
+        return target
+    patch : Dict[str, Any] = {}
+    for key in source:
+        if key not in target:
+            patch[key] = None
+    for key, value in target.items():
+        if key not in source:
+            patch[key] = value
+        elif isinstance(source[key], dict) and isinstance(value, dict):
+            child_patch = make_merge_patch(source[key], value)
+            if child_patch:
+                patch[key] = child_patch
+        elif not _same(source[key], value):
+            if value is None:
+                logger.warning("merge patch cannot set %s to null, the key is removed" % key)
+            patch[key] = value
+    return patch
+
+def apply_merge_patch( document : Any, patch : Any ) -> Any:
+    """
+    returns a copy of document with patch merged, as the MergePatch
+    function of RFC 7386
+    """
+    if not isinstance(patch, dict):
+        return _copy_containers(patch)
+    result = _copy_containers(document) if isinstance(document, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key, None), value)
+    return result
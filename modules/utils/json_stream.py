@@ -0,0 +1,161 @@
+"""
+incremental reader for large json documents
+
+The standard json module only decodes a complete document. The
+JSONStreamReader class allows a client to walk the outer levels of a
+document -- the keys of an object, the elements of an array -- while
+reading the file a chunk at a time, and to decode complete values
+(for example one AnnotationPage) with the standard json decoder.
+
+Peak memory is then bounded by the largest value decoded with read_value
+rather than by the size of the document.
+
+Example:
+    reader = JSONStreamReader(fp)
+    for key in reader.iter_object():
+        if key == "items":
+            for _ in reader.iter_array():
+                item = reader.read_value()
+        else:
+            value = reader.read_value()
+
+For each key yielded by iter_object, and for each element yielded by
+iter_array, the client must consume exactly one value, with read_value
+or with a nested iter_object / iter_array, before advancing the iteration.
+"""
+
+import json
+from typing import IO, Any, Iterator
+
+import logging
+logger = logging.getLogger("iiif.json_stream")
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789+-.eE"
+
+class JSONStreamError(ValueError):
+    pass
+
+
+class JSONStreamReader:
+
+    def __init__(self, fp : IO[str], chunk_size : int = 1 << 16):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buf : str = ""
+        self._pos : int = 0
+        self._eof : bool = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, min_chars : int) -> bool:
+        """
+        read at least min_chars more characters into the buffer, unless
+        the end of file is reached; returns False if nothing could be read
+        """
+        if self._eof:
+            return False
+        # discard the consumed part of the buffer
+        if self._pos > 0:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        chunks = []
+        count = 0
+        while count < min_chars:
+            chunk = self._fp.read(max(self._chunk_size, min_chars - count))
+            if not chunk:
+                self._eof = True
+                break
+            chunks.append(chunk)
+            count += len(chunk)
+        if chunks:
+            self._buf += "".join(chunks)
+        return count > 0
+
+    def _peek(self) -> str:
+        """
+        skips whitespace and returns the next character without consuming it,
+        returns "" at end of file
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(self._chunk_size):
+                return ""
+
+    def _expect(self, chars : str) -> str:
+        c = self._peek()
+        if c == "" or c not in chars:
+            raise JSONStreamError("expected one of %r, found %r" % (chars, c))
+        self._pos += 1
+        return c
+
+    def read_value(self) -> Any:
+        """
+        decodes and returns the next complete json value
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as exc:
+                # assume the value is incomplete in the buffer; double the
+                # amount of buffered text so the total decoding work
+                # stays linear in the size of the value
+                if self._fill( max(self._chunk_size, len(self._buf) - self._pos)):
+                    continue
+                raise JSONStreamError(str(exc)) from exc
+            # a number at the end of the buffer may be continued in the
+            # unread part of the file, as in "2" + ".5e10"
+            if  isinstance(value, (int, float)) and not self._eof and \
+                all( c in _NUMBER_CHARS for c in self._buf[end:] ):
+                self._fill(self._chunk_size)
+                continue
+            self._pos = end
+            return value
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        yields the keys of the next json object
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            if self._peek() != '"':
+                raise JSONStreamError("expected object key")
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def iter_array(self) -> Iterator[int]:
+        """
+        yields the index of each element of the next json array
+        """
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self._expect(",]") == "]":
+                return
+
+    def peek_type(self) -> str:
+        """
+        returns "object", "array", or "value" for the type of the next value
+        """
+        c = self._peek()
+        if c == "{":
+            return "object"
+        if c == "[":
+            return "array"
+        if c == "":
+            raise JSONStreamError("unexpected end of document")
+        return "value"
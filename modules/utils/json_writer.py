@@ -0,0 +1,119 @@
+"""
+incremental writer for large json documents
+
+The counterpart of json_stream.JSONStreamReader: a document is written to
+a file as it is produced, rather than being built completely in memory and
+then passed to json.dump.
+
+The client builds the document from ordinary python values, except that
+the value of a key may be a StreamedArray wrapping an iterable (typically
+a generator). The elements of a StreamedArray are only requested
+when the writer reaches them and are written before the next element is
+requested; so the memory in use is bounded by the largest element. An
+element may itself be a dict containing StreamedArray values.
+
+The output is identical to that of json.dump(document, fp, indent=indent,
+separators=separators) for the document in which every StreamedArray is
+replaced by the list of its elements.
+
+Example:
+    def pages():
+        for page_collection in page_collections:
+            yield page_data(page_collection)
+
+    scene = {"id" : scene_id, "type" : "Scene", "items" : StreamedArray(pages())}
+    JSONStreamWriter(fp, indent=2).write(scene)
+"""
+
+import json
+from typing import IO, Any, Iterable, Iterator, Optional, Tuple
+
+import logging
+logger = logging.getLogger("iiif.json_writer")
+
+
+class StreamedArray:
+    """
+    a json array whose elements are produced when it is written
+    """
+    __slots__ = ("elements",)
+
+    def __init__(self, elements : Iterable[Any]):
+        self.elements = elements
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.elements)
+
+
+def _is_streamed( value : Any ) -> bool:
+    if isinstance(value, StreamedArray):
+        return True
+    if isinstance(value, dict):
+        return any( _is_streamed(v) for v in value.values() )
+    return False
+
+
+class JSONStreamWriter:
+
+    def __init__(   self, fp : IO[str],
+                    indent : Optional[int] = None,
+                    separators : Optional[Tuple[str,str]] = None):
+        self._fp = fp
+        self._indent = indent
+        # same defaults as json.dump
+        self._encoder = json.JSONEncoder(indent=indent, separators=separators)
+        self._item_separator = self._encoder.item_separator
+        self._key_separator  = self._encoder.key_separator
+
+    def _newline_indent(self, level : int) -> str:
+        if self._indent is None:
+            return ""
+        return "\n" + " " * (self._indent * level)
+
+    def write(self, value : Any, level : int = 0) -> None:
+        """
+        writes value as the json text of a value at nesting depth level
+        """
+        if isinstance(value, StreamedArray):
+            self._write_array(value, level)
+        elif isinstance(value, dict) and _is_streamed(value):
+            self._write_object(value, level)
+        else:
+            self._write_encoded(value, level)
+
+    def _write_encoded(self, value : Any, level : int) -> None:
+        text = "".join( self._encoder.iterencode(value) )
+        # json strings cannot contain a raw newline, so every newline in text
+        # is a line break added by the encoder
+        if self._indent is not None and level > 0:
+            text = text.replace("\n", self._newline_indent(level))
+        self._fp.write(text)
+
+    def _write_array(self, array : StreamedArray, level : int) -> None:
+        inner = self._newline_indent(level + 1)
+        first = True
+        for element in array:
+            if first:
+                self._fp.write("[" + inner)
+                first = False
+            else:
+                self._fp.write(self._item_separator + inner)
+            self.write(element, level + 1)
+        if first:
+            self._fp.write("[]")
+        else:
+            self._fp.write(self._newline_indent(level) + "]")
+
+    def _write_object(self, obj : dict, level : int) -> None:
+        inner = self._newline_indent(level + 1)
+        self._fp.write("{" + inner)
+        first = True
+        for key, value in obj.items():
+            if not first:
+                self._fp.write(self._item_separator + inner)
+            first = False
+            if not isinstance(key, str):
+                raise TypeError("keys must be str for a streamed object, not %r" % (key,))
+            self._fp.write( self._encoder.encode(key) + self._key_separator )
+            self.write(value, level + 1)
+        self._fp.write(self._newline_indent(level) + "}")
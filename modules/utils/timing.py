@@ -0,0 +1,160 @@
+"""
+lightweight timing spans for the import and export operations
+
+usage:
+    from ..utils.timing import span
+
+    with span("configure_model", id=model_id):
+        ...
+
+Recording is off by default, when off span() returns a shared do-nothing
+context manager. It is switched on by the "Record Timings" add-on preference
+or by setting the environment variable IIIF_TRACE, for example for a
+Blender run in background mode:
+
+    IIIF_TRACE=/tmp/import_trace.json blender --background --python ...
+
+The recorded spans can be written as Chrome trace-event json, which can be
+opened in chrome://tracing or https://ui.perfetto.dev, and summarized as
+a table in the log.
+
+No bpy import, spans may be recorded on worker threads.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import logging
+logger = logging.getLogger("iiif.timing")
+
+TRACE_ENV_VAR = "IIIF_TRACE"
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class _Tracer:
+    def __init__(self):
+        self.enabled : bool = False
+        self.trace_filepath : str = ""
+        self.events : List[Dict[str,Any]] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def record(self, name : str, start : float, end : float, args : Dict[str,Any]) -> None:
+        event = {
+            "name" : name,
+            "ph"   : "X",
+            "ts"   : (start - self._origin) * 1e6,
+            "dur"  : (end - start) * 1e6,
+            "pid"  : os.getpid(),
+            "tid"  : threading.get_ident(),
+        }
+        if args:
+            event["args"] = {key : str(value) for key, value in args.items()}
+        with self._lock:
+            self.events.append(event)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.events = []
+
+_tracer = _Tracer()
+if os.environ.get(TRACE_ENV_VAR):
+    _tracer.enabled = True
+    _tracer.trace_filepath = os.environ[TRACE_ENV_VAR]
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name : str, args : Dict[str,Any]):
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _tracer.record(self.name, self.start, time.perf_counter(), self.args)
+
+
+def span(name : str, **args : Any):
+    """
+    context manager timing the enclosed block, args (for example the
+    id of the resource being processed) are recorded with the span
+    """
+    if not _tracer.enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+def configure( enabled : bool, trace_filepath : str = "" ) -> None:
+    """
+    enable or disable recording; the IIIF_TRACE environment variable,
+    if set, keeps recording enabled
+    """
+    env_filepath = os.environ.get(TRACE_ENV_VAR, "")
+    _tracer.enabled = enabled or bool(env_filepath)
+    _tracer.trace_filepath = trace_filepath or env_filepath
+
+def write_chrome_trace( filepath : str ) -> None:
+    with _tracer._lock:
+        events = list(_tracer.events)
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents" : events, "displayTimeUnit" : "ms"}, f)
+
+def summary_lines() -> List[str]:
+    """
+    one line per span name: count, total, mean, max milliseconds;
+    sorted by decreasing total. Totals of nested spans overlap.
+    """
+    with _tracer._lock:
+        events = list(_tracer.events)
+    stats : Dict[str, List[float]] = {}
+    for event in events:
+        stats.setdefault(event["name"], []).append(event["dur"] / 1000.0)
+
+    lines = ["%-36s %8s %12s %10s %10s" % ("span", "count", "total ms", "mean ms", "max ms")]
+    for name, durations in sorted(stats.items(), key=lambda kv: -sum(kv[1])):
+        total = sum(durations)
+        lines.append("%-36s %8i %12.2f %10.3f %10.3f" %
+                        (name, len(durations), total, total / len(durations), max(durations)))
+    return lines
+
+def finish_trace( label : str, trace_filepath : Optional[str] = None ) -> None:
+    """
+    called at the end of an import or export: logs the summary table,
+    writes the Chrome trace if a file path is configured, and clears the
+    recorded spans
+    """
+    if not _tracer.enabled:
+        return
+    logger.info("timings for %s:\n%s" % (label, "\n".join(summary_lines())))
+    filepath = trace_filepath or _tracer.trace_filepath
+    if filepath:
+        try:
+            write_chrome_trace(filepath)
+            logger.info("trace for %s written to %s" % (label, filepath))
+        except OSError as exc:
+            logger.warning("unable to write trace file %s : %r" % (filepath, exc))
+    _tracer.reset()
+
+def timed( name : str ):
+    """
+    decorator, records a span named name for each call of the function
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **keyw):
+            if not _tracer.enabled:
+                return func(*args, **keyw)
+            with _Span(name, {}):
+                return func(*args, **keyw)
+        return wrapper
+    return decorator
@@ -0,0 +1,122 @@
+"""
+import / export round trip of one manifest in a Blender background session
+
+    blender --background --factory-startup \
+        --python tests/setup_logging.py \
+        --python tests/benchmarks/benchmark_roundtrip.py -- \
+        <manifest.json> <results.json> [--bulk] [--streaming] [--export-runs N]
+
+The add-on is enabled as in run_blender_with_plugin.py. The script times
+    import        : bpy.ops.import_scene.iiif_manifest
+    export        : bpy.ops.export_scene.iiif_manifest, export_runs times;
+                    the runs after the first show the cost of a repeated export
+    reimport      : import of the exported manifest into an empty file
+and writes to results.json the times in seconds, the number of annotations,
+and the peak resident set size of the Blender process.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import bpy
+
+import logging
+logger = logging.getLogger("iiif.benchmark")
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    if sys.platform == "darwin":
+        return peak / (1024.0 * 1024.0)
+    return peak / 1024.0
+
+def get_extension_id() -> str:
+    manifest_path = os.path.join(os.path.dirname(__file__), "..", "..", "blender_manifest.toml")
+    with open(manifest_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("id = "):
+                return line.split("=")[1].strip().strip('"').strip("'")
+    raise RuntimeError("Could not find id in blender_manifest.toml")
+
+def enable_plugin() -> None:
+    needle = get_extension_id()
+    preferences = bpy.context.preferences
+    ext_name = None
+    if preferences is not None:
+        ext_name = next( (key for key in preferences.addons.keys() if needle in key), None)
+    if ext_name is None:
+        # not installed as an extension, look among the available add-ons
+        import addon_utils
+        ext_name = next( (mod.__name__ for mod in addon_utils.modules() if needle in mod.__name__), None)
+    if ext_name is None:
+        raise RuntimeError("Failed to find the plugin")
+    bpy.ops.preferences.addon_enable(module=ext_name)
+
+def count_annotations() -> int:
+    return sum( 1 for coll in bpy.data.collections if coll.get("iiif_type") == "Annotation" )
+
+def timed( label : str, func, results : dict ) -> None:
+    start = time.perf_counter()
+    func()
+    results[label] = time.perf_counter() - start
+    logger.warning("%s : %.3f s" % (label, results[label]))
+
+def main( argv ) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("manifest")
+    parser.add_argument("results")
+    parser.add_argument("--bulk", action="store_true")
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--export-runs", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    enable_plugin()
+    results : dict = {
+        "manifest" : os.path.basename(args.manifest),
+        "blender"  : bpy.app.version_string,
+        "options"  : {"bulk" : args.bulk, "streaming" : args.streaming},
+    }
+    import_options = {"bulk_mode" : args.bulk, "use_streaming" : args.streaming}
+
+    timed("import", lambda: bpy.ops.import_scene.iiif_manifest( # pyright: ignore[reportAttributeAccessIssue]
+                                filepath=os.path.abspath(args.manifest), **import_options), results)
+    results["annotations"] = count_annotations()
+    results["objects"] = len(bpy.data.objects)
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        export_path = os.path.join(tempdir, "exported.json")
+        for run in range(args.export_runs):
+            label = "export" if run == 0 else "export_repeat"
+            timed(label, lambda: bpy.ops.export_scene.iiif_manifest( # pyright: ignore[reportAttributeAccessIssue]
+                                    filepath=export_path, use_streaming=args.streaming), results)
+        results["exported_bytes"] = os.path.getsize(export_path)
+
+        bpy.ops.wm.read_homefile(use_empty=True)
+        timed("reimport", lambda: bpy.ops.import_scene.iiif_manifest( # pyright: ignore[reportAttributeAccessIssue]
+                                    filepath=export_path, **import_options), results)
+        results["reimported_annotations"] = count_annotations()
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    with open(args.results, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    if results["reimported_annotations"] != results["annotations"]:
+        logger.error("round trip changed the number of annotations: %i -> %i" %
+                        (results["annotations"], results["reimported_annotations"]))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    try:
+        code = main( sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [] )
+    except Exception:
+        logger.exception("benchmark failed")
+        code = 1
+    sys.exit(code)
@@ -0,0 +1,201 @@
+"""
+generator of synthetic IIIF Presentation 4 manifests for the benchmarks
+
+    python tests/benchmarks/generate_manifests.py <output_dir> \
+        --scenes 2 --pages 5 --annotations 100 --models 8 --camera-fraction 0.05
+
+writes to output_dir:
+    fixtures/model_NN.glb      small glTF binary models (boxes of different sizes)
+    manifest_<S>x<P>x<A>.json  manifest with S scenes, each with P annotation pages,
+                               each with A annotations
+
+The annotations are a deterministic (see --seed) mix of
+    - models referenced directly as the body, targeting the scene
+    - models in a SpecificResource body with Rotate/Scale/Translate transforms,
+      and a SpecificResource target with a PointSelector
+    - PerspectiveCamera bodies with a fieldOfView and a PointSelector target
+The models are file: URIs to the fixtures, so no network access is needed,
+and each fixture is referenced by many annotations.
+
+No bpy import; run with any python 3.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import random
+import struct
+from typing import List, Tuple
+
+BASE = "https://example.org/iiif/benchmark"
+
+def box_glb( size : Tuple[float,float,float] ) -> bytes:
+    """
+    returns a glTF binary model of a box centered on the origin, with
+    the POSITION accessor min and max required by the glTF specification
+    """
+    hx, hy, hz = (s / 2.0 for s in size)
+    positions = [ (x, y, z) for x in (-hx, hx) for y in (-hy, hy) for z in (-hz, hz) ]
+    # 12 triangles, vertex index = 4*ix + 2*iy + iz
+    indices = [ 0,1,3, 0,3,2,  4,6,7, 4,7,5,  0,4,5, 0,5,1,
+                2,3,7, 2,7,6,  0,2,6, 0,6,4,  1,5,7, 1,7,3 ]
+    position_bytes = b"".join( struct.pack("<3f", *p) for p in positions )
+    index_bytes = struct.pack("<%iH" % len(indices), *indices)
+    index_bytes += b"\x00" * (-len(index_bytes) % 4)
+    binary = position_bytes + index_bytes
+
+    gltf = {
+        "asset" : {"version" : "2.0", "generator" : "iiif benchmark generator"},
+        "scene" : 0,
+        "scenes" : [ {"nodes" : [0]} ],
+        "nodes" : [ {"mesh" : 0, "name" : "box"} ],
+        "meshes" : [ {"primitives" : [ {"attributes" : {"POSITION" : 0}, "indices" : 1} ]} ],
+        "buffers" : [ {"byteLength" : len(binary)} ],
+        "bufferViews" : [
+            {"buffer" : 0, "byteOffset" : 0, "byteLength" : len(position_bytes), "target" : 34962},
+            {"buffer" : 0, "byteOffset" : len(position_bytes), "byteLength" : len(indices) * 2, "target" : 34963},
+        ],
+        "accessors" : [
+            {"bufferView" : 0, "componentType" : 5126, "count" : len(positions), "type" : "VEC3",
+                "min" : [-hx, -hy, -hz], "max" : [hx, hy, hz]},
+            {"bufferView" : 1, "componentType" : 5123, "count" : len(indices), "type" : "SCALAR"},
+        ],
+    }
+    json_bytes = json.dumps(gltf, separators=(",",":")).encode("utf-8")
+    json_bytes += b" " * (-len(json_bytes) % 4)
+
+    total_length = 12 + 8 + len(json_bytes) + 8 + len(binary)
+    return (    struct.pack("<4sII", b"glTF", 2, total_length) +
+                struct.pack("<I4s", len(json_bytes), b"JSON") + json_bytes +
+                struct.pack("<I4s", len(binary), b"BIN\x00") + binary )
+
+def write_fixtures( fixtures_dir : pathlib.Path, count : int, rng : random.Random ) -> List[str]:
+    """
+    writes count .glb fixtures, returns their file: URIs
+    """
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    uris = []
+    for index in range(count):
+        size = tuple( round(rng.uniform(0.2, 2.0), 3) for _ in range(3) )
+        filepath = fixtures_dir / ("model_%02i.glb" % index)
+        filepath.write_bytes( box_glb(size) )
+        uris.append( filepath.resolve().as_uri() )
+    return uris
+
+def point_selector( rng : random.Random ) -> dict:
+    return {
+        "type" : "PointSelector",
+        "x" : round(rng.uniform(-10.0, 10.0), 3),
+        "y" : round(rng.uniform(0.0, 5.0), 3),
+        "z" : round(rng.uniform(-10.0, 10.0), 3),
+    }
+
+def scene_target( scene_id : str, rng : random.Random, with_selector : bool ):
+    if not with_selector:
+        return scene_id
+    return {
+        "type" : "SpecificResource",
+        "source" : {"id" : scene_id, "type" : "Scene"},
+        "selector" : [ point_selector(rng) ],
+    }
+
+def annotation( anno_id : str, scene_id : str, model_uris : List[str],
+                camera_fraction : float, rng : random.Random ) -> dict:
+    data : dict = {
+        "id" : anno_id,
+        "type" : "Annotation",
+        "motivation" : ["painting"],
+        "label" : {"en" : ["annotation %s" % anno_id.rsplit("/", 1)[-1]]},
+    }
+    choice = rng.random()
+    if choice < camera_fraction:
+        data["body"] = {
+            "id" : anno_id + "/camera",
+            "type" : "PerspectiveCamera",
+            "fieldOfView" : round(rng.uniform(30.0, 70.0), 1),
+        }
+        data["target"] = scene_target(scene_id, rng, True)
+        return data
+
+    model = {
+        "id" : rng.choice(model_uris),
+        "type" : "Model",
+        "format" : "model/gltf-binary",
+    }
+    if choice < camera_fraction + (1.0 - camera_fraction) / 2:
+        data["body"] = model
+        data["target"] = scene_target(scene_id, rng, rng.random() < 0.5)
+    else:
+        data["body"] = {
+            "type" : "SpecificResource",
+            "source" : model,
+            "transform" : [
+                {"type" : "ScaleTransform", "x" : 1.5, "y" : 1.5, "z" : 1.5},
+                {"type" : "RotateTransform", "y" : round(rng.uniform(-180.0, 180.0), 1)},
+                {"type" : "TranslateTransform", "x" : round(rng.uniform(-1.0, 1.0), 3)},
+            ],
+        }
+        data["target"] = scene_target(scene_id, rng, True)
+    return data
+
+def generate_manifest(  scenes : int, pages : int, annotations : int,
+                        model_uris : List[str], camera_fraction : float,
+                        rng : random.Random ) -> dict:
+    manifest_id = "%s/manifest_%ix%ix%i.json" % (BASE, scenes, pages, annotations)
+    manifest : dict = {
+        "@context" : "http://iiif.io/api/presentation/4/context.json",
+        "id" : manifest_id,
+        "type" : "Manifest",
+        "label" : {"en" : ["Synthetic benchmark manifest %ix%ix%i" % (scenes, pages, annotations)]},
+        "items" : [],
+    }
+    for s in range(scenes):
+        scene_id = "%s/scene/%i" % (BASE, s)
+        scene : dict = {
+            "id" : scene_id,
+            "type" : "Scene",
+            "label" : {"en" : ["Scene %i" % s]},
+            "backgroundColor" : "#202020",
+            "items" : [],
+        }
+        for p in range(pages):
+            page_id = "%s/page/%i/%i" % (BASE, s, p)
+            scene["items"].append({
+                "id" : page_id,
+                "type" : "AnnotationPage",
+                "items" : [
+                    annotation("%s/anno/%i/%i/%i" % (BASE, s, p, a), scene_id,
+                                model_uris, camera_fraction, rng)
+                    for a in range(annotations)
+                ],
+            })
+        manifest["items"].append(scene)
+    return manifest
+
+def main( argv = None ) -> str:
+    parser = argparse.ArgumentParser(description="generate a synthetic IIIF 3D manifest")
+    parser.add_argument("output_dir")
+    parser.add_argument("--scenes", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--annotations", type=int, default=10,
+                        help="annotations per annotation page")
+    parser.add_argument("--models", type=int, default=8,
+                        help="number of distinct glb fixtures")
+    parser.add_argument("--camera-fraction", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    output_dir = pathlib.Path(args.output_dir)
+    model_uris = write_fixtures(output_dir / "fixtures", args.models, rng)
+    manifest = generate_manifest(   args.scenes, args.pages, args.annotations,
+                                    model_uris, args.camera_fraction, rng)
+    manifest_path = output_dir / ("manifest_%ix%ix%i.json" % (args.scenes, args.pages, args.annotations))
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(os.fspath(manifest_path))
+    return os.fspath(manifest_path)
+
+if __name__ == "__main__":
+    main()
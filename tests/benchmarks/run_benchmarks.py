@@ -0,0 +1,167 @@
+"""
+runs the import / export benchmarks and compares them with the baselines
+
+    python tests/benchmarks/run_benchmarks.py [--blender blender] [--sizes small,medium]
+                                              [--update-baselines] [--bulk] [--streaming]
+
+For each size a synthetic manifest is generated (generate_manifests.py) and
+a Blender background session runs benchmark_roundtrip.py on it. The results
+are printed, written to the --output file if given, and compared with baselines.json:
+
+    - a time (import, export, export_repeat, reimport) more than --time-tolerance
+      times its baseline, or a peak RSS more than --rss-tolerance times its
+      baseline, is a regression
+    - the scaling exponent of each time between the smallest and largest size,
+      log(t_large / t_small) / log(n_large / n_small), more than 0.25 above its
+      baseline is a regression; a linear stage has an exponent near 1, a
+      quadratic one near 2
+
+The exit code is 1 if there is a regression or a benchmark failed. Baselines
+are machine dependent; record them on the reference machine with
+--update-baselines, which writes baselines.json from the current results.
+The baselines.json committed holds no results until then.
+
+No bpy import, run with the system python.
+"""
+
+import argparse
+import json
+import math
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+HERE = pathlib.Path(__file__).resolve().parent
+# generate_manifests is found whatever the working directory
+sys.path.insert(0, os.fspath(HERE))
+import generate_manifests
+
+REPO = HERE.parent.parent
+BASELINES = HERE / "baselines.json"
+
+# scenes, pages, annotations per page
+SIZES : Dict[str, tuple] = {
+    "small"  : (1, 2, 25),
+    "medium" : (2, 5, 100),
+    "large"  : (4, 10, 250),
+}
+TIMES = ("import", "export", "export_repeat", "reimport")
+EXPONENT_TOLERANCE = 0.25
+
+
+def run_size( blender : str, name : str, workdir : pathlib.Path, options : List[str]) -> dict:
+    scenes, pages, annotations = SIZES[name]
+    size_dir = workdir / name
+    manifest = generate_manifests.main([ os.fspath(size_dir),
+                                        "--scenes", str(scenes),
+                                        "--pages", str(pages),
+                                        "--annotations", str(annotations) ])
+    results_path = size_dir / "results.json"
+    command = [ blender, "--background", "--factory-startup",
+                "--python", os.fspath(REPO / "tests" / "setup_logging.py"),
+                "--python", os.fspath(HERE / "benchmark_roundtrip.py"),
+                "--", manifest, os.fspath(results_path) ] + options
+    completed = subprocess.run(command)
+    if completed.returncode != 0 or not results_path.exists():
+        raise RuntimeError("benchmark %s failed with exit code %i" % (name, completed.returncode))
+    with open(results_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def scaling_exponents( results : Dict[str, dict] ) -> Dict[str, float]:
+    """
+    exponents of the times between the smallest and the largest size run
+    """
+    runs = sorted( results.values(), key=lambda r: r["annotations"])
+    if len(runs) < 2 or runs[0]["annotations"] == 0:
+        return {}
+    small, large = runs[0], runs[-1]
+    size_ratio = large["annotations"] / small["annotations"]
+    if size_ratio <= 1.0:
+        return {}
+    return { label : math.log( large[label] / small[label] ) / math.log(size_ratio)
+             for label in TIMES
+             if small.get(label, 0) > 0 and large.get(label, 0) > 0 }
+
+def compare( current : dict, baseline : dict, time_tolerance : float, rss_tolerance : float) -> List[str]:
+    regressions = []
+    for name, result in current["sizes"].items():
+        base = baseline.get("sizes", {}).get(name)
+        if base is None:
+            print("no baseline for size %s" % name)
+            continue
+        for label in TIMES:
+            if label in result and label in base and result[label] > base[label] * time_tolerance:
+                regressions.append("%s %s: %.3f s, baseline %.3f s" % (name, label, result[label], base[label]))
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * rss_tolerance:
+            regressions.append("%s peak RSS: %.0f MB, baseline %.0f MB" %
+                                (name, result["peak_rss_mb"], base["peak_rss_mb"]))
+    for label, exponent in current.get("scaling", {}).items():
+        base_exponent = baseline.get("scaling", {}).get(label)
+        if base_exponent is not None and exponent > base_exponent + EXPONENT_TOLERANCE:
+            regressions.append("%s scaling exponent: %.2f, baseline %.2f" % (label, exponent, base_exponent))
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="IIIF import/export benchmarks")
+    parser.add_argument("--blender", default="blender")
+    parser.add_argument("--sizes", default="small,medium,large")
+    parser.add_argument("--bulk", action="store_true")
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--time-tolerance", type=float, default=1.5)
+    parser.add_argument("--rss-tolerance", type=float, default=1.3)
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--output", default=None, help="file for the results json")
+    args = parser.parse_args()
+
+    options = []
+    if args.bulk:
+        options.append("--bulk")
+    if args.streaming:
+        options.append("--streaming")
+
+    current : dict = {"options" : options, "sizes" : {}}
+    with tempfile.TemporaryDirectory() as tempdir:
+        for name in args.sizes.split(","):
+            try:
+                current["sizes"][name] = run_size(args.blender, name.strip(), pathlib.Path(tempdir), options)
+            except (RuntimeError, KeyError) as exc:
+                print(exc)
+                return 1
+    current["scaling"] = scaling_exponents(current["sizes"])
+
+    for name, result in current["sizes"].items():
+        print("%-8s %6i annotations  " % (name, result["annotations"]) +
+              "  ".join("%s %.3f s" % (label, result[label]) for label in TIMES if label in result) +
+              "  peak RSS %.0f MB" % result["peak_rss_mb"])
+    for label, exponent in current["scaling"].items():
+        print("scaling exponent %-14s %.2f" % (label, exponent))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.update_baselines:
+        with open(BASELINES, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print("baselines written to %s" % BASELINES)
+        return 0
+
+    if not BASELINES.exists():
+        print("no baselines.json, record baselines with --update-baselines")
+        return 0
+    with open(BASELINES, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if not baseline.get("sizes"):
+        print("baselines.json holds no results, record baselines with --update-baselines")
+        return 0
+    if baseline.get("options") != options:
+        print("warning: baselines recorded with options %r" % (baseline.get("options"),))
+    regressions = compare(current, baseline, args.time_tolerance, args.rss_tolerance)
+    for regression in regressions:
+        print("REGRESSION %s" % regression)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())